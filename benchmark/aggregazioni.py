@@ -0,0 +1,127 @@
+# Benchmark delle aggregazioni di grafo-nazionalita.py, scatterplot.py e heatmap.py
+#
+# Confronta i cicli con iterrows usati in precedenza con le versioni su
+# colonne di scripts/aggregazioni.py (per la heatmap contrazione.incrocio,
+# contro iterrows piu pd.crosstab), su liste di archi sintetiche da 10k a
+# 10M di righe, e controlla che i CSV prodotti siano identici byte per byte.
+# Oltre --limite-vecchio righe la versione con iterrows non viene eseguita.
+#
+# Uso:
+#     python -m benchmark.aggregazioni [--righe 10000 100000 1000000 10000000] [--limite-vecchio 100000]
+
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from scripts.aggregazioni import collaborazioni_nazioni, popolarita_archi
+from scripts.contrazione import incrocio
+from benchmark.comune import grafo_sintetico
+
+NAZIONI = ['Argentina', 'Brasile', 'Cile', 'Colombia', 'Cuba', 'Messico', 'Nigeria', 'Perù',
+           'Porto Rico', 'Regno Unito', 'Repubblica Dominicana', 'Spagna', "Stati Uniti d'America",
+           'Unknown', 'Venezuela']
+GENERI = ['reggaeton', 'trap latino', 'corridos tumbados', 'latin pop', 'dembow', 'afrobeats',
+          'uk drill', 'hip hop', 'cumbia', 'urbano latino', 'sierreño', 'phonk']
+
+
+def vecchio_nazioni(df_artisti, df_edges):
+    artista_nazione = dict(zip(df_artisti['spotify_id'], df_artisti['country']))
+    collaborazioni = defaultdict(int)
+    for _, row in df_edges.iterrows():
+        nazione_source = artista_nazione.get(row['source'])
+        nazione_target = artista_nazione.get(row['target'])
+        if (nazione_source and nazione_target and
+                nazione_source.lower() != 'unknown' and
+                nazione_target.lower() != 'unknown'):
+            coppia = tuple(sorted([nazione_source, nazione_target]))
+            collaborazioni[coppia] += row['weight']
+    nazioni = set()
+    for coppia in collaborazioni:
+        nazioni.update(coppia)
+    edges_data = [{'Source': n1, 'Target': n2, 'Weight': peso, 'Type': 'Undirected'}
+                  for (n1, n2), peso in collaborazioni.items()]
+    return sorted(nazioni), pd.DataFrame(edges_data).sort_values('Weight', ascending=False)
+
+
+def vecchio_popolarita(nodes_df, edges_df):
+    popularity_map = dict(zip(nodes_df['id'], nodes_df['popularity']))
+    edge_popularity = []
+    for _, row in edges_df.iterrows():
+        if row['source'] in popularity_map and row['target'] in popularity_map:
+            edge_popularity.append({
+                'source_popularity': popularity_map[row['source']],
+                'target_popularity': popularity_map[row['target']],
+                'weight': row['weight']
+            })
+    return pd.DataFrame(edge_popularity)
+
+
+def vecchio_generi(df_clean, genre_column):
+    genres_expanded = []
+    for _, row in df_clean.iterrows():
+        for genre in row[genre_column].split(';'):
+            genre = genre.strip()
+            if genre:
+                genres_expanded.append({'community': row['modularity_class'], 'genre': genre})
+    df_genres = pd.DataFrame(genres_expanded)
+    return pd.crosstab(df_genres['community'], df_genres['genre']).rename_axis(index=None, columns=None)
+
+
+def nuovo_generi(df_clean, genre_column):
+    return incrocio(df_clean['modularity_class'], df_clean[genre_column])
+
+
+def dati_sintetici(righe, seed=0):
+    """Archi sintetici piu le tabelle di nazionalita e generi per gli stessi artisti."""
+    rng = np.random.default_rng(seed)
+    df_nodes, df_edges = grafo_sintetico(max(righe // 3, 100), righe, seed=seed)
+    n = len(df_nodes)
+
+    # Una parte degli archi punta ad artisti senza profilo, come i collaboratori non recuperati
+    df_nodes = df_nodes.iloc[:int(n * 0.95)].copy()
+    df_artisti = pd.DataFrame({'spotify_id': df_nodes['id'], 'name': df_nodes['name'],
+                               'country': rng.choice(NAZIONI, len(df_nodes))})
+    numero = rng.integers(1, 4, len(df_nodes))
+    df_nodes['genres_mapped'] = [';'.join(rng.choice(GENERI, k, replace=False)) for k in numero]
+    df_nodes['modularity_class'] = rng.integers(0, 20, len(df_nodes))
+    return df_nodes, df_edges, df_artisti
+
+
+def misura(funzione, *args):
+    inizio = time.perf_counter()
+    risultato = funzione(*args)
+    return risultato, time.perf_counter() - inizio
+
+
+def csv(risultato):
+    if isinstance(risultato, tuple):
+        return '\n'.join(risultato[0]) + risultato[1].to_csv(index=False)
+    return risultato.to_csv(index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregazioni con iterrows contro aggregazioni su colonne")
+    parser.add_argument('--righe', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--limite-vecchio', type=int, default=100_000,
+                        help="numero massimo di righe per cui eseguire la versione con iterrows")
+    args = parser.parse_args()
+
+    print(f"{'righe':>10} {'aggregazione':<14} {'iterrows':>10} {'colonne':>9} {'speedup':>8}  identici")
+    for righe in args.righe:
+        df_nodes, df_edges, df_artisti = dati_sintetici(righe)
+        casi = [
+            ('nazioni', vecchio_nazioni, collaborazioni_nazioni, (df_artisti, df_edges)),
+            ('popolarita', vecchio_popolarita, popolarita_archi, (df_nodes, df_edges)),
+            ('generi', vecchio_generi, nuovo_generi, (df_nodes, 'genres_mapped')),
+        ]
+        for nome, vecchia, nuova, argomenti in casi:
+            r_nuovo, t_nuovo = misura(nuova, *argomenti)
+            if righe > args.limite_vecchio:
+                print(f"{righe:>10} {nome:<14} {'-':>10} {t_nuovo:>8.2f}s {'-':>8}  -")
+                continue
+            r_vecchio, t_vecchio = misura(vecchia, *argomenti)
+            print(f"{righe:>10} {nome:<14} {t_vecchio:>9.2f}s {t_nuovo:>8.2f}s {t_vecchio / t_nuovo:>7.0f}x  "
+                  f"{csv(r_vecchio) == csv(r_nuovo)}")
@@ -0,0 +1,106 @@
+# Benchmark dell'archivio Parquet (scripts/archivio.py) contro i CSV
+#
+# Per grafi sintetici fino a qualche milione di archi salva nodi e archi in
+# entrambi i formati, poi li ricarica in un processo nuovo per ogni formato
+# misurando tempo e picco di memoria (VmHWM, solo Linux) della sola lettura:
+#   csv       pd.read_csv di nodes.csv ed edges.csv
+#   parquet   carica_tabella, stesso DataFrame di read_csv
+#   categorie carica_tabella con gli ID come Categorical
+#   indici    carica_archi_indicizzati, soli array numpy per scripts/metriche.py
+#
+# Uso:
+#     python -m benchmark.archivio [--archi 100000 1000000 3000000]
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.archivio import salva_grafo
+from benchmark.comune import grafo_sintetico
+
+GENERI = ['reggaeton', 'trap latino', 'urbano latino', 'latin pop', 'corridos tumbados', 'dembow',
+          'afrobeats', 'uk drill', 'hip hop', 'cumbia', 'musica mexicana', 'pop']
+
+LETTURA = """
+import json, sys, time
+import pandas as pd
+import pyarrow.parquet as pq
+from scripts.archivio import carica_tabella, carica_archi_indicizzati
+
+def picco():
+    # VmHWM e non ru_maxrss, che dopo exec conserva il picco del processo padre
+    with open('/proc/self/status') as f:
+        return next(int(r.split()[1]) for r in f if r.startswith('VmHWM:'))
+
+cartella, formato = sys.argv[1], sys.argv[2]
+# Le librerie di lettura caricate alla prima chiamata non contano nella misura
+pd.read_csv(cartella + '/csv/edges.csv', nrows=10)
+pq.read_table(cartella + '/riscaldamento.parquet', memory_map=True).to_pandas()
+base = picco()
+inizio = time.perf_counter()
+if formato == 'csv':
+    dati = (pd.read_csv(cartella + '/csv/nodes.csv'), pd.read_csv(cartella + '/csv/edges.csv'))
+elif formato == 'indici':
+    dati = carica_archi_indicizzati(cartella + '/parquet')
+else:
+    categorie = formato == 'categorie'
+    dati = (carica_tabella(cartella + '/parquet/nodes.csv', categorie=categorie),
+            carica_tabella(cartella + '/parquet/edges.csv', categorie=categorie))
+durata = time.perf_counter() - inizio
+print(json.dumps({'tempo': durata, 'memoria': (picco() - base) / 1024}))
+"""
+FILE = {'csv': ['csv/nodes.csv', 'csv/edges.csv'],
+        'parquet': ['parquet/nodes.parquet', 'parquet/edges.parquet', 'parquet/indici.parquet'],
+        'categorie': ['parquet/nodes.parquet', 'parquet/edges.parquet', 'parquet/indici.parquet'],
+        'indici': ['parquet/edges.parquet', 'parquet/indici.parquet']}
+
+
+def prepara(cartella, n_archi, seed=0):
+    """Scrive lo stesso grafo solo come CSV (cartella/csv) e solo come Parquet (cartella/parquet)."""
+    rng = np.random.default_rng(seed)
+    df_nodes, df_edges = grafo_sintetico(max(n_archi // 3, 100), n_archi, seed=seed)
+    numero = rng.integers(1, 5, len(df_nodes))
+    df_nodes['genres'] = [';'.join(rng.choice(GENERI, k, replace=False)) for k in numero]
+    os.makedirs(os.path.join(cartella, 'csv'))
+    df_nodes.to_csv(os.path.join(cartella, 'csv', 'nodes.csv'), index=False)
+    df_edges.to_csv(os.path.join(cartella, 'csv', 'edges.csv'), index=False)
+    salva_grafo(df_nodes, df_edges, os.path.join(cartella, 'parquet'), csv=False)
+    pq.write_table(pa.Table.from_pandas(df_nodes.head(10)), os.path.join(cartella, 'riscaldamento.parquet'))
+    return len(df_edges)
+
+
+def misura(cartella, formato):
+    risultato = subprocess.run([sys.executable, '-c', LETTURA, cartella, formato], capture_output=True,
+                               text=True, check=True, cwd=os.getcwd())
+    return json.loads(risultato.stdout)
+
+
+def dimensione(cartella, formato):
+    return sum(os.path.getsize(os.path.join(cartella, f)) for f in FILE[formato]) / 1024 / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lettura di nodi e archi: CSV contro Parquet")
+    parser.add_argument('--archi', type=int, nargs='+', default=[100_000, 1_000_000, 3_000_000])
+    args = parser.parse_args()
+
+    print(f"{'archi':>9} {'formato':<10} {'disco':>8} {'tempo':>8} {'memoria':>9} {'speedup':>8}")
+    for n_archi in args.archi:
+        cartella = tempfile.mkdtemp()
+        try:
+            n_archi = prepara(cartella, n_archi)
+            csv = misura(cartella, 'csv')
+            for formato in FILE:
+                r = csv if formato == 'csv' else misura(cartella, formato)
+                print(f"{n_archi:>9} {formato:<10} {dimensione(cartella, formato):>6.1f}MB {r['tempo']:>7.2f}s "
+                      f"{r['memoria']:>7.0f}MB {csv['tempo'] / r['tempo']:>7.1f}x")
+        finally:
+            shutil.rmtree(cartella)
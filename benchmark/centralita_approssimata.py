@@ -0,0 +1,60 @@
+# Benchmark precisione/tempo della stima di betweenness e closeness con pivot campionati
+#
+# Sul grafo di data/old/grezzi calcola i valori esatti e li confronta con le
+# stime ottenute con un numero crescente di pivot: errore reale, limite
+# d'errore dichiarato, quota di nodi entro il limite e sovrapposizione della
+# top 10 per betweenness. Le ultime righe usano l'arresto automatico con
+# soglie decrescenti sulla betweenness (quella sulla closeness nello stesso
+# rapporto delle soglie predefinite): pivot usati, tempo ed errore reale.
+#
+# Uso:
+#     python -m benchmark.centralita_approssimata [--processi 4] [--pivot 64 128 256 512 1024] [--soglie 0.05 0.02 0.01]
+
+import argparse
+import time
+
+import numpy as np
+
+from scripts.metriche import (carica_grafo, cammini_minimi, cammini_approssimati, normalizza_betweenness,
+                              ERRORE_BETWEENNESS, ERRORE_CLOSENESS)
+
+GRAFO = ('data/old/grezzi/nodes.csv', 'data/old/grezzi/edges.csv')
+
+
+def confronta(nome, g, esatti, stima, durata):
+    b_esatta = normalizza_betweenness(esatti['betweenness'], g.n)
+    b_stima = normalizza_betweenness(stima['betweenness'], g.n)
+    errore_b = np.abs(b_stima - b_esatta)
+    errore_c = np.abs(stima['closeness'] - esatti['closeness']) / np.maximum(esatti['closeness'], 1e-12)
+
+    entro = np.mean((errore_b <= stima['errore betweenness'] + 1e-12) & (errore_c <= stima['errore closeness'] + 1e-12))
+    top = len(set(np.argsort(-b_esatta)[:10]) & set(np.argsort(-b_stima)[:10]))
+    print(f"{nome:<10} {stima['pivot']:>6} {durata:>7.2f} {errore_b.max():>9.4f} {stima['errore betweenness'].max():>9.4f} "
+          f"{errore_c.max():>8.1%} {stima['errore closeness'].max():>8.1%} {entro:>7.1%} {top:>4}/10")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precisione e tempo della stima per campionamento")
+    parser.add_argument('--processi', type=int, default=None)
+    parser.add_argument('--pivot', type=int, nargs='+', default=[64, 128, 256, 512, 1024])
+    parser.add_argument('--soglie', type=float, nargs='+', default=[0.05, 0.02, ERRORE_BETWEENNESS],
+                        help="errori massimi sulla betweenness per l'arresto automatico")
+    args = parser.parse_args()
+
+    g, _ = carica_grafo(*GRAFO)
+    inizio = time.perf_counter()
+    esatti = cammini_minimi(g)
+    print(f"Grafo: {g.n} nodi, {g.n_archi} archi; valori esatti in {time.perf_counter() - inizio:.2f}s")
+    print(f"{'modo':<10} {'pivot':>6} {'tempo':>7} {'err b':>9} {'limite b':>9} "
+          f"{'err c':>8} {'limite c':>8} {'entro':>7} {'top10':>7}")
+
+    for k in args.pivot:
+        inizio = time.perf_counter()
+        stima = cammini_approssimati(g, processi=args.processi, max_pivot=k)
+        confronta('fisso', g, esatti, stima, time.perf_counter() - inizio)
+
+    for soglia in args.soglie:
+        inizio = time.perf_counter()
+        stima = cammini_approssimati(g, processi=args.processi, errore_betweenness=soglia,
+                                     errore_closeness=soglia * ERRORE_CLOSENESS / ERRORE_BETWEENNESS)
+        confronta(f'auto {soglia:g}', g, esatti, stima, time.perf_counter() - inizio)
@@ -0,0 +1,54 @@
+# Funzioni condivise dai benchmark: server Spotify locale e client senza cache ne limiti
+
+import logging
+import os
+import warnings
+
+from scripts.mock_spotify import genera_catalogo, carica_catalogo, avvia_server, leggi_semi
+
+
+def prepara_catalogo(fixture=None, n_artisti=300, semi='seeds.txt'):
+    """Carica la fixture indicata oppure genera il catalogo sintetico a partire dai seed."""
+    if fixture:
+        return carica_catalogo(fixture)
+    ids = leggi_semi(semi) if os.path.exists(semi) else None
+    return genera_catalogo(n_artisti, ids_iniziali=ids)
+
+
+def client_locale(server):
+    """Client spotipy collegato al server locale, senza cache su disco e senza rate limit."""
+    from scripts import ratelimit
+    ratelimit.CONFIGURAZIONI['spotify'].update(rate=1e6, rate_max=1e6, burst=1e6)
+    os.environ['DISABILITA_CACHE'] = '1'
+    os.environ['SPOTIPY_API_PREFIX'] = f"http://127.0.0.1:{server.server_port}/v1/"
+    logging.getLogger('spotipy').setLevel(logging.CRITICAL)
+    warnings.simplefilter('ignore', DeprecationWarning)
+
+    from scripts.utils import get_spotify_client
+    return get_spotify_client()
+
+
+def avvia(catalogo, latenza=0.0):
+    """Avvia il server locale e restituisce (server, client)."""
+    server = avvia_server(catalogo, latenza=latenza)
+    return server, client_locale(server)
+
+
+def grafo_sintetico(n_nodi, n_archi, seed=0, esponente=0.8):
+    """Grafo casuale con gradi a coda lunga (modello di Chung-Lu), con le colonne di nodes.csv/edges.csv."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    p = (np.arange(1, n_nodi + 1) ** -esponente)
+    p /= p.sum()
+    u = rng.choice(n_nodi, size=int(n_archi * 1.3), p=p)
+    v = rng.choice(n_nodi, size=len(u), p=p)
+    coppie = np.unique(np.sort(np.stack([u, v], axis=1)[u != v], axis=1), axis=0)
+    coppie = coppie[rng.permutation(len(coppie))[:n_archi]]
+
+    ids = np.array([f"a{i:07d}" for i in range(n_nodi)])
+    df_nodes = pd.DataFrame({'id': ids, 'name': ids, 'popularity': rng.integers(0, 100, n_nodi), 'genres': ''})
+    df_edges = pd.DataFrame({'source': ids[coppie[:, 0]], 'target': ids[coppie[:, 1]],
+                             'weight': rng.geometric(0.6, len(coppie))})
+    return df_nodes, df_edges
@@ -0,0 +1,98 @@
+# Benchmark dell'esportazione GEXF di scripts/esportazione.py su grafi grandi
+#
+# Per grafi sintetici (benchmark.comune.grafo_sintetico, salvati con
+# archivio.salva_grafo in una cartella temporanea) da 100k a 10M archi
+# scrive il GEXF in un processo nuovo, misurando tempo e picco di memoria
+# (VmHWM, solo Linux) oltre quello dopo la lettura dei nodi:
+#   streaming   scrivi_grafo con gli archi letti a blocchi da edges.parquet
+#   networkx    grafo costruito in memoria e nx.write_gexf (fino a --limite-networkx archi)
+# Con --layout misura anche il tempo di scripts/disposizione.forceatlas2 per iterazione.
+#
+# Uso:
+#     python -m benchmark.esportazione [--archi 100000 1000000 10000000] [--limite-networkx 1000000] [--layout]
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRITTURA = """
+import json, os, sys, time
+from scripts.archivio import archi_a_blocchi, carica_tabella
+
+def picco():
+    with open('/proc/self/status') as f:
+        return next(int(r.split()[1]) for r in f if r.startswith('VmHWM:'))
+
+cartella, modo = sys.argv[1], sys.argv[2]
+df_nodes = carica_tabella(os.path.join(cartella, 'nodes.csv'))
+percorso = os.path.join(cartella, 'rete.gexf')
+base = picco()
+inizio = time.perf_counter()
+if modo == 'streaming':
+    from scripts.esportazione import scrivi_grafo, BLOCCO
+    scrivi_grafo(percorso, df_nodes, archi_a_blocchi(cartella, BLOCCO))
+else:
+    import networkx as nx
+    G = nx.Graph()
+    for r in df_nodes.itertuples(index=False):
+        G.add_node(r.id, label=r.name, popularity=int(r.popularity))
+    for source, target, pesi in archi_a_blocchi(cartella, 1_000_000):
+        G.add_weighted_edges_from(zip(source, target, pesi.tolist()))
+    nx.write_gexf(G, percorso)
+durata = time.perf_counter() - inizio
+print(json.dumps({'tempo': durata, 'memoria': (picco() - base) / 1024, 'dimensione': os.path.getsize(percorso)}))
+"""
+
+
+def misura(cartella, modo):
+    risultato = subprocess.run([sys.executable, '-c', SCRITTURA, cartella, modo], capture_output=True, text=True,
+                               check=True, cwd=os.getcwd())
+    return json.loads(risultato.stdout)
+
+
+def misura_layout(df_nodes, df_edges, iterazioni=10):
+    from scripts.disposizione import forceatlas2
+    from scripts.metriche import Grafo
+    g = Grafo(df_nodes['id'], df_edges['source'], df_edges['target'], df_edges['weight'])
+    inizio = time.perf_counter()
+    forceatlas2(g.pesi, iterazioni=iterazioni)
+    return (time.perf_counter() - inizio) / iterazioni
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrittura GEXF in streaming contro networkx")
+    parser.add_argument('--archi', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--limite-networkx', type=int, default=1_000_000,
+                        help="numero massimo di archi per cui costruire il grafo networkx")
+    parser.add_argument('--layout', action='store_true', help="misura anche ForceAtlas2 per iterazione")
+    args = parser.parse_args()
+
+    from benchmark.comune import grafo_sintetico
+    from scripts.archivio import salva_grafo
+
+    print(f"{'archi':>10} {'modo':<10} {'tempo':>8} {'memoria':>9} {'file':>9} {'speedup':>8}")
+    for archi in args.archi:
+        cartella = tempfile.mkdtemp(prefix='benchmark-esportazione-')
+        try:
+            df_nodes, df_edges = grafo_sintetico(max(archi // 5, 100), archi)
+            # Solo Parquet: senza CSV accanto, archivio lo considera aggiornato
+            salva_grafo(df_nodes, df_edges, cartella, csv=False)
+
+            risultati = {'streaming': misura(cartella, 'streaming')}
+            if archi <= args.limite_networkx:
+                risultati['networkx'] = misura(cartella, 'networkx')
+            for modo, r in risultati.items():
+                speedup = risultati.get('networkx', {}).get('tempo')
+                speedup = f"{speedup / r['tempo']:>7.1f}x" if speedup else f"{'-':>8}"
+                print(f"{archi:>10} {modo:<10} {r['tempo']:>7.2f}s {r['memoria']:>7.0f}MB "
+                      f"{r['dimensione'] / 2 ** 20:>7.0f}MB {speedup}")
+            if args.layout:
+                print(f"{archi:>10} layout     {misura_layout(df_nodes, df_edges):>7.2f}s per iterazione "
+                      f"({len(df_nodes)} nodi)")
+        finally:
+            shutil.rmtree(cartella, ignore_errors=True)
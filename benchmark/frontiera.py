@@ -0,0 +1,82 @@
+# Benchmark dei punteggi del crawl per priorita (scripts/frontiera.py) a parita di richieste
+#
+# Su un server Spotify locale, con il catalogo ricostruito dal crawl registrato
+# in data/old/grezzi (oppure sintetico con --sintetico), esegue main.main con
+# profondita --profondita per ogni punteggio e ogni budget di richieste, piu
+# un crawl senza budget come riferimento. Per ogni esecuzione: richieste spese
+# (profili dei collaboratori esterni compresi), artisti processati, nodi e
+# collaborazioni del grafo prodotto, peso totale degli archi, popolarita
+# sommata degli artisti processati e collaborazioni per richiesta.
+#
+# Uso:
+#     python -m benchmark.frontiera [--budget 200 500 1000] [--profondita 2] [--sintetico]
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from benchmark.comune import prepara_catalogo, avvia
+from scripts.frontiera import PUNTEGGI
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGISTRATO = os.path.join(RADICE, 'data', 'old', 'grezzi')
+SEMI = os.path.join(RADICE, 'seeds.txt')
+
+
+def esegui(punteggio, budget):
+    """Crawl per priorita in una cartella temporanea; restituisce le misure del grafo prodotto."""
+    import main
+    from scripts.misure import misure
+
+    cartella = tempfile.mkdtemp(prefix='benchmark-frontiera-')
+    shutil.copy(SEMI, cartella)
+    precedente = os.getcwd()
+    os.chdir(cartella)
+    try:
+        prima = misure.richieste('spotify')
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.main(nuovo=True, priorita=punteggio, budget_richieste=budget, copertura='copertura.csv')
+        richieste = misure.richieste('spotify') - prima
+        copertura = pd.read_csv('copertura.csv').iloc[-1]
+        df_nodes = pd.read_csv('data/new/grezzi/nodes.csv')
+        df_edges = pd.read_csv('data/new/grezzi/edges.csv')
+    finally:
+        os.chdir(precedente)
+        shutil.rmtree(cartella, ignore_errors=True)
+    return {'richieste': richieste, 'processati': int(copertura['processati']), 'nodi': len(df_nodes),
+            'archi': len(df_edges), 'peso': int(df_edges['weight'].sum()), 'popolarita': int(copertura['popolarita'])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copertura del crawl per priorita a parita di budget di richieste")
+    parser.add_argument('--budget', type=int, nargs='+', default=[200, 500, 1000])
+    parser.add_argument('--profondita', type=int, default=2)
+    parser.add_argument('--sintetico', action='store_true',
+                        help="catalogo sintetico invece di quello ricostruito da data/old/grezzi")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SPOTIPY_CLIENT_ID', 'benchmark')
+    os.environ.setdefault('SPOTIPY_CLIENT_SECRET', 'benchmark')
+    if args.sintetico:
+        catalogo = prepara_catalogo(n_artisti=1000, semi=SEMI)
+    else:
+        from scripts.mock_spotify import catalogo_registrato
+        catalogo = catalogo_registrato(REGISTRATO)
+    server, _ = avvia(catalogo)
+    import main
+    main.MAX_DEPTH = args.profondita
+
+    print(f"{'budget':>8} {'punteggio':<11} {'richieste':>9} {'processati':>10} {'nodi':>6} {'archi':>7} "
+          f"{'peso':>7} {'popolarita':>10} {'archi/richiesta':>15}")
+    for budget in args.budget + [None]:
+        for punteggio in (PUNTEGGI if budget is not None else ('ampiezza',)):
+            r = esegui(punteggio, budget)
+            print(f"{budget if budget is not None else '-':>8} {punteggio:<11} {r['richieste']:>9} "
+                  f"{r['processati']:>10} {r['nodi']:>6} {r['archi']:>7} {r['peso']:>7} {r['popolarita']:>10} "
+                  f"{r['archi'] / r['richieste']:>15.2f}")
+    server.shutdown()
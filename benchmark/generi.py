@@ -0,0 +1,85 @@
+# Benchmark della mappatura dei generi: apply riga per riga contro scripts/generi.py
+#
+# Genera colonne 'genres' sintetiche da 100k a qualche milione di artisti
+# (da 0 a 4 generi per artista, presi con frequenze a coda lunga da un
+# vocabolario con i generi di GENRE_MAPPING, micro-generi coperti solo dalle
+# regole e generi sconosciuti) e misura:
+#   apply     map_genres della versione precedente di map.py con df.apply
+#   esatti    ClassificatoreGeneri senza regole, deve dare lo stesso risultato
+#   regole    ClassificatoreGeneri con le regole, con la copertura ottenuta
+# Oltre --limite-vecchio righe la versione con apply non viene eseguita.
+#
+# Uso:
+#     python -m benchmark.generi [--artisti 100000 1000000 3000000] [--limite-vecchio 1000000]
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.generi import GENRE_MAPPING, ClassificatoreGeneri
+
+MICRO_GENERI = ['italian trap', 'brazilian trap', 'trap soul', 'cloud rap', 'french rap', 'new york drill',
+                'chicago drill', 'afro house', 'latin house', 'tech house', 'cumbia sonidera', 'latin r&b',
+                'latin indie', 'salsa choke', 'electro house', 'funk melody', 'k-indie', 'art pop',
+                'german hip hop', 'reggaeton flow', 'corridos alternativos', 'norteño-sax']
+SCONOSCIUTI = ['flamenco', 'reggae', 'soca', 'bolero', 'samba', 'zouk', 'opera', 'comedy', 'grime',
+               'sertanejo', 'forró', 'hiplife', 'r&b', 'amapiano', 'trova', 'chamamé']
+
+
+def vecchio_map_genres(genres_str):
+    if pd.isna(genres_str) or not genres_str:
+        return ''
+    genres = [g.strip() for g in genres_str.split(';') if g.strip()]
+    mapped = []
+    for genre in genres:
+        if genre in GENRE_MAPPING:
+            mapped_genre = GENRE_MAPPING[genre]
+            if mapped_genre not in mapped:
+                mapped.append(mapped_genre)
+    return ';'.join(mapped[:2]) if mapped else ''
+
+
+def generi_sintetici(n_artisti, seed=0):
+    """Colonna genres con liste 'genere;genere' e valori mancanti, come in nodes.csv."""
+    rng = np.random.default_rng(seed)
+    vocabolario = np.array(list(GENRE_MAPPING) + MICRO_GENERI + SCONOSCIUTI, dtype=object)
+    rng.shuffle(vocabolario)
+    p = np.arange(1, len(vocabolario) + 1) ** -1.0
+    p /= p.sum()
+    numero = rng.choice(5, n_artisti, p=[0.2, 0.3, 0.25, 0.15, 0.1])
+    scelti = vocabolario[rng.choice(len(vocabolario), numero.sum(), p=p)]
+    inizi = np.concatenate([[0], np.cumsum(numero)])
+    generi = [';'.join(scelti[a:b]) for a, b in zip(inizi[:-1], inizi[1:])]
+    return pd.Series(generi, dtype=object).replace('', np.nan)
+
+
+def misura(funzione, *args):
+    inizio = time.perf_counter()
+    risultato = funzione(*args)
+    return risultato, time.perf_counter() - inizio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mappatura dei generi: apply contro classificatore")
+    parser.add_argument('--artisti', type=int, nargs='+', default=[100_000, 1_000_000, 3_000_000])
+    parser.add_argument('--limite-vecchio', type=int, default=1_000_000,
+                        help="numero massimo di righe per cui eseguire la versione con apply")
+    args = parser.parse_args()
+
+    print(f"{'artisti':>9} {'metodo':<8} {'tempo':>8} {'righe/s':>11} {'speedup':>8}  identici  copertura")
+    for n_artisti in args.artisti:
+        generi = generi_sintetici(n_artisti)
+        vecchio, t_vecchio = (None, None)
+        if n_artisti <= args.limite_vecchio:
+            vecchio, t_vecchio = misura(generi.apply, vecchio_map_genres)
+            print(f"{n_artisti:>9} {'apply':<8} {t_vecchio:>7.2f}s {n_artisti / t_vecchio:>11,.0f} {1:>7.1f}x")
+        for nome, regole in (('esatti', []), ('regole', None)):
+            # Classificatore nuovo a ogni misura: la cache dei generi non passa da una prova all'altra
+            (mappati, copertura), durata = misura(ClassificatoreGeneri(regole=regole).mappa_con_copertura, generi)
+            speedup = f"{t_vecchio / durata:>7.1f}x" if t_vecchio else f"{'-':>8}"
+            identici = str(mappati.equals(vecchio)) if vecchio is not None and nome == 'esatti' else '-'
+            quota = copertura['artisti_mappati'] / copertura['artisti_con_generi']
+            print(f"{n_artisti:>9} {nome:<8} {durata:>7.2f}s {n_artisti / durata:>11,.0f} {speedup}  "
+                  f"{identici:<8}  {quota:.1%}")
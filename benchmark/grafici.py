@@ -0,0 +1,87 @@
+# Benchmark dei due modi di scripts/scatterplot.py su grafi grandi
+#
+# Per liste di archi sintetiche da 10k a 10M righe disegna lo scatterplot in
+# un processo nuovo per ogni modo, senza finestra (backend Agg), misurando
+# tempo e picco di memoria (VmHWM, solo Linux, oltre il picco gia raggiunto
+# generando i dati) di aggregazione piu disegno e salvataggio del PNG a 300 dpi:
+#   punti     popolarita_archi e un punto per arco con ax.scatter
+#   densita   densita_archi (matrice 101x101) e pcolormesh in scala logaritmica
+# e controlla che la correlazione calcolata dalla matrice sia quella arco per arco.
+# Oltre --limite-punti archi il modo punti non viene eseguito.
+#
+# Uso:
+#     python -m benchmark.grafici [--archi 10000 100000 1000000 10000000] [--limite-punti 1000000]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+DISEGNO = """
+import json, os, sys, tempfile, time
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import LogNorm
+from scripts.aggregazioni import popolarita_archi, densita_archi, statistiche_densita, POPOLARITA_MAX
+from benchmark.aggregazioni import dati_sintetici
+
+def picco():
+    with open('/proc/self/status') as f:
+        return next(int(r.split()[1]) for r in f if r.startswith('VmHWM:'))
+
+righe, modo = int(sys.argv[1]), sys.argv[2]
+df_nodes, df_edges, _ = dati_sintetici(righe)
+# Il primo salvataggio carica font e backend, che non contano nella misura
+fig, ax = plt.subplots()
+fig.savefig(os.devnull, format='png')
+plt.close(fig)
+base = picco()
+inizio = time.perf_counter()
+fig, ax = plt.subplots(figsize=(10, 10))
+if modo == 'punti':
+    df = popolarita_archi(df_nodes, df_edges)
+    ax.scatter(df['source_popularity'], df['target_popularity'], alpha=0.4, s=df['weight'] * 15,
+               c=df['weight'], edgecolors='black', linewidths=0.5)
+    correlazione = df['source_popularity'].corr(df['target_popularity'])
+else:
+    conteggi, pesi = densita_archi(df_nodes, df_edges)
+    bordi = np.arange(POPOLARITA_MAX + 2) - 0.5
+    ax.pcolormesh(bordi, bordi, np.ma.masked_equal(pesi, 0).T, norm=LogNorm(vmin=1, vmax=max(pesi.max(), 1)),
+                  rasterized=True)
+    correlazione = statistiche_densita(conteggi, pesi)['correlazione']
+with tempfile.NamedTemporaryFile(suffix='.png') as f:
+    fig.savefig(f.name, dpi=300, bbox_inches='tight')
+durata = time.perf_counter() - inizio
+print(json.dumps({'archi': len(df_edges), 'tempo': durata, 'memoria': (picco() - base) / 1024,
+                  'correlazione': correlazione}))
+"""
+
+
+def misura(righe, modo):
+    risultato = subprocess.run([sys.executable, '-c', DISEGNO, str(righe), modo], capture_output=True,
+                               text=True, check=True, cwd=os.getcwd())
+    return json.loads(risultato.stdout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scatterplot con un punto per arco contro matrice di densita")
+    parser.add_argument('--archi', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--limite-punti', type=int, default=1_000_000,
+                        help="numero massimo di archi per cui disegnare un punto per arco")
+    args = parser.parse_args()
+
+    print(f"{'archi':>10} {'modo':<8} {'tempo':>8} {'memoria':>9} {'speedup':>8} {'correlazione':>13}  uguale")
+    for righe in args.archi:
+        densita = misura(righe, 'densita')
+        punti = misura(righe, 'punti') if righe <= args.limite_punti else None
+        for modo, r in (('punti', punti), ('densita', densita)):
+            if r is None:
+                print(f"{densita['archi']:>10} {modo:<8} {'-':>8} {'-':>9} {'-':>8} {'-':>13}  -")
+                continue
+            speedup = f"{punti['tempo'] / r['tempo']:>7.1f}x" if punti else f"{'-':>8}"
+            uguale = abs(punti['correlazione'] - r['correlazione']) < 1e-9 if punti else '-'
+            print(f"{r['archi']:>10} {modo:<8} {r['tempo']:>7.2f}s {r['memoria']:>7.0f}MB {speedup} "
+                  f"{r['correlazione']:>13.6f}  {uguale}")
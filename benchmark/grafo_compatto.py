@@ -0,0 +1,79 @@
+# Benchmark della memoria: Counter/dizionari contro scripts/grafo_compatto.py
+#
+# Simula l'accumulo del crawl per 100k e 1M di artisti: un profilo per
+# artista e --collaborazioni coppie per artista (con ripetizioni, gradi a
+# coda lunga come in benchmark.comune.grafo_sintetico). Ogni struttura viene
+# riempita in un processo nuovo e se ne misura la memoria residente (VmRSS,
+# solo Linux) al netto dei dati di partenza, oltre al tempo di inserimento.
+#
+# Uso:
+#     python -m benchmark.grafo_compatto [--artisti 100000 1000000] [--collaborazioni 8]
+
+import argparse
+import json
+import subprocess
+import sys
+
+RIEMPIMENTO = """
+import json, string, sys, time
+from collections import Counter
+import numpy as np
+from scripts.grafo_compatto import RegistroId, NodiColonnari, ArchiCompatti
+
+def residente():
+    with open('/proc/self/status') as f:
+        return next(int(r.split()[1]) for r in f if r.startswith('VmRSS:')) / 1024
+
+modo, n, k = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+rng = np.random.default_rng(0)
+alfabeto = np.array(list(string.ascii_letters + string.digits))
+ids = [''.join(r) for r in alfabeto[rng.integers(0, 62, (n, 22))]]
+p = np.arange(1, n + 1) ** -0.8
+p /= p.sum()
+u = rng.choice(n, n * k, p=p).tolist()
+v = rng.choice(n, n * k, p=p).tolist()
+popolarita = rng.integers(0, 100, n).tolist()
+base = residente()
+
+inizio = time.perf_counter()
+if modo == 'dizionari':
+    nodi, archi = {}, Counter()
+else:
+    registro = RegistroId()
+    nodi, archi = NodiColonnari(registro), ArchiCompatti(registro)
+for i in range(n):
+    nodi[ids[i]] = {'id': ids[i], 'name': f'Artista {i}', 'popularity': popolarita[i], 'genres': 'reggaeton;trap latino'}
+for a, b in zip(u, v):
+    if a == b:
+        continue
+    a, b = ids[a], ids[b]
+    pair = (a, b) if a < b else (b, a)
+    if modo == 'dizionari':
+        archi[pair] += 1
+    else:
+        archi.aggiungi(pair)
+n_archi = len(archi)
+durata = time.perf_counter() - inizio
+print(json.dumps({'memoria': residente() - base, 'tempo': durata, 'archi': n_archi}))
+"""
+
+
+def misura(modo, n_artisti, collaborazioni):
+    risultato = subprocess.run([sys.executable, '-c', RIEMPIMENTO, modo, str(n_artisti), str(collaborazioni)],
+                               capture_output=True, text=True, check=True)
+    return json.loads(risultato.stdout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria di nodi e archi del crawl: dizionari contro colonne")
+    parser.add_argument('--artisti', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--collaborazioni', type=int, default=8, help="coppie registrate per artista")
+    args = parser.parse_args()
+
+    print(f"{'artisti':>9} {'archi':>9} {'struttura':<10} {'memoria':>9} {'tempo':>8} {'riduzione':>10}")
+    for n_artisti in args.artisti:
+        dizionari = misura('dizionari', n_artisti, args.collaborazioni)
+        compatto = misura('compatto', n_artisti, args.collaborazioni)
+        for nome, r in (('dizionari', dizionari), ('compatto', compatto)):
+            print(f"{n_artisti:>9} {r['archi']:>9} {nome:<10} {r['memoria']:>7.0f}MB {r['tempo']:>7.1f}s "
+                  f"{dizionari['memoria'] / r['memoria']:>9.1f}x")
@@ -0,0 +1,67 @@
+# Benchmark delle metriche di rete (scripts/metriche.py) dal grafo attuale fino a 1M di archi
+#
+# Grado pesato, autovettore e Louvain sono misurati sull'intero grafo. Le
+# metriche sui cammini minimi (eccentricita, closeness, betweenness) costano
+# O(n*m): oltre --limite-esatte nodi il tempo viene stimato visitando un
+# campione di sorgenti e moltiplicando per n / campione.
+#
+# Uso:
+#     python -m benchmark.metriche [--max-archi 1000000] [--campione 128]
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from scripts.metriche import (Grafo, carica_grafo, grado_pesato, cammini_minimi, autovettore,
+                              louvain, modularita)
+from benchmark.comune import grafo_sintetico
+
+GRAFO_ATTUALE = ('data/old/grezzi/nodes.csv', 'data/old/grezzi/edges.csv')
+SCALE = [(10_000, 30_000), (30_000, 100_000), (100_000, 300_000), (300_000, 1_000_000)]
+
+
+def cronometra(funzione, *args, **kwargs):
+    inizio = time.perf_counter()
+    risultato = funzione(*args, **kwargs)
+    return risultato, time.perf_counter() - inizio
+
+
+def misura(nome, g, limite_esatte, campione):
+    _, t_grado = cronometra(grado_pesato, g)
+    _, t_autovettore = cronometra(autovettore, g)
+    etichette, t_louvain = cronometra(louvain, g)
+
+    if g.n <= limite_esatte:
+        _, t_cammini = cronometra(cammini_minimi, g)
+        nota = ""
+    else:
+        sorgenti = np.random.default_rng(0).choice(g.n, size=campione, replace=False)
+        _, t_campione = cronometra(cammini_minimi, g, sorgenti)
+        t_cammini = t_campione * g.n / campione
+        nota = " (stima)"
+
+    print(f"{nome:<10} {g.n:>8} {g.n_archi:>9} {t_grado:>8.3f} {t_autovettore:>8.3f} "
+          f"{t_louvain:>8.2f} {t_cammini:>10.1f}{nota}  Q={modularita(g, etichette):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tempi delle metriche di rete al crescere del grafo")
+    parser.add_argument('--max-archi', type=int, default=1_000_000)
+    parser.add_argument('--limite-esatte', type=int, default=10_000,
+                        help="oltre questo numero di nodi i cammini minimi sono stimati su un campione")
+    parser.add_argument('--campione', type=int, default=128, help="sorgenti visitate per la stima")
+    args = parser.parse_args()
+
+    print(f"{'grafo':<10} {'nodi':>8} {'archi':>9} {'grado':>8} {'autovet':>8} {'louvain':>8} {'cammini':>10}")
+    if all(os.path.exists(p) for p in GRAFO_ATTUALE):
+        g, _ = carica_grafo(*GRAFO_ATTUALE)
+        misura('attuale', g, args.limite_esatte, args.campione)
+
+    for n_nodi, n_archi in SCALE:
+        if n_archi > args.max_archi:
+            break
+        df_nodes, df_edges = grafo_sintetico(n_nodi, n_archi)
+        g = Grafo(df_nodes['id'], df_edges['source'], df_edges['target'], df_edges['weight'])
+        misura(f"{n_archi // 1000}k", g, args.limite_esatte, args.campione)
@@ -0,0 +1,88 @@
+# Benchmark dell'aggiornamento incrementale delle metriche (scripts/metriche_incrementali.py)
+#
+# Su grafi sintetici (e sul grafo di data/old/grezzi) toglie --delta archi
+# unitari, calcola da zero grado pesato, autovettore, PageRank, componenti e
+# Louvain sul grafo senza delta e ne salva lo stato, poi confronta sul grafo
+# completo il ricalcolo da zero con l'aggiornamento incrementale: tempi,
+# differenza massima di autovettore e PageRank, componenti identiche e
+# modularita delle due partizioni. I cammini minimi non sono inclusi: nel
+# modo incrementale non vengono ricalcolati.
+#
+# Uso:
+#     python -m benchmark.metriche_incrementali [--archi 100000 500000] [--delta 100 1000]
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts.archivio import indici_nodi
+from scripts.metriche import Grafo, autovettore, pagerank, componenti, louvain, grado_pesato, modularita
+from scripts.metriche_incrementali import salva_stato, carica_stato, aggiorna_metriche
+from benchmark.comune import grafo_sintetico
+
+GRAFO_ATTUALE = ('data/old/grezzi/nodes.csv', 'data/old/grezzi/edges.csv')
+
+
+def completo(g):
+    return pd.DataFrame({'id': g.ids, 'weighted degree': grado_pesato(g), 'eigenvector': autovettore(g),
+                         'pageranks': pagerank(g)[0], 'componentnumber': componenti(g),
+                         'modularity_class': louvain(g)})
+
+
+def separa_delta(df_edges, n_delta, seed=0):
+    """Archi prima del delta e delta di n_delta incrementi unitari presi tra gli archi esistenti."""
+    scelti = np.random.default_rng(seed).choice(len(df_edges), n_delta, replace=False)
+    df_delta = df_edges.iloc[scelti][['source', 'target']].assign(weight=1)
+    prima = df_edges.copy()
+    prima.loc[prima.index[scelti], 'weight'] -= 1
+    return prima[prima['weight'] > 0], df_delta
+
+
+def misura(nome, df_nodes, df_edges, n_delta):
+    prima, df_delta = separa_delta(df_edges, n_delta)
+    g_prima = Grafo(indici_nodi(df_nodes, prima), prima['source'], prima['target'], prima['weight'])
+    cartella = tempfile.mkdtemp(prefix='benchmark-stato-')
+    salva_stato(cartella, g_prima, completo(g_prima))
+
+    g = Grafo(indici_nodi(df_nodes, df_edges), df_edges['source'], df_edges['target'], df_edges['weight'])
+    inizio = time.perf_counter()
+    df_completo = completo(g)
+    t_completo = time.perf_counter() - inizio
+    inizio = time.perf_counter()
+    df_incrementale, _, riepilogo = aggiorna_metriche(g, carica_stato(cartella), df_delta)
+    t_incrementale = time.perf_counter() - inizio
+    os.remove(os.path.join(cartella, 'stato.npz'))
+    os.rmdir(cartella)
+
+    d_autovettore = np.abs(df_completo['eigenvector'] - df_incrementale['eigenvector']).max()
+    d_pagerank = np.abs(df_completo['pageranks'] - df_incrementale['pageranks']).max()
+    componenti_uguali = (df_completo['componentnumber'] == df_incrementale['componentnumber']).all()
+    q_completo = modularita(g, df_completo['modularity_class'].to_numpy())
+    q_incrementale = modularita(g, df_incrementale['modularity_class'].to_numpy())
+    print(f"{nome:<10} {g.n_archi:>9} {n_delta:>6} {t_completo:>9.2f}s {t_incrementale:>9.2f}s "
+          f"{t_completo / t_incrementale:>7.1f}x {d_autovettore:>9.1e} {d_pagerank:>9.1e} "
+          f"{str(componenti_uguali):<6} {q_completo:.4f}/{q_incrementale:.4f}  "
+          f"{riepilogo['nodi_ricalcolati']} nodi liberi")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metriche da zero contro aggiornamento con un delta")
+    parser.add_argument('--archi', type=int, nargs='+', default=[100_000, 500_000])
+    parser.add_argument('--delta', type=int, nargs='+', default=[100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'grafo':<10} {'archi':>9} {'delta':>6} {'completo':>10} {'increm.':>10} {'speedup':>8} "
+          f"{'d autov':>9} {'d pagerank':>9} {'comp.':<6} modularita")
+    if all(os.path.exists(p) for p in GRAFO_ATTUALE):
+        df_nodes, df_edges = (pd.read_csv(p) for p in GRAFO_ATTUALE)
+        for n_delta in args.delta:
+            if n_delta < len(df_edges):
+                misura('attuale', df_nodes, df_edges, n_delta)
+    for n_archi in args.archi:
+        df_nodes, df_edges = grafo_sintetico(n_archi // 5, n_archi)
+        for n_delta in args.delta:
+            misura('sintetico', df_nodes, df_edges, n_delta)
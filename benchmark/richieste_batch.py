@@ -0,0 +1,57 @@
+# Benchmark del numero di richieste: chiamate per artista/album contro endpoint multi-ID
+#
+# Uso:
+#     python -m benchmark.richieste_batch [--fixture catalogo.json] [--artisti 200]
+
+import argparse
+import time
+
+from scripts.collection import get_artist_info, get_collaborations
+from scripts.batch import a_blocchi, collaborazioni_blocco
+from benchmark.comune import prepara_catalogo, avvia
+
+DIMENSIONE_BLOCCO = 50
+
+
+def vecchio(sp, frontiera):
+    """Comportamento precedente: sp.artist e sp.album_tracks chiamati uno alla volta."""
+    risultati = {}
+    for artist_id in frontiera:
+        get_artist_info(sp, artist_id)
+        risultati[artist_id] = set(get_collaborations(sp, artist_id))
+    return risultati
+
+
+def nuovo(sp, frontiera):
+    """Frontiera risolta a blocchi con sp.artists e sp.albums."""
+    risultati = {}
+    for blocco in a_blocchi(frontiera, DIMENSIONE_BLOCCO):
+        _, collabs, _ = collaborazioni_blocco(sp, blocco, lambda a: True)
+        risultati.update({a: set(c) for a, c in collabs.items()})
+    return risultati
+
+
+def misura(server, funzione, sp, frontiera):
+    server.richieste.clear()
+    inizio = time.perf_counter()
+    risultati = funzione(sp, frontiera)
+    return risultati, sum(server.richieste.values()), dict(server.richieste), time.perf_counter() - inizio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confronto del numero di richieste con e senza batch")
+    parser.add_argument('--fixture', default=None)
+    parser.add_argument('--artisti', type=int, default=200, help="dimensione della frontiera")
+    args = parser.parse_args()
+
+    catalogo = prepara_catalogo(args.fixture)
+    server, sp = avvia(catalogo)
+    frontiera = list(catalogo['artists'])[:args.artisti]
+
+    r_vecchio, n_vecchio, dettaglio_vecchio, t_vecchio = misura(server, vecchio, sp, frontiera)
+    r_nuovo, n_nuovo, dettaglio_nuovo, t_nuovo = misura(server, nuovo, sp, frontiera)
+
+    print(f"Frontiera: {len(frontiera)} artisti, {sum(len(catalogo['artist_albums'][a]) for a in frontiera)} album")
+    print(f"Per artista/album: {n_vecchio} richieste in {t_vecchio:.2f}s {dettaglio_vecchio}")
+    print(f"A blocchi:         {n_nuovo} richieste in {t_nuovo:.2f}s {dettaglio_nuovo}")
+    print(f"Riduzione: {n_vecchio / n_nuovo:.1f}x, risultati identici: {r_vecchio == r_nuovo}")
@@ -0,0 +1,272 @@
+# Suite di benchmark riproducibile, con lo storico dei risultati esecuzione per esecuzione
+#
+# Nessun caso richiede credenziali:
+#   crawl, crawl-asincrono   main.main su un server Spotify locale, con il catalogo
+#                            ricostruito dal crawl registrato in data/old/grezzi
+#                            (oppure sintetico con --sintetico)
+#   collaborazioni           get_collaborations di scripts/collection.py, artista per artista
+#   generi                   mappatura dei generi di map.py (ClassificatoreGeneri)
+#   grafo-nazioni            aggregazione di crea_grafo_nazioni (collaborazioni_nazioni)
+#   contrazioni              contrai_grafo per nazione, genere, comunita e popolarita insieme
+#   esportazione             scrittura GEXF in streaming di scripts/esportazione.py
+#   scatterplot              popolarita degli estremi di ogni arco (popolarita_archi)
+#   heatmap                  matrice comunita x generi di heatmap.py (contrazione.incrocio)
+# I casi su tabelle usano i grafi sintetici di benchmark.comune.grafo_sintetico
+# alle scale indicate (numero di archi o di artisti).
+#
+# Ogni caso viene ripetuto --ripetizioni volte e la mediana viene aggiunta a
+# benchmark/storico.jsonl con data, commit e macchina, poi confrontata con
+# l'ultima esecuzione dello stesso caso sulla stessa macchina: un peggioramento
+# oltre --soglia viene segnalato come regressione (codice di uscita 1 con --severo).
+# Lo storico dipende dalla macchina e resta fuori da git (.gitignore).
+#
+# Uso:
+#     python -m benchmark.suite [--casi generi heatmap] [--scale 10000 100000] [--ripetizioni 3]
+#     python -m benchmark.suite --senza-storico      (solo misura, nulla viene scritto)
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmark.aggregazioni import dati_sintetici
+from benchmark.comune import prepara_catalogo, avvia
+from benchmark.generi import generi_sintetici
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORICO = os.path.join(RADICE, 'benchmark', 'storico.jsonl')
+REGISTRATO = os.path.join(RADICE, 'data', 'old', 'grezzi')
+SEMI = os.path.join(RADICE, 'seeds.txt')
+SCALE_DEFAULT = [10_000, 100_000, 1_000_000]
+ARTISTI_COLLABORAZIONI = 100
+
+
+class Server:
+    """Server Spotify locale condiviso dai casi che fanno richieste, avviato al primo uso."""
+
+    def __init__(self, sintetico=False, profondita=1):
+        self.sintetico = sintetico
+        self.profondita = profondita
+        self.server = None
+        self.sp = None
+
+    def avvia(self):
+        if self.server is None:
+            os.environ.setdefault('SPOTIPY_CLIENT_ID', 'benchmark')
+            os.environ.setdefault('SPOTIPY_CLIENT_SECRET', 'benchmark')
+            if self.sintetico:
+                catalogo = prepara_catalogo(n_artisti=1000, semi=SEMI)
+            else:
+                from scripts.mock_spotify import catalogo_registrato
+                catalogo = catalogo_registrato(REGISTRATO)
+            self.server, self.sp = avvia(catalogo)
+        return self.sp
+
+
+def caso_crawl(server, asincrono):
+    """Crawl completo di main.py in una cartella temporanea, ripartendo ogni volta da zero."""
+    def prepara(scala):
+        server.avvia()
+        import main
+        main.MAX_DEPTH = server.profondita
+        cartella = tempfile.mkdtemp(prefix='benchmark-crawl-')
+        shutil.copy(SEMI, cartella)
+
+        def esegui():
+            precedente = os.getcwd()
+            os.chdir(cartella)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main.main(asincrono=asincrono, nuovo=True)
+            finally:
+                os.chdir(precedente)
+                shutil.rmtree(cartella, ignore_errors=True)
+        return esegui
+    return prepara
+
+
+def caso_collaborazioni(server):
+    def prepara(scala):
+        from scripts.collection import get_collaborations
+        from scripts.mock_spotify import leggi_semi
+        sp = server.avvia()
+        ids = list(dict.fromkeys(leggi_semi(SEMI) + list(server.server.catalogo['artists'])))
+        ids = ids[:ARTISTI_COLLABORAZIONI]
+        return lambda: [get_collaborations(sp, artist_id) for artist_id in ids]
+    return prepara
+
+
+def caso_generi(scala):
+    from scripts.generi import ClassificatoreGeneri
+    generi = generi_sintetici(scala)
+    return lambda: ClassificatoreGeneri().mappa_con_copertura(generi)
+
+
+def caso_nazioni(scala):
+    from scripts.aggregazioni import collaborazioni_nazioni
+    _, df_edges, df_artisti = dati_sintetici(scala)
+    return lambda: collaborazioni_nazioni(df_artisti, df_edges)
+
+
+def caso_contrazioni(scala):
+    from scripts.contrazione import contrai_grafo
+    df_nodes, df_edges, df_artisti = dati_sintetici(scala)
+    df_nodes = df_nodes.assign(country=df_artisti['country'].to_numpy())
+    attributi = ['country', 'genres_mapped', 'modularity_class', 'popularity']
+    return lambda: contrai_grafo(df_nodes, df_edges, attributi, fasce={'popularity': 10})
+
+
+def caso_esportazione(scala):
+    from scripts.esportazione import scrivi_grafo, BLOCCO
+    df_nodes, df_edges, _ = dati_sintetici(scala)
+    colonne = [df_edges[c].to_numpy() for c in ('source', 'target', 'weight')]
+
+    def esegui():
+        blocchi = ([c[i:i + BLOCCO] for c in colonne] for i in range(0, len(df_edges), BLOCCO))
+        with tempfile.TemporaryDirectory() as cartella:
+            scrivi_grafo(os.path.join(cartella, 'rete.gexf'), df_nodes, blocchi)
+    return esegui
+
+
+def caso_scatterplot(scala):
+    from scripts.aggregazioni import popolarita_archi
+    df_nodes, df_edges, _ = dati_sintetici(scala)
+    return lambda: popolarita_archi(df_nodes, df_edges)
+
+
+def caso_heatmap(scala):
+    from scripts.contrazione import incrocio
+    df_nodes, _, _ = dati_sintetici(scala)
+    return lambda: incrocio(df_nodes['modularity_class'], df_nodes['genres_mapped'])
+
+
+def casi_disponibili(server):
+    """Nome -> (preparazione, usa le scale). I casi con richieste HTTP girano su un catalogo fisso."""
+    return {
+        'crawl': (caso_crawl(server, asincrono=False), False),
+        'crawl-asincrono': (caso_crawl(server, asincrono=True), False),
+        'collaborazioni': (caso_collaborazioni(server), False),
+        'generi': (caso_generi, True),
+        'grafo-nazioni': (caso_nazioni, True),
+        'contrazioni': (caso_contrazioni, True),
+        'esportazione': (caso_esportazione, True),
+        'scatterplot': (caso_scatterplot, True),
+        'heatmap': (caso_heatmap, True),
+    }
+
+
+def misura(prepara, scala, ripetizioni):
+    """Tempi di ripetizioni esecuzioni; la preparazione dei dati non viene misurata."""
+    tempi = []
+    for _ in range(ripetizioni):
+        esegui = prepara(scala)
+        gc.collect()
+        inizio = time.perf_counter()
+        esegui()
+        tempi.append(time.perf_counter() - inizio)
+    return tempi
+
+
+def commit_corrente():
+    """Commit della copia di lavoro, con '+' se ci sono modifiche non salvate."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RADICE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        modifiche = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=RADICE,
+                                   capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+' if modifiche else '')
+
+
+def leggi_storico(percorso):
+    if not os.path.exists(percorso):
+        return []
+    with open(percorso, encoding='utf-8') as f:
+        return [json.loads(riga) for riga in f if riga.strip()]
+
+
+def ultima_esecuzione(storico, voce):
+    """Ultimo risultato registrato dello stesso caso, con la stessa scala e parametri, sulla stessa macchina."""
+    campi = ('caso', 'scala', 'parametri', 'macchina')
+    for precedente in reversed(storico):
+        if all(precedente.get(c) == voce[c] for c in campi):
+            return precedente
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suite di benchmark con storico dei risultati")
+    parser.add_argument('--casi', nargs='+', default=None, help="casi da eseguire (default: tutti)")
+    parser.add_argument('--scale', type=int, nargs='+', default=SCALE_DEFAULT,
+                        help="righe dei dati sintetici per i casi su tabelle")
+    parser.add_argument('--ripetizioni', type=int, default=3)
+    parser.add_argument('--profondita', type=int, default=2, help="profondita dei casi crawl")
+    parser.add_argument('--sintetico', action='store_true',
+                        help="catalogo sintetico invece di quello ricostruito da data/old/grezzi")
+    parser.add_argument('--soglia', type=float, default=0.10,
+                        help="peggioramento della mediana oltre il quale segnalare una regressione")
+    parser.add_argument('--storico', default=STORICO, help="file JSON Lines con i risultati precedenti")
+    parser.add_argument('--senza-storico', action='store_true', help="non legge e non aggiorna lo storico")
+    parser.add_argument('--macchina', default=platform.node(),
+                        help="nome della macchina: i confronti avvengono solo tra esecuzioni con lo stesso nome")
+    parser.add_argument('--severo', action='store_true', help="codice di uscita 1 se ci sono regressioni")
+    args = parser.parse_args()
+
+    server = Server(args.sintetico, args.profondita)
+    casi = casi_disponibili(server)
+    nomi = args.casi or list(casi)
+    sconosciuti = [n for n in nomi if n not in casi]
+    if sconosciuti:
+        parser.error(f"casi sconosciuti: {', '.join(sconosciuti)} (disponibili: {', '.join(casi)})")
+
+    storico = [] if args.senza_storico else leggi_storico(args.storico)
+    data, commit = datetime.now().isoformat(timespec='seconds'), commit_corrente()
+    nuovi, regressioni = [], []
+    # Risultati dei casi con richieste HTTP confrontabili solo a parita di catalogo e profondita
+    parametri = {'catalogo': 'sintetico' if args.sintetico else 'registrato', 'profondita': args.profondita}
+
+    print(f"{'caso':<16} {'scala':>9} {'mediana':>9} {'minimo':>9} {'precedente':>11} {'variazione':>10}")
+    for nome in nomi:
+        prepara, con_scale = casi[nome]
+        for scala in (args.scale if con_scale else [None]):
+            tempi = misura(prepara, scala, args.ripetizioni)
+            voce = {'data': data, 'commit': commit, 'macchina': args.macchina, 'python': platform.python_version(),
+                    'caso': nome, 'scala': scala, 'parametri': None if con_scale else parametri,
+                    'mediana': round(statistics.median(tempi), 5), 'minimo': round(min(tempi), 5),
+                    'tempi': [round(t, 5) for t in tempi]}
+            precedente = ultima_esecuzione(storico, voce)
+            confronto = f"{'-':>11} {'-':>10}"
+            if precedente is not None:
+                variazione = voce['mediana'] / precedente['mediana'] - 1
+                confronto = f"{precedente['mediana']:>10.3f}s {variazione:>+10.1%}"
+                if variazione > args.soglia:
+                    regressioni.append((nome, scala, precedente, variazione))
+                    confronto += '  REGRESSIONE'
+            print(f"{nome:<16} {scala or '-':>9} {voce['mediana']:>8.3f}s {voce['minimo']:>8.3f}s {confronto}")
+            nuovi.append(voce)
+
+    if server.server is not None:
+        server.server.shutdown()
+
+    if not args.senza_storico:
+        with open(args.storico, 'a', encoding='utf-8') as f:
+            for voce in nuovi:
+                f.write(json.dumps(voce) + '\n')
+        print(f"Risultati aggiunti a {args.storico} (commit {commit}, macchina {args.macchina})")
+
+    for nome, scala, precedente, variazione in regressioni:
+        print(f"Regressione: {nome} (scala {scala or '-'}) {variazione:+.1%} rispetto al commit "
+              f"{precedente['commit']} del {precedente['data']}")
+    if regressioni and args.severo:
+        sys.exit(1)
@@ -0,0 +1,151 @@
+# Benchmark del livello di trasporto HTTP (scripts/trasporto.py)
+#
+# Un server locale HTTP/1.1 con keep-alive risponde con un JSON simile a una
+# risposta di Spotify (compresso con gzip se il client lo chiede) e viene
+# interrogato in sequenza in tre modi:
+#   nuova        una connessione nuova per richiesta (requests.get, come
+#                SPARQLWrapper per ogni artista o spotipy senza sessione)
+#   condivisa    sessione di trasporto.crea_sessione, connessione riutilizzata
+#   senza gzip   come condivisa, ma con risposte non compresse
+# sia in chiaro sia su TLS, con un certificato autofirmato creato con openssl
+# (se openssl non c'e, solo in chiaro). Per ogni modo: latenza media e p95
+# per richiesta, connessioni aperte dal server e KB ricevuti per risposta.
+# Con --rtt il server aspetta il tempo indicato prima di ogni risposta e,
+# per ogni connessione nuova, quello di una stretta di mano TCP e una TLS.
+#
+# Uso:
+#     python -m benchmark.trasporto [--richieste 500] [--rtt 0.02]
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from scripts.trasporto import crea_sessione
+
+ARTISTI_PER_RISPOSTA = 50
+
+
+def corpo_di_prova():
+    """Risposta di /artists con 50 profili, circa 15 KB di JSON."""
+    artisti = [{'id': f'{i:022d}', 'name': f'Artista {i}', 'popularity': i % 100, 'type': 'artist',
+                'genres': ['reggaeton', 'trap latino', 'urbano latino'], 'followers': {'total': 1000 * i},
+                'uri': f'spotify:artist:{i:022d}', 'href': f'https://api.spotify.com/v1/artists/{i:022d}'}
+               for i in range(ARTISTI_PER_RISPOSTA)]
+    return json.dumps({'artists': artisti}).encode('utf-8')
+
+
+class GestoreProva(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connessioni += 1
+        # Strette di mano TCP e, su TLS, quella del protocollo: un giro ciascuna
+        time.sleep(self.server.rtt * (2 if self.server.tls else 1))
+
+    def do_GET(self):
+        time.sleep(self.server.rtt)
+        dati = self.server.corpo
+        compresso = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if compresso:
+            dati = self.server.corpo_gzip
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dati)))
+        if compresso:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(dati)
+
+
+def certificato(cartella):
+    """Certificato autofirmato per 127.0.0.1 (None se openssl non e disponibile)."""
+    if shutil.which('openssl') is None:
+        return None
+    cert, chiave = os.path.join(cartella, 'cert.pem'), os.path.join(cartella, 'chiave.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-keyout', chiave, '-out', cert, '-subj', '/CN=127.0.0.1',
+                    '-addext', 'subjectAltName=IP:127.0.0.1'], check=True, capture_output=True)
+    return cert, chiave
+
+
+def avvia_server(rtt, tls=None):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GestoreProva)
+    server.daemon_threads = True
+    server.rtt, server.tls = rtt, tls is not None
+    server.corpo = corpo_di_prova()
+    server.corpo_gzip = gzip.compress(server.corpo)
+    server.connessioni = 0
+    server.lock = threading.Lock()
+    if tls is not None:
+        contesto = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        contesto.load_cert_chain(*tls)
+        server.socket = contesto.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def misura(server, url, verifica, richieste, modo):
+    """Latenze (s) e KB ricevuti per risposta di richieste GET in sequenza."""
+    sessione = None
+    if modo != 'nuova':
+        sessione = crea_sessione(1, 1)
+        if modo == 'senza gzip':
+            sessione.headers['Accept-Encoding'] = 'identity'
+    server.connessioni = 0
+    latenze, ricevuti = [], 0
+    for _ in range(richieste):
+        inizio = time.perf_counter()
+        risposta = (sessione or requests).get(url, verify=verifica, timeout=10)
+        risposta.json()
+        latenze.append(time.perf_counter() - inizio)
+        ricevuti += int(risposta.headers['Content-Length'])
+    if sessione is not None:
+        sessione.close()
+    return latenze, ricevuti / richieste / 1024, server.connessioni
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connessione nuova per richiesta contro sessione condivisa")
+    parser.add_argument('--richieste', type=int, default=500)
+    parser.add_argument('--rtt', type=float, default=0.0, help="tempo di andata e ritorno simulato (secondi)")
+    args = parser.parse_args()
+
+    cartella = tempfile.mkdtemp()
+    try:
+        tls = certificato(cartella)
+        protocolli = [('http', None)] + ([('https', tls)] if tls else [])
+        print(f"{'protocollo':<10} {'modo':<11} {'media':>9} {'p95':>9} {'connessioni':>11} {'KB/risposta':>11}")
+        for protocollo, chiavi in protocolli:
+            server = avvia_server(args.rtt, chiavi)
+            url = f"{protocollo}://127.0.0.1:{server.server_port}/v1/artists"
+            verifica = chiavi[0] if chiavi else True
+            medie = {}
+            for modo in ('nuova', 'condivisa', 'senza gzip'):
+                latenze, kb, connessioni = misura(server, url, verifica, args.richieste, modo)
+                medie[modo] = statistics.mean(latenze)
+                p95 = statistics.quantiles(latenze, n=20)[-1]
+                print(f"{protocollo:<10} {modo:<11} {medie[modo] * 1000:>7.2f}ms {p95 * 1000:>7.2f}ms "
+                      f"{connessioni:>11} {kb:>11.1f}")
+            print(f"{protocollo:<10} risparmio per richiesta con la sessione condivisa: "
+                  f"{(medie['nuova'] - medie['condivisa']) * 1000:.2f}ms "
+                  f"({medie['nuova'] / medie['condivisa']:.1f}x)")
+            server.shutdown()
+    finally:
+        shutil.rmtree(cartella)
@@ -1,11 +1,18 @@
 # Script principale per raccogliere dati di collaborazioni musicali da Spotify
 
-import pandas as pd
-import time
 import os
-from collections import Counter
+import argparse
 from scripts.utils import get_spotify_client
-from scripts.collection import get_artist_info, get_collaborations
+from scripts.batch import a_blocchi, collaborazioni_blocco, profili_artisti
+from scripts.crawler import CrawlerAsincrono, CONCORRENZA_DEFAULT, DIMENSIONE_BLOCCO, registra_blocco
+from scripts.ratelimit import stampa_statistiche
+from scripts.cache import stampa_statistiche as stampa_statistiche_cache
+from scripts.trasporto import stampa_statistiche as stampa_statistiche_trasporto
+from scripts.misure import misure
+from scripts.checkpoint import StatoCrawl, PERCORSO_CHECKPOINT, salva_archi
+from scripts.incrementale import Discografie, aggiorna
+from scripts.parallelo import CrawlerParallelo
+from scripts.frontiera import CrawlerPriorita, PUNTEGGI
 
 MAX_DEPTH = 1
 
@@ -25,99 +32,170 @@ def load_seeds(filepath):
     return seeds
 
 
-def main():
-    """Funzione principale che coordina la raccolta dati."""
-    sp = get_spotify_client()
-    seeds = load_seeds('seeds.txt')
-    
-    nodes_data = {}
-    edge_counts = Counter()
-    processed_ids = set()
-    current_level_queue = seeds
-
-    print(f"Inizio raccolta dati con profondita {MAX_DEPTH}")
+def crawl(sp, stato):
+    """Visita in ampiezza sequenziale delle collaborazioni, registrando ogni artista nello stato."""
+    current_level_queue = stato.current_level_queue
 
     # Raccolta dati per livello di profondità
-    for depth in range(MAX_DEPTH):
-        print(f"Analisi livello {depth + 1}")
-        next_level_queue = []
-        
-        for artist_id in current_level_queue:
-            if artist_id in processed_ids:
-                continue
-            
-            try:
-                if artist_id not in nodes_data:
-                    info = get_artist_info(sp, artist_id)
-                    info['genres'] = ';'.join(info['genres']) if info['genres'] else ""
-                    nodes_data[artist_id] = info
-
-                collabs = get_collaborations(sp, artist_id)
-                print(f"Processato: {nodes_data[artist_id]['name']} ({len(collabs)} collaborazioni)")
-                
-                for a, b in collabs:
-                    pair = tuple(sorted((a, b)))
-                    edge_counts[pair] += 1
-                    
-                    if a not in processed_ids: next_level_queue.append(a)
-                    if b not in processed_ids: next_level_queue.append(b)
-                
-                processed_ids.add(artist_id)
-                time.sleep(1.0)
-                
-            except Exception as e:
-                print(f"Errore con {artist_id}: {e}")
+    while stato.depth < MAX_DEPTH:
+        print(f"Analisi livello {stato.depth + 1}")
+
+        # Gli artisti del livello vengono risolti a blocchi con gli endpoint multi-ID
+        da_processare = [a for a in dict.fromkeys(current_level_queue) if a not in stato.processed_ids]
+        # Un errore del blocco viene ripreso artista per artista da collaborazioni_blocco
+        for blocco in a_blocchi(da_processare, DIMENSIONE_BLOCCO):
+            profili, risultati, albums = collaborazioni_blocco(sp, blocco, lambda a: a not in stato.nodes_data)
+            registra_blocco(stato, blocco, profili, risultati, albums)
 
-        current_level_queue = list(set(next_level_queue))
+        current_level_queue = stato.chiudi_livello()
         if not current_level_queue:
             break
 
-    # Recupero profili degli artisti scoperti ma non ancora processati
+
+def recupera_profili_mancanti(sp, stato, limite=None):
+    """Scarica in batch i profili dei collaboratori scoperti ma non processati (al massimo limite richieste)."""
+    nodes_data = stato.nodes_data
     print("Recupero profili mancanti...")
     
-    all_discovered_ids = set()
-    for (u, v) in edge_counts.keys():
-        all_discovered_ids.add(u)
-        all_discovered_ids.add(v)
+    all_discovered_ids = stato.estremi()
 
-    missing_ids = list(all_discovered_ids - set(nodes_data.keys()))
+    # Ordinati, cosi i batch (e le relative chiavi di cache) sono uguali a ogni esecuzione
+    missing_ids = sorted(a for a in all_discovered_ids if a not in nodes_data)
+    if limite is not None and len(missing_ids) > limite * 50:
+        print(f"Budget di richieste esaurito: {len(missing_ids) - limite * 50} profili non scaricati")
+        missing_ids = missing_ids[:limite * 50]
     if missing_ids:
         print(f"Scaricamento dati per {len(missing_ids)} collaboratori esterni")
-        for i in range(0, len(missing_ids), 50):
-            batch = missing_ids[i:i+50]
+        for batch in a_blocchi(missing_ids, 50):
             try:
-                results = sp.artists(batch)
-                for artist in results['artists']:
-                    if artist:
-                        nodes_data[artist['id']] = {
-                            'id': artist['id'],
-                            'name': artist['name'],
-                            'popularity': artist['popularity'],
-                            'genres': ';'.join(artist['genres']) if artist['genres'] else ""
-                        }
-                time.sleep(0.5)
+                stato.registra_nodi(list(profili_artisti(sp, batch).values()))
             except Exception as e:
                 print(f"Errore batch: {e}")
 
-    # Salvataggio risultati su file CSV
+
+def salva_csv(nodes_data, archi):
+    """Salva nodi e archi nei file CSV usati da Gephi e dagli altri script."""
     if not os.path.exists('data/new/grezzi'): os.makedirs('data/new/grezzi')
     
-    df_nodes = pd.DataFrame(list(nodes_data.values())).drop_duplicates(subset='id')
-    
-    edges_list = []
-    for (u, v), w in edge_counts.items():
-        edges_list.append({
-            'source': u,
-            'target': v,
-            'weight': w
-        })
-    df_edges = pd.DataFrame(edges_list)
-
-    df_nodes.to_csv('data/new/grezzi/nodes.csv', index=False)
-    df_edges.to_csv('data/new/grezzi/edges.csv', index=False)
+    # Nodi gia in colonne (scripts/grafo_compatto.py), archi sommati dai livelli e scritti a blocchi
+    df_nodes = nodes_data.a_dataframe()
+
+    # CSV per Gephi piu archivio Parquet per gli script successivi
+    salva_archi(df_nodes, archi, 'data/new/grezzi')
     
-    print(f"Completato: {len(df_nodes)} nodi e {len(df_edges)} archi salvati")
+    print(f"Completato: {len(df_nodes)} nodi e {len(archi)} archi salvati")
+
+
+def stampa_misure(metriche):
+    """Riepilogo del tempo speso in rete, in attesa e in CPU; con metriche salva anche il file."""
+    misure.riepilogo()
+    if metriche:
+        misure.salva(metriche)
+        print(f"Misure salvate in {metriche}")
+
+
+def main(asincrono=False, concorrenza=CONCORRENZA_DEFAULT, solo_cache=False, nuovo=False, incrementale=False,
+         processi=None, metriche=None, profilo=None, priorita=None, budget_richieste=None, budget_tempo=None,
+         copertura=None):
+    """Funzione principale che coordina la raccolta dati."""
+    sp = get_spotify_client()
+    if solo_cache and sp.cache is not None:
+        sp.cache.solo_cache = True
+    discografie = Discografie()
+
+    # Aggiornamento incrementale: solo le uscite nuove degli artisti gia processati
+    if incrementale:
+        with misure.fase('incrementale', profilo):
+            aggiorna(sp, discografie)
+        discografie.chiudi()
+        stampa_statistiche()
+        stampa_statistiche_cache()
+        stampa_statistiche_trasporto()
+        stampa_misure(metriche)
+        return
+
+    seeds = load_seeds('seeds.txt')
+
+    # Un crawl interrotto viene ripreso dal checkpoint, altrimenti se ne inizia uno nuovo
+    stato = StatoCrawl(PERCORSO_CHECKPOINT, discografie=discografie)
+    if nuovo or not stato.in_corso:
+        stato.chiudi()
+        stato = StatoCrawl(PERCORSO_CHECKPOINT, nuovo=True, discografie=discografie)
+        print(f"Inizio raccolta dati con profondita {MAX_DEPTH}")
+    else:
+        print(f"Ripresa dal checkpoint: livello {stato.depth + 1}, {len(stato.processed_ids)} artisti gia processati")
+    stato.inizia(seeds)
+
+    crawler = None
+    try:
+        if stato.fase == 'crawl':
+            with misure.fase('crawl', profilo):
+                if priorita:
+                    crawler = CrawlerPriorita(sp, priorita, budget_richieste, budget_tempo)
+                    try:
+                        crawler.crawl(stato, MAX_DEPTH)
+                    finally:
+                        if copertura:
+                            crawler.salva_copertura(copertura)
+                            print(f"Copertura salvata in {copertura}")
+                elif processi:
+                    CrawlerParallelo(processi, solo_cache).crawl(stato, MAX_DEPTH)
+                elif asincrono:
+                    print(f"Modalita asincrona con {concorrenza} richieste contemporanee")
+                    CrawlerAsincrono(sp, concorrenza).crawl(stato, MAX_DEPTH)
+                else:
+                    crawl(sp, stato)
+        with misure.fase('profili', profilo):
+            recupera_profili_mancanti(sp, stato, crawler.richieste_rimaste() if crawler else None)
+    except KeyboardInterrupt:
+        print(f"Interrotto: stato salvato in {PERCORSO_CHECKPOINT}, rilanciare lo script per riprendere")
+        stato.chiudi()
+        stampa_misure(metriche)
+        return
+
+    with misure.fase('salvataggio', profilo), stato.archi() as archi:
+        salva_csv(stato.nodes_data, archi)
+    stato.completa()
+    stato.chiudi()
+    discografie.chiudi()
+    stampa_statistiche()
+    stampa_statistiche_cache()
+    stampa_statistiche_trasporto()
+    stampa_misure(metriche)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Raccolta delle collaborazioni musicali da Spotify")
+    parser.add_argument('--asincrono', action='store_true',
+                        help="scarica artisti e album in parallelo")
+    parser.add_argument('--concorrenza', type=int, default=CONCORRENZA_DEFAULT,
+                        help="numero massimo di richieste contemporanee in modalita asincrona")
+    parser.add_argument('--solo-cache', action='store_true',
+                        help="usa solo le risposte salvate in data/cache, senza accedere alla rete")
+    parser.add_argument('--nuovo', action='store_true',
+                        help="ignora il checkpoint di un crawl interrotto e ricomincia da capo")
+    parser.add_argument('--incrementale', action='store_true',
+                        help="aggiorna data/new/grezzi solo con le uscite nuove degli artisti gia processati")
+    parser.add_argument('--processi', type=int, default=None,
+                        help="divide ogni livello tra piu processi, ognuno con le proprie credenziali")
+    parser.add_argument('--metriche', default=None, metavar='PERCORSO',
+                        help="salva le misure delle richieste in JSON (.json) o formato Prometheus (.prom)")
+    parser.add_argument('--profilo', choices=['cprofile', 'pyinstrument'], default=None,
+                        help="profila ogni fase e salva il risultato in data/new/profili")
+    parser.add_argument('--priorita', choices=PUNTEGGI, default=None,
+                        help="processa la frontiera in ordine di punteggio invece che per livelli")
+    parser.add_argument('--budget-richieste', type=int, default=None,
+                        help="numero massimo di richieste a Spotify (implica --priorita peso se non indicata)")
+    parser.add_argument('--budget-tempo', type=float, default=None,
+                        help="secondi massimi di crawl (implica --priorita peso se non indicata)")
+    parser.add_argument('--copertura', default=None, metavar='PERCORSO',
+                        help="salva in CSV la copertura raggiunta dopo ogni blocco del crawl per priorita")
+    args = parser.parse_args()
+    if args.priorita is None and (args.budget_richieste is not None or args.budget_tempo is not None):
+        args.priorita = 'peso'
+    if args.priorita and (args.asincrono or args.processi):
+        parser.error("--priorita e i budget non si combinano con --asincrono o --processi")
+    main(asincrono=args.asincrono, concorrenza=args.concorrenza, solo_cache=args.solo_cache, nuovo=args.nuovo,
+         incrementale=args.incrementale, processi=args.processi, metriche=args.metriche, profilo=args.profilo,
+         priorita=args.priorita, budget_richieste=args.budget_richieste, budget_tempo=args.budget_tempo,
+         copertura=args.copertura)
\ No newline at end of file
@@ -0,0 +1,133 @@
+# Aggregazioni su colonne usate da grafo-nazionalita.py e scatterplot.py
+#
+# Sostituiscono i cicli con iterrows: a parita di input producono gli stessi
+# DataFrame (stesso ordine delle righe e stessi tipi), quindi gli stessi file
+# e grafici. Confronto dei tempi: python -m benchmark.aggregazioni
+# heatmap.py usa contrazione.incrocio, che generalizza queste aggregazioni a
+# qualsiasi attributo ma ordina per nome gli archi di pari peso;
+# grafo-nazionalita.py resta su collaborazioni_nazioni per mantenere
+# l'ordine per prima comparsa dei file precedenti.
+#
+# Per grafi con milioni di archi lo scatterplot usa densita_popolarita: la
+# popolarita va da 0 a 100, quindi archi e collaborazioni si riducono a due
+# matrici 101x101 da cui si ricavano anche le correlazioni, senza una riga
+# per arco. Confronto dei tempi: python -m benchmark.grafici
+
+import numpy as np
+import pandas as pd
+
+POPOLARITA_MAX = 100
+
+
+def collaborazioni_nazioni(df_artisti, df_edges):
+    """Somma i pesi degli archi per coppia di nazioni, nell'ordine di prima comparsa della coppia.
+
+    Restituisce (nazioni ordinate, DataFrame Source/Target/Weight/Type ordinato per peso).
+    """
+    # Come nel dizionario spotify_id -> country: a parita di ID vale l'ultima riga
+    artisti = df_artisti.drop_duplicates('spotify_id', keep='last')
+    country = artisti['country']
+    valide = country.notna() & (country.astype(str).str.lower() != 'unknown')
+
+    # Nazioni come categorie ordinate: il confronto tra codici equivale a quello tra nomi
+    nazioni = pd.Categorical(country.where(valide), categories=sorted(country[valide].unique()))
+    codici_artisti = np.asarray(nazioni.codes)
+
+    indice = pd.Index(artisti['spotify_id'])
+    codici = []
+    for colonna in ('source', 'target'):
+        pos = indice.get_indexer(df_edges[colonna])
+        codici.append(np.where(pos >= 0, codici_artisti[pos], -1))
+    cs, ct = codici
+    tenuti = (cs >= 0) & (ct >= 0)
+    primo = np.minimum(cs[tenuti], ct[tenuti])
+    secondo = np.maximum(cs[tenuti], ct[tenuti])
+
+    pesi = df_edges['weight'].to_numpy()[tenuti]
+    chiave = primo.astype(np.int64) * len(nazioni.categories) + secondo
+    somme = pd.Series(pesi).groupby(chiave, sort=False).sum()
+
+    categorie = nazioni.categories
+    coppie_primo = somme.index.to_numpy() // len(categorie)
+    coppie_secondo = somme.index.to_numpy() % len(categorie)
+    usate = np.unique(np.concatenate([coppie_primo, coppie_secondo]))
+
+    df_edges_output = pd.DataFrame({
+        'Source': np.asarray(categorie[coppie_primo], dtype=object),
+        'Target': np.asarray(categorie[coppie_secondo], dtype=object),
+        'Weight': somme.to_numpy(),
+        'Type': 'Undirected'
+    })
+    df_edges_output = df_edges_output.sort_values('Weight', ascending=False)
+    return list(categorie[usate]), df_edges_output
+
+
+def popolarita_archi(nodes_df, edges_df):
+    """Popolarita dei due artisti di ogni arco (archi con entrambi gli estremi in nodes_df)."""
+    popolarita = nodes_df.drop_duplicates('id', keep='last').set_index('id')['popularity']
+    tenuti = edges_df['source'].isin(popolarita.index) & edges_df['target'].isin(popolarita.index)
+    archi = edges_df[tenuti]
+    return pd.DataFrame({
+        'source_popularity': popolarita.reindex(archi['source']).to_numpy(),
+        'target_popularity': popolarita.reindex(archi['target']).to_numpy(),
+        'weight': archi['weight'].to_numpy()
+    })
+
+
+def popolarita_per_indice(nodes_df, ids):
+    """Popolarita dei nodi nell'ordine di ids (NaN per i nodi senza profilo)."""
+    popolarita = nodes_df.drop_duplicates('id', keep='last').set_index('id')['popularity']
+    return popolarita.reindex(ids).to_numpy(np.float64)
+
+
+def densita_popolarita(pop_source, pop_target, pesi):
+    """Archi e collaborazioni per coppia (popolarita source, popolarita target).
+
+    Restituisce (conteggi, pesi) come matrici (POPOLARITA_MAX+1) x (POPOLARITA_MAX+1)
+    indicizzate [source, target]; gli archi con un estremo senza popolarita sono
+    esclusi e le popolarita non intere vengono arrotondate.
+    """
+    validi = ~(np.isnan(pop_source) | np.isnan(pop_target))
+    lato = POPOLARITA_MAX + 1
+    x = np.clip(np.rint(pop_source[validi]), 0, POPOLARITA_MAX).astype(np.int64)
+    y = np.clip(np.rint(pop_target[validi]), 0, POPOLARITA_MAX).astype(np.int64)
+    celle = x * lato + y
+    conteggi = np.bincount(celle, minlength=lato * lato).reshape(lato, lato)
+    somme = np.bincount(celle, weights=np.asarray(pesi, dtype=np.float64)[validi], minlength=lato * lato)
+    return conteggi, somme.reshape(lato, lato)
+
+
+def densita_archi(nodes_df, edges_df):
+    """densita_popolarita a partire da nodes.csv ed edges.csv."""
+    popolarita = nodes_df.drop_duplicates('id', keep='last').set_index('id')['popularity']
+    valori = np.append(popolarita.to_numpy(np.float64), np.nan)
+    # Gli ID non trovati (-1) puntano al NaN aggiunto in fondo
+    return densita_popolarita(valori[popolarita.index.get_indexer(edges_df['source'])],
+                              valori[popolarita.index.get_indexer(edges_df['target'])],
+                              edges_df['weight'].to_numpy())
+
+
+def correlazione_densita(matrice):
+    """Correlazione di Pearson tra popolarita source e target, pesata con i valori della matrice."""
+    valori = np.arange(matrice.shape[0], dtype=np.float64)
+    totale = matrice.sum()
+    if totale == 0:
+        return float('nan')
+    px, py = matrice.sum(axis=1) / totale, matrice.sum(axis=0) / totale
+    mx, my = valori @ px, valori @ py
+    vx, vy = (valori - mx) ** 2 @ px, (valori - my) ** 2 @ py
+    cov = (valori - mx) @ (matrice / totale) @ (valori - my)
+    return float(cov / np.sqrt(vx * vy)) if vx > 0 and vy > 0 else float('nan')
+
+
+def statistiche_densita(conteggi, pesi):
+    """Statistiche dello scatterplot ricavate dalle matrici, uguali a quelle calcolate arco per arco."""
+    valori = np.arange(conteggi.shape[0])
+    distanza = np.abs(valori[:, None] - valori[None, :])
+    return {
+        'archi': int(conteggi.sum()),
+        'collaborazioni': float(pesi.sum()),
+        'correlazione': correlazione_densita(conteggi),
+        'correlazione_pesata': correlazione_densita(pesi),
+        'differenza_media': float((distanza * conteggi).sum() / max(conteggi.sum(), 1)),
+    }
@@ -0,0 +1,273 @@
+# Archivio colonnare (Parquet) per nodi, archi e tabelle derivate
+#
+# Ogni tabella viene salvata come file Parquet accanto al CSV di sempre, che
+# resta per Gephi e per chi lo apre a mano. Nel Parquet gli ID Spotify sono
+# colonne dictionary (ogni stringa compare una volta per blocco), i generi
+# sono liste di stringhe invece di testo separato da ';' e, per il grafo, gli
+# archi portano gli indici interi dei due estremi, cosi scripts/metriche.py
+# costruisce la matrice senza confrontare stringhe. La lettura usa il file
+# mappato in memoria e restituisce lo stesso DataFrame che darebbe read_csv.
+#
+# carica_tabella('.../nodes.csv') legge nodes.parquet se esiste ed e piu
+# recente del CSV, altrimenti il CSV: gli script funzionano con entrambi.
+# indici.parquet porta nei metadati dimensione e mtime di nodes.csv ed
+# edges.csv scritti con lui: gli indici valgono finche i CSV non cambiano.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+COLONNE_ID = ('id', 'Id', 'spotify_id', 'source', 'target', 'Source', 'Target')
+COLONNE_GENERI = ('genres', 'genres_mapped')
+FILE_INDICI = 'indici.parquet'
+
+
+def percorso_parquet(percorso):
+    return os.path.splitext(percorso)[0] + '.parquet'
+
+
+def _parquet_aggiornato(percorso):
+    """Vero se il Parquet esiste e non e piu vecchio del CSV corrispondente."""
+    parquet = percorso_parquet(percorso)
+    if not os.path.exists(parquet):
+        return False
+    return not os.path.exists(percorso) or os.path.getmtime(parquet) >= os.path.getmtime(percorso)
+
+
+def _in_arrow(df):
+    """DataFrame -> tabella Arrow con ID ripetuti dictionary e generi come liste."""
+    tabella = pa.Table.from_pandas(df, preserve_index=False)
+    for i, nome in enumerate(tabella.column_names):
+        colonna = tabella.column(i)
+        if not pa.types.is_string(colonna.type) and not pa.types.is_large_string(colonna.type):
+            continue
+        if nome in COLONNE_ID:
+            # Un dizionario di valori tutti diversi occuperebbe solo piu spazio
+            if pc.count_distinct(colonna).as_py() < len(colonna):
+                tabella = tabella.set_column(i, nome, pc.dictionary_encode(colonna))
+        elif nome in COLONNE_GENERI:
+            # Stringa vuota e valore mancante diventano entrambi null, come nella rilettura del CSV
+            vuota = pc.equal(colonna, '')
+            colonna = pc.if_else(vuota, pa.scalar(None, colonna.type), colonna)
+            tabella = tabella.set_column(i, nome, pc.split_pattern(colonna, ';'))
+    return tabella
+
+
+def _da_arrow(tabella, liste=False, categorie=False):
+    """Tabella Arrow -> DataFrame con gli stessi tipi di read_csv (salvo le opzioni)."""
+    for i, nome in enumerate(tabella.column_names):
+        colonna = tabella.column(i)
+        if pa.types.is_list(colonna.type) and not liste:
+            tabella = tabella.set_column(i, nome, pc.binary_join(colonna, ';'))
+    df = tabella.to_pandas(split_blocks=True, self_destruct=True)
+    del tabella
+    if not categorie:
+        # Da Categorical a stringhe: ogni riga punta alla stessa stringa Python del dizionario
+        for nome in df.columns:
+            if isinstance(df[nome].dtype, pd.CategoricalDtype):
+                df[nome] = np.asarray(df[nome], dtype=object)
+    # Il pool di Arrow tiene per se la memoria liberata dalla conversione
+    pa.default_memory_pool().release_unused()
+    return df
+
+
+def _leggi_parquet(parquet, colonne=None, liste=False, categorie=False):
+    """Legge il Parquet mappato in memoria, ricostruendo source/target dagli indici del grafo."""
+    schema = pq.read_schema(parquet)
+    metadati = schema.metadata or {}
+    if b'indici' not in metadati:
+        return _da_arrow(pq.read_table(parquet, columns=colonne, memory_map=True), liste, categorie)
+
+    # Archi di salva_grafo: gli estremi sono indici in indici.parquet, che fa da dizionario
+    if colonne is None:
+        colonne = [c[:-len('_indice')] if c.endswith('_indice') else c for c in schema.names]
+    lette = [f'{c}_indice' if f'{c}_indice' in schema.names else c for c in colonne]
+    df = _da_arrow(pq.read_table(parquet, columns=lette, memory_map=True), liste, categorie)
+    if lette == colonne:
+        return df
+    ids = pd.Index(pq.read_table(os.path.join(os.path.dirname(parquet), metadati[b'indici'].decode()),
+                                 memory_map=True).column('id').to_numpy(zero_copy_only=False))
+    for nome, letta in zip(colonne, lette):
+        if nome != letta:
+            codici = df[letta].to_numpy()
+            if categorie:
+                df[letta] = pd.Categorical.from_codes(codici, dtype=pd.CategoricalDtype(ids))
+            else:
+                df[letta] = ids.to_numpy()[codici]
+    df.columns = colonne
+    return df
+
+
+def salva_tabella(df, percorso, csv=True, **opzioni_csv):
+    """Salva df come Parquet e, se csv e vero, anche come CSV nel percorso indicato."""
+    cartella = os.path.dirname(percorso)
+    if cartella:
+        os.makedirs(cartella, exist_ok=True)
+    if csv:
+        df.to_csv(percorso, index=False, **opzioni_csv)
+    pq.write_table(_in_arrow(df), percorso_parquet(percorso))
+
+
+def carica_tabella(percorso, colonne=None, liste=False, categorie=False):
+    """Legge una tabella dal Parquet mappato in memoria se aggiornato, altrimenti dal CSV.
+
+    Con liste=True i generi restano liste di stringhe, con categorie=True gli ID
+    ripetuti diventano colonne Categorical (meno memoria). Solleva FileNotFoundError
+    se non esiste nessuno dei due file, come read_csv.
+    """
+    if _parquet_aggiornato(percorso):
+        return _leggi_parquet(percorso_parquet(percorso), colonne, liste, categorie)
+    df = pd.read_csv(percorso, usecols=colonne)
+    if liste:
+        for nome in COLONNE_GENERI:
+            if nome in df.columns:
+                df[nome] = df[nome].str.split(';')
+    if categorie:
+        for nome in COLONNE_ID:
+            if nome in df.columns and df[nome].duplicated().any():
+                df[nome] = df[nome].astype('category')
+    return df
+
+
+def indici_nodi(df_nodes, df_edges):
+    """Spazio degli indici del grafo: prima i nodi, poi gli estremi presenti solo negli archi."""
+    ids = pd.Index(df_nodes['id']).append(pd.Index(df_edges['source'])).append(pd.Index(df_edges['target']))
+    return ids.drop_duplicates()
+
+
+def _impronta(cartella):
+    """Dimensione e mtime (ns) di nodes.csv ed edges.csv, None per quelli assenti."""
+    impronta = {}
+    for nome in ('nodes.csv', 'edges.csv'):
+        percorso = os.path.join(cartella, nome)
+        if os.path.exists(percorso):
+            stat = os.stat(percorso)
+            impronta[nome] = [stat.st_size, stat.st_mtime_ns]
+        else:
+            impronta[nome] = None
+    return impronta
+
+
+def _scrivi_indici(indici, cartella):
+    """Scrive indici.parquet con l'impronta dei CSV gia scritti, da chiamare per ultimo."""
+    tabella = pa.table({'id': pa.array(indici, pa.string())})
+    tabella = tabella.replace_schema_metadata({'impronta': json.dumps(_impronta(cartella))})
+    pq.write_table(tabella, os.path.join(cartella, FILE_INDICI))
+
+
+def salva_grafo(df_nodes, df_edges, cartella, csv=True):
+    """Salva nodes/edges (Parquet e CSV); nel Parquet gli estremi degli archi sono indici interi.
+
+    indici.parquet contiene gli ID nell'ordine degli indici: prima le righe di
+    nodes, poi gli artisti presenti solo negli archi. Viene scritto per ultimo,
+    con l'impronta dei CSV nei metadati.
+    """
+    salva_tabella(df_nodes, os.path.join(cartella, 'nodes.csv'), csv=csv)
+    if csv:
+        df_edges.to_csv(os.path.join(cartella, 'edges.csv'), index=False)
+
+    ids = indici_nodi(df_nodes, df_edges)
+    colonne = {}
+    for nome in df_edges.columns:
+        if nome in ('source', 'target'):
+            colonne[f'{nome}_indice'] = pa.array(ids.get_indexer(df_edges[nome]), pa.int32())
+        else:
+            colonne[nome] = pa.array(df_edges[nome])
+    archi = pa.table(colonne).replace_schema_metadata({'indici': FILE_INDICI})
+    pq.write_table(archi, os.path.join(cartella, 'edges.parquet'))
+    _scrivi_indici(ids.to_numpy(), cartella)
+
+
+def salva_grafo_a_blocchi(df_nodes, ids, blocchi, cartella, csv=True):
+    """Come salva_grafo, con gli archi letti a blocchi invece che da un DataFrame.
+
+    blocchi() restituisce ogni volta un nuovo iteratore di (source, target,
+    weight) come array di indici in ids (ad esempio ArchiCompatti.blocchi):
+    viene percorso due volte per numerare gli estremi come indici_nodi, poi una
+    per scrivere. In memoria c'e un blocco alla volta oltre agli array degli indici.
+    """
+    salva_tabella(df_nodes, os.path.join(cartella, 'nodes.csv'), csv=csv)
+
+    # Stessi indici di indici_nodi: prima le righe di nodes, poi gli estremi nuovi delle source e delle target
+    ids = np.asarray(ids, dtype=object)
+    posizione = np.full(len(ids), -1, dtype=np.int64)
+    nodi = pd.Index(ids).get_indexer(pd.Index(df_nodes['id']).drop_duplicates())
+    posizione[nodi] = np.arange(len(nodi))
+    prossimo = len(nodi)
+    for colonna in (0, 1):
+        for blocco in blocchi():
+            nuovi = pd.unique(blocco[colonna][posizione[blocco[colonna]] < 0])
+            posizione[nuovi] = np.arange(prossimo, prossimo + len(nuovi))
+            prossimo += len(nuovi)
+    presenti = np.flatnonzero(posizione >= 0)
+    indici = np.empty(prossimo, dtype=object)
+    indici[posizione[presenti]] = ids[presenti]
+
+    schema = pa.schema([('source_indice', pa.int32()), ('target_indice', pa.int32()), ('weight', pa.int64())],
+                       metadata={'indici': FILE_INDICI})
+    percorso_csv = os.path.join(cartella, 'edges.csv')
+    with pq.ParquetWriter(os.path.join(cartella, 'edges.parquet'), schema) as archi:
+        intestazione = True
+        for u, v, pesi in blocchi():
+            if csv:
+                pd.DataFrame({'source': ids[u], 'target': ids[v], 'weight': pesi.astype(np.int64)}).to_csv(
+                    percorso_csv, index=False, header=intestazione, mode='w' if intestazione else 'a')
+                intestazione = False
+            archi.write_table(pa.table([pa.array(posizione[u], pa.int32()), pa.array(posizione[v], pa.int32()),
+                                        pa.array(pesi, pa.int64())], schema=schema))
+        if csv and intestazione:
+            pd.DataFrame(columns=['source', 'target', 'weight']).to_csv(percorso_csv, index=False)
+    _scrivi_indici(indici, cartella)
+
+
+def indici_aggiornati(cartella):
+    """True se edges.parquet e indici.parquet della cartella valgono per i nodes.csv/edges.csv presenti."""
+    percorso_archi = os.path.join(cartella, 'edges.parquet')
+    percorso_indici = os.path.join(cartella, FILE_INDICI)
+    if not os.path.exists(percorso_archi) or not os.path.exists(percorso_indici):
+        return False
+    if b'indici' not in (pq.read_schema(percorso_archi).metadata or {}):
+        return False
+    # Gli indici valgono solo per i nodes.csv/edges.csv con cui sono stati scritti
+    impronta = (pq.read_schema(percorso_indici).metadata or {}).get(b'impronta')
+    return impronta is not None and json.loads(impronta) == _impronta(cartella)
+
+
+def carica_indici(cartella):
+    """ID degli artisti nell'ordine degli indici di edges.parquet (prima i nodi, poi gli altri estremi)."""
+    return pq.read_table(os.path.join(cartella, FILE_INDICI), memory_map=True).column('id').to_numpy(
+        zero_copy_only=False)
+
+
+def carica_archi_indicizzati(cartella):
+    """(ids, source, target, weight) come array numpy, oppure None se gli indici mancano o sono vecchi."""
+    if not indici_aggiornati(cartella):
+        return None
+    archi = pq.read_table(percorso_parquet(os.path.join(cartella, 'edges.csv')), memory_map=True,
+                          columns=['source_indice', 'target_indice', 'weight'])
+    ids = carica_indici(cartella)
+    return (ids, archi.column('source_indice').to_numpy(), archi.column('target_indice').to_numpy(),
+            archi.column('weight').to_numpy().astype(np.float64))
+
+
+def archi_a_blocchi(cartella, dimensione):
+    """Itera sugli archi di edges.csv come (source, target, weight) in array di al massimo dimensione righe.
+
+    Con l'archivio aggiornato legge edges.parquet a gruppi di righe e traduce gli
+    indici in ID, altrimenti legge il CSV a pezzi: in memoria c'e un blocco alla volta.
+    """
+    if indici_aggiornati(cartella):
+        ids = carica_indici(cartella)
+        file_archi = pq.ParquetFile(percorso_parquet(os.path.join(cartella, 'edges.csv')), memory_map=True)
+        for blocco in file_archi.iter_batches(dimensione, columns=['source_indice', 'target_indice', 'weight']):
+            yield (ids[blocco.column(0).to_numpy()], ids[blocco.column(1).to_numpy()],
+                   blocco.column(2).to_numpy())
+        return
+    for blocco in pd.read_csv(os.path.join(cartella, 'edges.csv'), usecols=['source', 'target', 'weight'],
+                              chunksize=dimensione):
+        yield blocco['source'].to_numpy(), blocco['target'].to_numpy(), blocco['weight'].to_numpy()
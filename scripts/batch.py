@@ -0,0 +1,96 @@
+# Risoluzione in blocco di profili artisti e tracce degli album tramite gli endpoint multi-ID di Spotify
+#
+# Invece di una chiamata sp.artist per artista e sp.album_tracks per album,
+# gli ID in attesa di un intero blocco della frontiera vengono raccolti e
+# risolti con sp.artists (50 ID per richiesta) e sp.albums (20 ID per
+# richiesta, tracce incluse). Gli album condivisi tra artisti dello stesso
+# blocco vengono scaricati una sola volta. Discografie e tracce vengono
+# lette per intero seguendo la paginazione.
+
+from scripts.collection import estrai_collaborazioni, tutte_le_pagine
+
+MAX_ARTISTI = 50
+MAX_ALBUM = 20
+
+
+def a_blocchi(ids, dimensione):
+    """Divide una lista di ID in blocchi di al massimo dimensione elementi."""
+    return [ids[i:i + dimensione] for i in range(0, len(ids), dimensione)]
+
+
+def profilo(artist):
+    """Converte un artista restituito da Spotify nel formato usato per nodes.csv."""
+    return {
+        'id': artist['id'],
+        'name': artist['name'],
+        'popularity': artist['popularity'],
+        'genres': ';'.join(artist['genres']) if artist['genres'] else ""
+    }
+
+
+def profili_artisti(sp, ids):
+    """Scarica i profili di piu artisti con il minimo numero di richieste."""
+    profili = {}
+    for blocco in a_blocchi(list(dict.fromkeys(ids)), MAX_ARTISTI):
+        for artist in sp.artists(blocco)['artists']:
+            if artist:
+                profili[artist['id']] = profilo(artist)
+    return profili
+
+
+def tracce_album(sp, album_ids):
+    """Restituisce tutte le tracce di piu album, 20 album per richiesta."""
+    tracce = {}
+    for blocco in a_blocchi(list(dict.fromkeys(album_ids)), MAX_ALBUM):
+        for album in sp.albums(blocco)['albums']:
+            if album:
+                tracce[album['id']] = tutte_le_pagine(sp, album['tracks'])
+    return tracce
+
+
+def album_artista(sp, artist_id):
+    """Elenco completo degli album e singoli di un artista (non esiste un endpoint multi-artista)."""
+    return tutte_le_pagine(sp, sp.artist_albums(artist_id, album_type='album,single', limit=50))
+
+
+def collaborazioni_blocco(sp, artist_ids, serve_profilo):
+    """Profili e collaborazioni di un blocco di artisti della frontiera.
+
+    Restituisce (profili, risultati, albums): risultati associa a ogni artista la lista
+    delle sue collaborazioni oppure l'eccezione che ne ha impedito il recupero, albums
+    gli ID degli album letti per ogni artista. Se fallisce una richiesta comune a tutto
+    il blocco (profili o tracce degli album) il blocco viene ripreso artista per
+    artista, cosi l'errore resta solo agli artisti che falliscono anche da soli.
+    """
+    try:
+        return _collaborazioni(sp, artist_ids, serve_profilo)
+    except Exception as e:
+        if len(artist_ids) == 1:
+            return {}, {artist_ids[0]: e}, {}
+        print(f"Errore con il blocco di {artist_ids[0]}: {e}, nuovo tentativo artista per artista")
+
+    profili, risultati, albums = {}, {}, {}
+    for artist_id in artist_ids:
+        p, r, a = collaborazioni_blocco(sp, [artist_id], serve_profilo)
+        profili.update(p)
+        risultati.update(r)
+        albums.update(a)
+    return profili, risultati, albums
+
+
+def _collaborazioni(sp, artist_ids, serve_profilo):
+    profili = profili_artisti(sp, [a for a in artist_ids if serve_profilo(a)])
+
+    albums = {}
+    risultati = {}
+    for artist_id in artist_ids:
+        try:
+            albums[artist_id] = [album['id'] for album in album_artista(sp, artist_id)]
+        except Exception as e:
+            risultati[artist_id] = e
+
+    tracce = tracce_album(sp, [a for ids in albums.values() for a in ids])
+    for artist_id, ids in albums.items():
+        risultati[artist_id] = estrai_collaborazioni(tracce[a] for a in ids if a in tracce)
+
+    return profili, risultati, albums
@@ -0,0 +1,180 @@
+# Cache persistente su disco (SQLite) delle risposte di Spotify e Wikidata
+#
+# Le risposte sono indicizzate con l'hash SHA-256 della richiesta, scadono
+# dopo un TTL che dipende dall'endpoint e, superata la dimensione massima,
+# vengono eliminate a partire da quelle usate meno di recente (LRU).
+# In modalita "solo cache" nessuna richiesta raggiunge la rete.
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from scripts.misure import misure
+
+PERCORSO_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'data', 'cache', 'risposte.sqlite')
+DIMENSIONE_MAX = 512 * 1024 * 1024
+
+GIORNO = 24 * 3600
+# Durata di validita per endpoint (secondi): album e tracce non cambiano, popolarita e discografia si
+TTL = {
+    'artists': 7 * GIORNO,
+    'artist_albums': 1 * GIORNO,
+    'albums': 90 * GIORNO,
+    'album_tracks': 90 * GIORNO,
+    'sparql': 30 * GIORNO,
+    'altro': 1 * GIORNO,
+}
+
+
+class RispostaNonInCache(Exception):
+    """Sollevata in modalita solo cache quando una richiesta non e mai stata salvata."""
+
+
+def endpoint_spotify(url):
+    """Classifica l'URL di una chiamata Spotify nell'endpoint usato per scegliere il TTL."""
+    percorso = re.sub(r'^https?://[^/]+/v1/', '', url).split('?')[0].strip('/')
+    if re.fullmatch(r'artists/[^/]+/albums', percorso):
+        return 'artist_albums'
+    if re.fullmatch(r'albums/[^/]+/tracks', percorso):
+        return 'album_tracks'
+    if percorso.startswith('artists'):
+        return 'artists'
+    if percorso.startswith('albums'):
+        return 'albums'
+    return 'altro'
+
+
+def chiave(*parti):
+    """Calcola l'indirizzo di una richiesta come hash del suo contenuto."""
+    return hashlib.sha256(json.dumps(parti, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CacheRisposte:
+    """Cache chiave -> risposta JSON compressa, condivisa tra thread."""
+
+    def __init__(self, percorso=PERCORSO_CACHE, dimensione_max=DIMENSIONE_MAX, solo_cache=False):
+        os.makedirs(os.path.dirname(percorso), exist_ok=True)
+        self.dimensione_max = dimensione_max
+        self.solo_cache = solo_cache
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(percorso, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS risposte (
+                chiave TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                valore BLOB NOT NULL,
+                dimensione INTEGER NOT NULL,
+                creato REAL NOT NULL,
+                ultimo_accesso REAL NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_accesso ON risposte (ultimo_accesso)")
+        self.conn.commit()
+        self.dimensione = self.conn.execute("SELECT COALESCE(SUM(dimensione), 0) FROM risposte").fetchone()[0]
+
+        self.hit = 0
+        self.miss = 0
+        self.scadute = 0
+        self.eliminate = 0
+
+    def leggi(self, k, endpoint):
+        """Restituisce la risposta salvata, o None se assente o scaduta."""
+        with self.lock:
+            riga = self.conn.execute("SELECT valore, creato FROM risposte WHERE chiave = ?", (k,)).fetchone()
+            if riga is None:
+                return None
+            valore, creato = riga
+            # In modalita solo cache anche una risposta scaduta e meglio di nessuna
+            if time.time() - creato > TTL.get(endpoint, TTL['altro']) and not self.solo_cache:
+                self.scadute += 1
+                return None
+            self.conn.execute("UPDATE risposte SET ultimo_accesso = ? WHERE chiave = ?", (time.time(), k))
+            self.conn.commit()
+        return json.loads(zlib.decompress(valore))
+
+    def scrivi(self, k, endpoint, risposta):
+        dati = zlib.compress(json.dumps(risposta).encode('utf-8'))
+        ora = time.time()
+        with self.lock:
+            vecchia = self.conn.execute("SELECT dimensione FROM risposte WHERE chiave = ?", (k,)).fetchone()
+            if vecchia:
+                self.dimensione -= vecchia[0]
+            self.conn.execute("INSERT OR REPLACE INTO risposte VALUES (?, ?, ?, ?, ?, ?)",
+                              (k, endpoint, dati, len(dati), ora, ora))
+            self.dimensione += len(dati)
+            if self.dimensione > self.dimensione_max:
+                self._elimina_lru()
+            self.conn.commit()
+
+    def _elimina_lru(self):
+        """Elimina le risposte usate meno di recente fino a scendere al 90% della dimensione massima."""
+        obiettivo = self.dimensione_max * 0.9
+        righe = self.conn.execute("SELECT chiave, dimensione FROM risposte ORDER BY ultimo_accesso")
+        da_eliminare = []
+        for k, dimensione in righe:
+            if self.dimensione <= obiettivo:
+                break
+            da_eliminare.append((k,))
+            self.dimensione -= dimensione
+        self.conn.executemany("DELETE FROM risposte WHERE chiave = ?", da_eliminare)
+        self.eliminate += len(da_eliminare)
+
+    def ottieni(self, endpoint, parti, funzione):
+        """Restituisce la risposta dalla cache oppure la scarica con funzione() e la salva."""
+        k = chiave(*parti)
+        risposta = self.leggi(k, endpoint)
+        if risposta is not None:
+            self.hit += 1
+            misure.lettura_cache(endpoint, 'hit')
+            return risposta
+        self.miss += 1
+        misure.lettura_cache(endpoint, 'miss')
+        if self.solo_cache:
+            raise RispostaNonInCache(f"{endpoint}: richiesta non presente in cache")
+        risposta = funzione()
+        if risposta is not None:
+            self.scrivi(k, endpoint, risposta)
+        return risposta
+
+    def statistiche(self):
+        totale = self.hit + self.miss
+        return {
+            'hit': self.hit,
+            'miss': self.miss,
+            'scadute': self.scadute,
+            'eliminate': self.eliminate,
+            'hit_rate': round(self.hit / totale, 3) if totale else 0.0,
+            'dimensione_mb': round(self.dimensione / 1024 / 1024, 1)
+        }
+
+
+_cache = None
+_lock_cache = threading.Lock()
+
+
+def get_cache():
+    """Restituisce la cache condivisa; SOLO_CACHE=1 attiva la modalita offline, DISABILITA_CACHE=1 la spegne."""
+    global _cache
+    if os.getenv('DISABILITA_CACHE') == '1':
+        return None
+    with _lock_cache:
+        if _cache is None:
+            _cache = CacheRisposte(solo_cache=os.getenv('SOLO_CACHE') == '1')
+        return _cache
+
+
+def stampa_statistiche():
+    """Stampa hit e miss della cache usata nel processo."""
+    if _cache is None:
+        return
+    s = _cache.statistiche()
+    modalita = " (solo cache)" if _cache.solo_cache else ""
+    print(f"Cache{modalita}: {s['hit']} hit, {s['miss']} miss ({s['scadute']} scadute), "
+          f"hit rate {s['hit_rate']:.1%}, {s['eliminate']} eliminate, {s['dimensione_mb']} MB su disco")
@@ -0,0 +1,294 @@
+# Stato del crawl salvato incrementalmente su SQLite, per riprendere una raccolta interrotta
+#
+# Ogni artista processato viene registrato in un'unica transazione (profilo,
+# archi, artisti scoperti per il livello successivo), quindi dopo un crash o
+# un Ctrl-C il crawl riparte dallo stesso punto del livello corrente.
+#
+# In memoria e nella tabella archi ci sono solo gli archi del livello in
+# corso: alla chiusura di ogni livello vengono scritti in una partizione
+# Parquet (checkpoint-livelli/archi-NNNN.parquet) e tolti dallo stato. Alla
+# fine i pesi di tutte le partizioni vengono sommati su indici interi e gli
+# archi scritti a blocchi (archivio.salva_grafo_a_blocchi), quindi la memoria
+# non cresce con il numero di livelli gia visitati.
+#
+# Uso come dataset parziale:
+#     python -m scripts.checkpoint data/new/checkpoint.sqlite --esporta data/new/grezzi
+
+import argparse
+import glob
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.archivio import salva_grafo_a_blocchi
+from scripts.grafo_compatto import RegistroId, NodiColonnari, ArchiCompatti, ArchiSuDisco
+
+PERCORSO_CHECKPOINT = 'data/new/checkpoint.sqlite'
+BLOCCO_SQLITE = 100_000
+
+
+def cartella_livelli(percorso):
+    """Cartella delle partizioni degli archi accanto al checkpoint."""
+    return os.path.splitext(percorso)[0] + '-livelli'
+
+
+def scrivi_livello(archi, cartella, depth):
+    """Scrive gli archi di un livello chiuso come partizione Parquet (sostituendo quella di un tentativo precedente)."""
+    os.makedirs(cartella, exist_ok=True)
+    percorso = os.path.join(cartella, f'archi-{depth:04d}.parquet')
+    pq.write_table(pa.Table.from_pandas(archi.a_dataframe(), preserve_index=False), percorso + '.tmp')
+    os.replace(percorso + '.tmp', percorso)
+
+
+def archi_livelli(cartella, registro, altri_record=0):
+    """ArchiSuDisco con gli archi delle partizioni, nell'ordine dei livelli (altri_record: aggiunte previste dopo)."""
+    partizioni = sorted(glob.glob(os.path.join(cartella, 'archi-*.parquet')))
+    righe = sum(pq.ParquetFile(p).metadata.num_rows for p in partizioni)
+    archi = ArchiSuDisco(registro, cartella, righe + altri_record)
+    for percorso in partizioni:
+        # Estremi letti come dizionario: solo gli ID distinti diventano stringhe Python
+        tabella = pq.read_table(percorso, read_dictionary=['source', 'target'])
+        estremi = []
+        for colonna in ('source', 'target'):
+            colonna = tabella.column(colonna).combine_chunks()
+            indici = np.fromiter((registro.indice(a) for a in colonna.dictionary.to_pylist()), dtype=np.int64)
+            estremi.append(indici[colonna.indices.to_numpy()])
+        archi.aggiungi_indici(*estremi, tabella.column('weight').to_numpy())
+    return archi
+
+
+def estremi_livelli(cartella):
+    """Insieme degli ID che compaiono negli archi delle partizioni."""
+    estremi = set()
+    for percorso in glob.glob(os.path.join(cartella, 'archi-*.parquet')):
+        tabella = pq.read_table(percorso, read_dictionary=['source', 'target'])
+        for colonna in ('source', 'target'):
+            estremi.update(tabella.column(colonna).combine_chunks().dictionary.to_pylist())
+    return estremi
+
+
+def salva_archi(df_nodes, archi, cartella):
+    """Scrive nodes/edges (CSV e Parquet) con gli archi letti a blocchi da un ArchiSuDisco."""
+    # Anche i nodi senza archi devono avere un indice nel registro
+    for artist_id in df_nodes['id']:
+        archi.registro.indice(artist_id)
+    salva_grafo_a_blocchi(df_nodes, archi.registro.array(), archi.blocchi, cartella)
+
+
+class StatoCrawl:
+    """Nodi, archi e code della visita in ampiezza, tenuti in memoria e registrati su disco."""
+
+    def __init__(self, percorso=PERCORSO_CHECKPOINT, nuovo=False, discografie=None):
+        # Se presente, discografie (scripts/incrementale.py) riceve album e collaborazioni di ogni artista
+        self.discografie = discografie
+        cartella = os.path.dirname(percorso)
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+        self.cartella_livelli = cartella_livelli(percorso)
+        if nuovo and os.path.exists(percorso):
+            os.remove(percorso)
+        if nuovo and os.path.exists(self.cartella_livelli):
+            shutil.rmtree(self.cartella_livelli)
+
+        self.percorso = percorso
+        self.conn = sqlite3.connect(percorso)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (chiave TEXT PRIMARY KEY, valore TEXT);
+            CREATE TABLE IF NOT EXISTS nodi (id TEXT PRIMARY KEY, name TEXT, popularity INTEGER, genres TEXT);
+            CREATE TABLE IF NOT EXISTS archi (source TEXT, target TEXT, weight INTEGER,
+                                              PRIMARY KEY (source, target));
+            CREATE TABLE IF NOT EXISTS processati (id TEXT PRIMARY KEY, livello INTEGER);
+            CREATE TABLE IF NOT EXISTS coda (posizione INTEGER PRIMARY KEY, id TEXT);
+            CREATE TABLE IF NOT EXISTS prossimi (id TEXT PRIMARY KEY);
+        """)
+        self.conn.commit()
+        self._carica()
+
+    def _carica(self):
+        """Ricostruisce lo stato in memoria a partire dal file."""
+        meta = dict(self.conn.execute("SELECT chiave, valore FROM meta"))
+        self.fase = meta.get('fase', 'nuovo')
+        self.depth = int(meta.get('livello', 0))
+
+        # Nodi e archi condividono il registro degli ID (scripts/grafo_compatto.py)
+        self.registro = RegistroId()
+        self.nodes_data = NodiColonnari(self.registro)
+        for artist_id, name, popularity, genres in self.conn.execute("SELECT * FROM nodi ORDER BY rowid"):
+            self.nodes_data[artist_id] = {'id': artist_id, 'name': name, 'popularity': popularity,
+                                          'genres': genres or ""}
+        # Solo il livello in corso: quelli chiusi sono nelle partizioni
+        self.archi_livello = ArchiCompatti(self.registro)
+        for u, v, w in self.conn.execute("SELECT * FROM archi ORDER BY rowid"):
+            self.archi_livello.aggiungi((u, v), w)
+        self.processed_ids = {r[0] for r in self.conn.execute("SELECT id FROM processati")}
+        self.current_level_queue = [r[0] for r in self.conn.execute("SELECT id FROM coda ORDER BY posizione")]
+        self.next_level = {r[0] for r in self.conn.execute("SELECT id FROM prossimi")}
+
+    def _meta(self, chiave, valore):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (chiave, str(valore)))
+
+    @property
+    def in_corso(self):
+        """True se il file contiene un crawl iniziato ma non completato."""
+        return self.fase in ('crawl', 'profili')
+
+    def inizia(self, seeds):
+        """Imposta il primo livello, a meno che non si stia riprendendo un crawl interrotto."""
+        if self.fase != 'nuovo':
+            return
+        self.fase = 'crawl'
+        self._meta('fase', 'crawl')
+        self._imposta_livello(0, seeds)
+        self.conn.commit()
+
+    def _imposta_livello(self, depth, queue):
+        self.depth = depth
+        self.current_level_queue = list(queue)
+        self.next_level = set()
+        self._meta('livello', depth)
+        self.conn.execute("DELETE FROM coda")
+        self.conn.execute("DELETE FROM prossimi")
+        self.conn.executemany("INSERT INTO coda VALUES (?, ?)", enumerate(self.current_level_queue))
+
+    def registra_artista(self, artist_id, info, collabs, album_ids=(), livello=None):
+        """Registra in un'unica transazione profilo, collaborazioni e nuovi artisti scoperti.
+
+        livello e la distanza dai seed piu uno (di default il livello in corso),
+        indicata dal crawl per priorita che non procede per livelli.
+        """
+        if self.discografie is not None:
+            self.discografie.registra(artist_id, album_ids, collabs)
+        if info is not None:
+            self.nodes_data[artist_id] = info
+            self.conn.execute("INSERT OR REPLACE INTO nodi VALUES (?, ?, ?, ?)",
+                              (info['id'], info['name'], info['popularity'], info['genres']))
+
+        scoperti = set()
+        for a, b in collabs:
+            pair = tuple(sorted((a, b)))
+            self.archi_livello.aggiungi(pair)
+            self.conn.execute("INSERT INTO archi VALUES (?, ?, 1) "
+                              "ON CONFLICT (source, target) DO UPDATE SET weight = weight + 1", pair)
+
+            if a not in self.processed_ids: scoperti.add(a)
+            if b not in self.processed_ids: scoperti.add(b)
+
+        scoperti -= self.next_level
+        self.next_level |= scoperti
+        self.conn.executemany("INSERT OR IGNORE INTO prossimi VALUES (?)", [(a,) for a in scoperti])
+
+        self.processed_ids.add(artist_id)
+        self.conn.execute("INSERT OR REPLACE INTO processati VALUES (?, ?)",
+                          (artist_id, self.depth + 1 if livello is None else livello))
+        self.conn.commit()
+
+    def livelli_processati(self):
+        """Livello (distanza dai seed piu uno) di ogni artista processato."""
+        return dict(self.conn.execute("SELECT id, livello FROM processati"))
+
+    def registra_shard(self, artisti, conteggio):
+        """Registra in un'unica transazione un blocco elaborato da un processo worker.
+
+        artisti e la lista ordinata di (artist_id, info, coppie, album_ids) e conteggio
+        il Counter delle coppie (gia ordinate) calcolato dal worker.
+        """
+        for artist_id, info, coppie, album_ids in artisti:
+            if self.discografie is not None:
+                self.discografie.registra(artist_id, album_ids, coppie)
+            if info is not None:
+                self.nodes_data[artist_id] = info
+                self.conn.execute("INSERT OR REPLACE INTO nodi VALUES (?, ?, ?, ?)",
+                                  (info['id'], info['name'], info['popularity'], info['genres']))
+            self.processed_ids.add(artist_id)
+            self.conn.execute("INSERT OR REPLACE INTO processati VALUES (?, ?)", (artist_id, self.depth + 1))
+
+        self.archi_livello.update(conteggio)
+        self.conn.executemany("INSERT INTO archi VALUES (?, ?, ?) "
+                              "ON CONFLICT (source, target) DO UPDATE SET weight = weight + excluded.weight",
+                              [(u, v, w) for (u, v), w in conteggio.items()])
+
+        scoperti = {a for pair in conteggio for a in pair} - self.processed_ids - self.next_level
+        self.next_level |= scoperti
+        self.conn.executemany("INSERT OR IGNORE INTO prossimi VALUES (?)", [(a,) for a in scoperti])
+        self.conn.commit()
+
+    def chiudi_livello(self):
+        """Passa al livello successivo e restituisce la sua coda (vuota se non ci sono nuovi artisti).
+
+        Gli archi del livello vanno nella partizione prima del commit: se il
+        processo si ferma in mezzo, alla ripresa la partizione viene riscritta.
+        """
+        if len(self.archi_livello):
+            scrivi_livello(self.archi_livello, self.cartella_livelli, self.depth)
+        self.conn.execute("DELETE FROM archi")
+        self.archi_livello = ArchiCompatti(self.registro)
+        queue = list(self.next_level)
+        self._imposta_livello(self.depth + 1, queue)
+        self.conn.commit()
+        return queue
+
+    def archi(self):
+        """Tutti gli archi con i pesi sommati: partizioni dei livelli chiusi piu il livello in corso."""
+        archi = archi_livelli(self.cartella_livelli, self.registro, len(self.archi_livello))
+        archi.aggiungi_indici(*self.archi_livello._in_ordine())
+        return archi
+
+    def estremi(self):
+        """Insieme degli ID che compaiono in almeno un arco."""
+        return estremi_livelli(self.cartella_livelli) | self.archi_livello.estremi()
+
+    def registra_nodi(self, nodi, durante_crawl=False):
+        """Registra i profili scaricati nella fase di recupero dei collaboratori esterni.
+
+        Con durante_crawl i profili sono stati scaricati prima della fine del crawl
+        (crawl per popolarita) e la fase non cambia.
+        """
+        if self.fase != 'profili' and not durante_crawl:
+            self.fase = 'profili'
+            self._meta('fase', 'profili')
+        for info in nodi:
+            self.nodes_data[info['id']] = info
+        self.conn.executemany("INSERT OR REPLACE INTO nodi VALUES (?, ?, ?, ?)",
+                              [(i['id'], i['name'], i['popularity'], i['genres']) for i in nodi])
+        self.conn.commit()
+
+    def completa(self):
+        self.fase = 'completato'
+        self._meta('fase', 'completato')
+        self.conn.commit()
+
+    def chiudi(self):
+        self.conn.close()
+
+
+def leggi_checkpoint(percorso=PERCORSO_CHECKPOINT):
+    """Legge un checkpoint (anche parziale) come nodi in un DataFrame e archi in un ArchiSuDisco da chiudere."""
+    conn = sqlite3.connect(percorso)
+    try:
+        df_nodes = pd.read_sql_query("SELECT id, name, popularity, genres FROM nodi ORDER BY rowid", conn)
+        righe = conn.execute("SELECT COUNT(*) FROM archi").fetchone()[0]
+        archi = archi_livelli(cartella_livelli(percorso), RegistroId(), righe)
+        cursore = conn.execute("SELECT source, target, weight FROM archi ORDER BY rowid")
+        while righe := cursore.fetchmany(BLOCCO_SQLITE):
+            archi.aggiungi_blocco(*zip(*righe))
+    finally:
+        conn.close()
+    return df_nodes, archi
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Esporta un checkpoint del crawl come nodes.csv/edges.csv")
+    parser.add_argument('checkpoint', nargs='?', default=PERCORSO_CHECKPOINT)
+    parser.add_argument('--esporta', default='data/new/grezzi', help="cartella di destinazione dei CSV")
+    args = parser.parse_args()
+
+    df_nodes, archi = leggi_checkpoint(args.checkpoint)
+    with archi:
+        salva_archi(df_nodes, archi, args.esporta)
+        print(f"Esportati {len(df_nodes)} nodi e {len(archi)} archi in {args.esporta}")
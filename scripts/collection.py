@@ -1,7 +1,6 @@
 # Funzioni per raccogliere dati da Spotify API
 
 import pandas as pd
-import time
 
 
 def get_artist_info(sp, artist_id):
@@ -15,16 +14,21 @@ def get_artist_info(sp, artist_id):
     }
 
 
-def get_collaborations(sp, artist_id):
-    """Trova tutte le collaborazioni di un artista analizzando i suoi album e singoli."""
+def tutte_le_pagine(sp, pagina):
+    """Segue i link 'next' di un oggetto di paginazione e restituisce tutti gli elementi."""
+    items = list(pagina['items'])
+    while pagina['next']:
+        pagina = sp.next(pagina)
+        items.extend(pagina['items'])
+    return items
+
+
+def estrai_collaborazioni(album_tracks):
+    """Estrae le coppie di artisti che compaiono insieme nelle tracce di una lista di album."""
     collaborations = []
-    results = sp.artist_albums(artist_id, album_type='album,single', limit=50)
-    albums = results['items']
     seen_tracks = set()
 
-    for album in albums:
-        time.sleep(0.2)
-        tracks = sp.album_tracks(album['id'])['items']
+    for tracks in album_tracks:
         for track in tracks:
             if track['id'] not in seen_tracks:
                 artists_in_track = [a['id'] for a in track['artists']]
@@ -34,4 +38,16 @@ def get_collaborations(sp, artist_id):
                             collaborations.append((artists_in_track[i], artists_in_track[j]))
                 seen_tracks.add(track['id'])
 
-    return list(set(collaborations))
\ No newline at end of file
+    return list(set(collaborations))
+
+
+def get_collaborations(sp, artist_id):
+    """Trova tutte le collaborazioni di un artista analizzando i suoi album e singoli."""
+    results = sp.artist_albums(artist_id, album_type='album,single', limit=50)
+    albums = tutte_le_pagine(sp, results)
+
+    album_tracks = []
+    for album in albums:
+        album_tracks.append(tutte_le_pagine(sp, sp.album_tracks(album['id'])))
+
+    return estrai_collaborazioni(album_tracks)
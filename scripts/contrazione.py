@@ -0,0 +1,198 @@
+# Contrazione del grafo degli artisti secondo uno o piu attributi dei nodi
+#
+# Ogni attributo (nazione, genere mappato, comunita, fascia di popolarita)
+# diventa una matrice di appartenenza sparsa P (artisti x classi) e il grafo
+# contratto e P^T A P, con A la matrice dei pesi delle collaborazioni: il peso
+# tra due classi e la somma dei pesi degli archi tra i loro artisti, quello di
+# una classe con se stessa la somma degli archi interni. Gli attributi con
+# piu valori separati da ';' (i generi) danno a un artista piu classi, e
+# ogni suo arco conta una volta per ogni coppia di classi. Artisti senza
+# valore (vuoto o 'unknown') e archi verso artisti fuori dalla tabella dei
+# nodi sono esclusi.
+# La tabella degli archi viene letta e trasformata in A una sola volta; con
+# piu attributi il prodotto A P viene fatto con le P affiancate, poi ogni
+# grafo contratto si ricava dal proprio blocco di colonne.
+#
+# grafo-nazionalita.py e heatmap.py (con incrocio, P_a^T P_b tra due
+# attributi degli stessi nodi) usano queste funzioni.
+#
+# Uso (dalla cartella del progetto):
+#     python -m scripts.contrazione                                      tutti gli attributi disponibili
+#     python -m scripts.contrazione --attributi country modularity_class
+#     python -m scripts.contrazione --fasce 5                            fasce di popolarita da 5 punti
+# Per ogni attributo scrive nodes.csv ed edges.csv per Gephi in data/new/contrazioni/<attributo>.
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.archivio import carica_tabella, salva_tabella
+
+SEPARATORE = ';'
+AMPIEZZA_FASCE = 10
+ATTRIBUTI = ['country', 'genres_mapped', 'modularity_class', 'popularity']
+CARTELLA_OUTPUT = 'data/new/contrazioni'
+
+
+def _classi_distinte(valori, separatore, ampiezza):
+    """Appartenenza (valori distinti x classi) e nomi delle classi, in ordine crescente."""
+    n = len(valori)
+    if ampiezza is not None:
+        numeri = pd.to_numeric(valori, errors='coerce')
+        inizio = (numeri // ampiezza) * ampiezza
+        valori = inizio.map(lambda a: f"{a:.0f}-{a + ampiezza - 1:.0f}", na_action='ignore')
+        ordine = inizio
+    elif valori.dtype == object or pd.api.types.is_string_dtype(valori):
+        valori = valori.str.split(separatore).explode().str.strip()
+        valori = valori[valori.str.len() > 0]
+        ordine = valori
+    else:
+        # Interi letti come float per via dei valori mancanti (es. modularity_class dopo un merge)
+        if valori.dtype.kind == 'f' and (valori == np.floor(valori)).all():
+            valori = valori.astype(np.int64)
+        ordine = valori
+    validi = valori.notna() & (valori.astype(str).str.lower() != 'unknown')
+    valori, ordine = valori[validi], ordine[validi]
+
+    classi = valori.groupby(ordine.to_numpy()).first()
+    codici = pd.Index(classi.to_numpy()).get_indexer(valori)
+    U = sparse.csr_matrix((np.ones(len(codici)), (valori.index.to_numpy(), codici)), shape=(n, len(classi)))
+    return U, list(classi)
+
+
+def appartenenza(valori, separatore=SEPARATORE, ampiezza=None):
+    """Matrice di appartenenza (nodi x classi) e nomi delle classi, in ordine crescente.
+
+    I valori numerici sono classi a se oppure, con ampiezza, fasce come "40-49";
+    le stringhe vengono divise con separatore. Ogni valore distinto viene
+    elaborato una sola volta, poi riportato sui nodi con un prodotto sparso.
+    """
+    codici, distinti = pd.factorize(pd.Series(valori))
+    U, classi = _classi_distinte(pd.Series(distinti), separatore, ampiezza)
+    nodi = np.flatnonzero(codici >= 0)
+    R = sparse.csr_matrix((np.ones(len(nodi)), (nodi, codici[nodi])), shape=(len(codici), len(distinti)))
+    return (R @ U).tocsr(), classi
+
+
+def matrice_archi(ids, df_edges):
+    """Matrice (nodi x nodi) dei pesi da source a target, con i nodi nell'ordine di ids."""
+    indice = pd.Index(ids)
+    u = indice.get_indexer(df_edges['source'])
+    v = indice.get_indexer(df_edges['target'])
+    tenuti = (u >= 0) & (v >= 0)
+    pesi = df_edges['weight'].to_numpy(np.float64)[tenuti]
+    return sparse.csr_matrix((pesi, (u[tenuti], v[tenuti])), shape=(len(indice), len(indice)))
+
+
+def _non_orientato(C):
+    """Triangolo superiore di C + C^T, con la diagonale contata una volta."""
+    C = sparse.csr_matrix(C)
+    return sparse.triu(C + C.T - sparse.diags(C.diagonal()), format='coo')
+
+
+def tabelle_gephi(C, classi, P):
+    """nodes ed edges del grafo contratto: Id/Label/Artisti/Weight e Source/Target/Weight/Type.
+
+    Gli archi sono ordinati per peso decrescente, a parita di peso per nome delle classi.
+    """
+    nomi = np.asarray([str(c) for c in classi], dtype=object)
+    righe, colonne, pesi = C.row, C.col, C.data
+    tenuti = pesi != 0
+    righe, colonne, pesi = righe[tenuti], colonne[tenuti], pesi[tenuti]
+    ordine = np.lexsort((colonne, righe, -pesi))
+    if np.array_equal(pesi, np.rint(pesi)):
+        pesi = pesi.astype(np.int64)
+    df_edges = pd.DataFrame({
+        'Source': nomi[righe[ordine]],
+        'Target': nomi[colonne[ordine]],
+        'Weight': pesi[ordine],
+        'Type': 'Undirected'
+    })
+    # Peso di ogni classe: archi verso le altre classi piu archi interni
+    peso = np.bincount(righe, pesi, len(nomi)) + np.bincount(colonne, pesi * (righe != colonne), len(nomi))
+    peso = peso.astype(pesi.dtype)
+    df_nodes = pd.DataFrame({'Id': nomi, 'Label': nomi,
+                             'Artisti': np.asarray(P.sum(axis=0)).ravel().astype(np.int64), 'Weight': peso})
+    return df_nodes, df_edges
+
+
+def contrai_grafo(df_nodes, df_edges, attributi, fasce=None, colonna_id='id'):
+    """Grafi contratti per ciascun attributo (colonna di df_nodes), con una sola lettura degli archi.
+
+    fasce associa alle colonne numeriche da raggruppare l'ampiezza delle fasce
+    (es. {'popularity': 10}). Restituisce {attributo: (nodes, edges)} come tabelle_gephi.
+    """
+    fasce = fasce or {}
+    df_nodes = df_nodes.drop_duplicates(colonna_id, keep='last')
+    A = matrice_archi(df_nodes[colonna_id], df_edges)
+
+    matrici = {nome: appartenenza(df_nodes[nome], ampiezza=fasce.get(nome)) for nome in attributi}
+    AP = A @ sparse.hstack([P for P, _ in matrici.values()], format='csc')
+
+    risultati, inizio = {}, 0
+    for nome, (P, classi) in matrici.items():
+        fine = inizio + P.shape[1]
+        C = P.T @ AP[:, inizio:fine]
+        risultati[nome] = tabelle_gephi(_non_orientato(C), classi, P)
+        inizio = fine
+    return risultati
+
+
+def incrocio(valori_righe, valori_colonne):
+    """Numero di nodi per coppia di classi di due attributi degli stessi nodi (come pd.crosstab)."""
+    P_righe, classi_righe = appartenenza(valori_righe)
+    P_colonne, classi_colonne = appartenenza(valori_colonne)
+    return pd.DataFrame((P_righe.T @ P_colonne).toarray().astype(np.int64),
+                        index=pd.Index(classi_righe), columns=pd.Index(classi_colonne))
+
+
+def carica_nodi(cartella='data/new'):
+    """nodes.csv con, se presenti, genres_mapped e modularity_class di map.py e country di nazionalita.py."""
+    df_nodes = carica_tabella(os.path.join(cartella, 'grezzi', 'nodes.csv'))
+    try:
+        df_generi = carica_tabella(os.path.join(cartella, 'generi-mappati.csv'))
+        # Il file esportato da Gephi ha Id al posto di id
+        df_generi = df_generi.rename(columns={'Id': 'id'})
+        aggiunte = [c for c in ('genres_mapped', 'modularity_class') if c in df_generi.columns]
+        df_nodes = df_nodes.merge(df_generi[['id'] + aggiunte].drop_duplicates('id', keep='last'),
+                                  on='id', how='left')
+    except FileNotFoundError:
+        pass
+    try:
+        df_artisti = carica_tabella(os.path.join(cartella, 'nazioni', 'artisti-e-nazionalita.csv'),
+                                    colonne=['spotify_id', 'country'])
+        df_artisti = df_artisti.drop_duplicates('spotify_id', keep='last').rename(columns={'spotify_id': 'id'})
+        df_nodes = df_nodes.merge(df_artisti, on='id', how='left')
+    except FileNotFoundError:
+        pass
+    return df_nodes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grafi contratti per nazione, genere, comunita e popolarita")
+    parser.add_argument('--attributi', nargs='+', default=None,
+                        help=f"colonne dei nodi da usare (default: quelle disponibili tra {', '.join(ATTRIBUTI)})")
+    parser.add_argument('--fasce', type=int, default=AMPIEZZA_FASCE, help="ampiezza delle fasce di popolarita")
+    parser.add_argument('--cartella', default='data/new')
+    parser.add_argument('--output', default=CARTELLA_OUTPUT)
+    args = parser.parse_args()
+
+    df_nodes = carica_nodi(args.cartella)
+    attributi = args.attributi or [a for a in ATTRIBUTI if a in df_nodes.columns]
+    mancanti = [a for a in attributi if a not in df_nodes.columns]
+    if mancanti:
+        parser.error(f"colonne non presenti: {', '.join(mancanti)} (disponibili: {', '.join(df_nodes.columns)})")
+    df_edges = carica_tabella(os.path.join(args.cartella, 'grezzi', 'edges.csv'),
+                              colonne=['source', 'target', 'weight'])
+
+    risultati = contrai_grafo(df_nodes, df_edges, attributi, fasce={'popularity': args.fasce})
+    for nome, (nodi, archi) in risultati.items():
+        salva_tabella(nodi, os.path.join(args.output, nome, 'nodes.csv'), encoding='utf-8-sig')
+        salva_tabella(archi, os.path.join(args.output, nome, 'edges.csv'), encoding='utf-8-sig')
+        print(f"{nome}: {len(nodi)} classi, {len(archi)} archi, peso totale {archi['Weight'].sum():.0f}")
+    print(f"File salvati in {args.output}")
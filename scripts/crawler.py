@@ -0,0 +1,168 @@
+# Motore asincrono per la raccolta delle collaborazioni livello per livello
+
+import asyncio
+import time
+from scripts.collection import estrai_collaborazioni
+from scripts.batch import a_blocchi, profilo, MAX_ARTISTI, MAX_ALBUM
+
+CONCORRENZA_DEFAULT = 8
+# Artisti della frontiera risolti insieme: profili e album vengono chiesti in blocco
+DIMENSIONE_BLOCCO = 50
+
+
+def registra_blocco(stato, blocco, profili, risultati, albums, livelli=None):
+    """Registra nello stato, nell'ordine della coda, gli artisti di un blocco risolto.
+
+    livelli associa agli artisti il livello da registrare, se diverso da quello in corso.
+    """
+    for artist_id in blocco:
+        collabs = risultati[artist_id]
+        if isinstance(collabs, Exception):
+            print(f"Errore con {artist_id}: {collabs}")
+            continue
+        info = profili.get(artist_id)
+        if info is None and artist_id not in stato.nodes_data:
+            print(f"Errore con {artist_id}: profilo non trovato")
+            continue
+        stato.registra_artista(artist_id, info, collabs, albums[artist_id], (livelli or {}).get(artist_id))
+        print(f"Processato: {stato.nodes_data[artist_id]['name']} ({len(collabs)} collaborazioni)")
+
+
+class StatisticheLivello:
+    """Conta le richieste effettuate e il tempo trascorso durante un livello del crawl."""
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.richieste = 0
+        self.inizio = time.perf_counter()
+        self.fine = None
+
+    def chiudi(self):
+        self.fine = time.perf_counter()
+
+    @property
+    def durata(self):
+        fine = self.fine if self.fine is not None else time.perf_counter()
+        return fine - self.inizio
+
+    @property
+    def richieste_al_secondo(self):
+        return self.richieste / self.durata if self.durata > 0 else 0.0
+
+    def __str__(self):
+        return (f"Livello {self.depth}: {self.richieste} richieste in {self.durata:.1f}s "
+                f"({self.richieste_al_secondo:.1f} req/s)")
+
+
+class CrawlerAsincrono:
+    """Esegue le chiamate Spotify in parallelo mantenendo un numero limitato di richieste in volo."""
+
+    def __init__(self, sp, concorrenza=CONCORRENZA_DEFAULT):
+        self.sp = sp
+        self.concorrenza = concorrenza
+        self.semaforo = None
+        self.statistiche = []
+
+    async def _chiama(self, funzione, *args, **kwargs):
+        """Esegue una chiamata bloccante di spotipy in un thread, rispettando il limite di concorrenza."""
+        async with self.semaforo:
+            self.statistiche[-1].richieste += 1
+            return await asyncio.to_thread(funzione, *args, **kwargs)
+
+    async def _profili(self, blocco):
+        risultato = await self._chiama(self.sp.artists, blocco)
+        return [profilo(artist) for artist in risultato['artists'] if artist]
+
+    async def _pagine(self, pagina):
+        """Versione asincrona di tutte_le_pagine."""
+        items = list(pagina['items'])
+        while pagina['next']:
+            pagina = await self._chiama(self.sp.next, pagina)
+            items.extend(pagina['items'])
+        return items
+
+    async def _album_artista(self, artist_id):
+        pagina = await self._chiama(self.sp.artist_albums, artist_id, album_type='album,single', limit=50)
+        return await self._pagine(pagina)
+
+    async def _tracce(self, blocco):
+        risultato = await self._chiama(self.sp.albums, blocco)
+        albums = [album for album in risultato['albums'] if album]
+        pagine = await asyncio.gather(*(self._pagine(album['tracks']) for album in albums))
+        return {album['id']: items for album, items in zip(albums, pagine)}
+
+    async def _processa_blocco(self, artist_ids, serve_profilo):
+        """Come collaborazioni_blocco, ma con le richieste di ogni fase eseguite in parallelo."""
+        mancanti = [a for a in artist_ids if serve_profilo(a)]
+        gruppi = await asyncio.gather(*(self._profili(b) for b in a_blocchi(mancanti, MAX_ARTISTI)))
+        profili = {p['id']: p for gruppo in gruppi for p in gruppo}
+
+        elenchi = await asyncio.gather(
+            *(self._album_artista(a) for a in artist_ids),
+            return_exceptions=True
+        )
+        risultati = {a: e for a, e in zip(artist_ids, elenchi) if isinstance(e, Exception)}
+        albums = {a: [album['id'] for album in elenco]
+                  for a, elenco in zip(artist_ids, elenchi) if not isinstance(elenco, Exception)}
+
+        da_scaricare = list(dict.fromkeys(a for ids in albums.values() for a in ids))
+        tracce = {}
+        for gruppo in await asyncio.gather(*(self._tracce(b) for b in a_blocchi(da_scaricare, MAX_ALBUM))):
+            tracce.update(gruppo)
+
+        for artist_id, ids in albums.items():
+            risultati[artist_id] = estrai_collaborazioni(tracce[a] for a in ids if a in tracce)
+        return profili, risultati, albums
+
+    async def _per_artista(self, blocco, stato):
+        """Riprende un blocco fallito un artista alla volta: l'errore resta solo a chi fallisce anche da solo."""
+        esiti = await asyncio.gather(*(self._processa_blocco([a], lambda a: a not in stato.nodes_data)
+                                       for a in blocco), return_exceptions=True)
+        profili, risultati, albums = {}, {}, {}
+        for artist_id, esito in zip(blocco, esiti):
+            if isinstance(esito, Exception):
+                risultati[artist_id] = esito
+                continue
+            profili.update(esito[0])
+            risultati.update(esito[1])
+            albums.update(esito[2])
+        return profili, risultati, albums
+
+    async def _crawl(self, stato, max_depth):
+        self.semaforo = asyncio.Semaphore(self.concorrenza)
+        current_level_queue = stato.current_level_queue
+
+        while stato.depth < max_depth:
+            print(f"Analisi livello {stato.depth + 1}")
+            self.statistiche.append(StatisticheLivello(stato.depth + 1))
+
+            # Tutti i blocchi del livello vengono scaricati insieme, senza duplicati
+            da_processare = [a for a in dict.fromkeys(current_level_queue) if a not in stato.processed_ids]
+            blocchi = a_blocchi(da_processare, DIMENSIONE_BLOCCO)
+            tasks = [asyncio.ensure_future(self._processa_blocco(b, lambda a: a not in stato.nodes_data))
+                     for b in blocchi]
+
+            # I risultati vengono registrati nell'ordine della coda, come nella versione sequenziale,
+            # appena pronti: un'interruzione perde solo le richieste ancora in volo
+            try:
+                for blocco, task in zip(blocchi, tasks):
+                    try:
+                        profili, risultati, albums = await task
+                    except Exception as e:
+                        print(f"Errore con il blocco di {blocco[0]}: {e}, nuovo tentativo artista per artista")
+                        profili, risultati, albums = await self._per_artista(blocco, stato)
+                    registra_blocco(stato, blocco, profili, risultati, albums)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            self.statistiche[-1].chiudi()
+            print(self.statistiche[-1])
+
+            current_level_queue = stato.chiudi_livello()
+            if not current_level_queue:
+                break
+
+    def crawl(self, stato, max_depth):
+        """Esegue la visita in ampiezza aggiornando lo stato del crawl (vedi scripts/checkpoint.py)."""
+        asyncio.run(self._crawl(stato, max_depth))
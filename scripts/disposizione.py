@@ -0,0 +1,139 @@
+# Disposizione dei nodi in stile ForceAtlas2, calcolata sulla matrice sparsa dei pesi
+#
+# Le forze sono quelle di ForceAtlas2 (Jacomy et al. 2014, l'algoritmo di
+# Gephi) con tutte le operazioni su array numpy:
+#   attrazione   lineare lungo gli archi, proporzionale al peso: per tutti i
+#                nodi insieme A x - grado * x, un prodotto sparso per iterazione
+#   repulsione   kr (g_i + 1)(g_j + 1) / d tra ogni coppia di nodi (g = grado)
+#   gravita      kg (g_i + 1) verso l'origine, tiene vicine le componenti separate
+# e con la velocita adattiva globale e locale di ForceAtlas2 (oscillazione e
+# trazione). La repulsione tra tutte le coppie e esatta fino a SOGLIA_ESATTA
+# nodi; oltre, le masse vengono distribuite su una griglia (cloud-in-cell) e
+# il campo di repulsione e la convoluzione della griglia con il nucleo r / |r|^2
+# fatta con la FFT, poi interpolato nella posizione di ogni nodo: il costo per
+# iterazione cresce con nodi e archi, non con il loro quadrato.
+#
+# Uso:
+#     from scripts.disposizione import forceatlas2
+#     posizioni = forceatlas2(g.pesi, iterazioni=100)     (g da scripts.metriche.carica_grafo)
+
+import functools
+
+import numpy as np
+from scipy import fft, sparse
+
+ITERAZIONI = 100
+SCALA = 10.0
+GRAVITA = 1.0
+TOLLERANZA = 1.0
+SOGLIA_ESATTA = 1000
+LATO_GRIGLIA = 256
+BLOCCO_ESATTO = 500
+
+
+def _repulsione_esatta(pos, massa):
+    """Somma su tutte le coppie di m_i m_j (p_i - p_j) / d^2, a blocchi di righe."""
+    forze = np.zeros_like(pos)
+    for inizio in range(0, len(pos), BLOCCO_ESATTO):
+        righe = pos[inizio:inizio + BLOCCO_ESATTO]
+        d2 = ((righe[:, None, :] - pos[None, :, :]) ** 2).sum(axis=2)
+        with np.errstate(divide='ignore'):
+            W = np.where(d2 > 0, 1.0 / d2, 0.0) * massa[None, :]
+        # sum_j W_ij (p_i - p_j) = p_i sum_j W_ij - (W p)_i
+        forze[inizio:inizio + BLOCCO_ESATTO] = righe * W.sum(axis=1)[:, None] - W @ pos
+    return forze * massa[:, None]
+
+
+def _pesi_griglia(pos, lato):
+    """Celle in basso a sinistra e pesi cloud-in-cell dei quattro vertici per ogni nodo."""
+    minimo = pos.min(axis=0)
+    passo = max((pos.max(axis=0) - minimo).max() / (lato - 1), 1e-12)
+    coordinate = (pos - minimo) / passo
+    cella = np.minimum(np.floor(coordinate).astype(np.int64), lato - 2)
+    frazione = coordinate - cella
+    return cella, frazione, passo
+
+
+@functools.lru_cache(maxsize=4)
+def _nucleo_griglia(lato):
+    """Trasformate del nucleo r / |r|^2 (nullo nell'origine) su celle unitarie, per la convoluzione."""
+    offset = np.arange(-(lato - 1), lato, dtype=np.float64)
+    rx, ry = np.meshgrid(offset, offset, indexing='ij')
+    r2 = rx ** 2 + ry ** 2
+    r2[lato - 1, lato - 1] = np.inf
+    forma = tuple(fft.next_fast_len(3 * lato - 2, real=True) for _ in range(2))
+    return forma, [fft.rfft2(nucleo / r2, forma) for nucleo in (rx, ry)]
+
+
+def _repulsione_griglia(pos, massa, lato=LATO_GRIGLIA):
+    """Repulsione approssimata: masse sulla griglia, convoluzione con la FFT, interpolazione."""
+    cella, f, passo = _pesi_griglia(pos, lato)
+    vertici = [(0, 0, (1 - f[:, 0]) * (1 - f[:, 1])), (1, 0, f[:, 0] * (1 - f[:, 1])),
+               (0, 1, (1 - f[:, 0]) * f[:, 1]), (1, 1, f[:, 0] * f[:, 1])]
+    griglia = np.zeros(lato * lato)
+    for dx, dy, peso in vertici:
+        griglia += np.bincount((cella[:, 0] + dx) * lato + cella[:, 1] + dy, massa * peso, lato * lato)
+    griglia = griglia.reshape(lato, lato)
+
+    # Il nucleo per celle di lato passo e quello per celle unitarie diviso per passo
+    forma, trasformate = _nucleo_griglia(lato)
+    griglia_f = fft.rfft2(griglia, forma)
+    campi = [fft.irfft2(griglia_f * nucleo, forma)[lato - 1:2 * lato - 1, lato - 1:2 * lato - 1] / passo
+             for nucleo in trasformate]
+
+    forze = np.zeros_like(pos)
+    for dx, dy, peso in vertici:
+        i, j = cella[:, 0] + dx, cella[:, 1] + dy
+        forze[:, 0] += peso * campi[0][i, j]
+        forze[:, 1] += peso * campi[1][i, j]
+    return forze * massa[:, None]
+
+
+def forceatlas2(pesi, iterazioni=ITERAZIONI, scala=SCALA, gravita=GRAVITA, tolleranza=TOLLERANZA, seed=0,
+                posizioni=None):
+    """Posizioni (n x 2) dei nodi della matrice simmetrica dei pesi (n x n, sparsa).
+
+    posizioni sono quelle di partenza (ad esempio di una disposizione precedente),
+    altrimenti casuali con seed. Con piu di SOGLIA_ESATTA nodi la repulsione e
+    calcolata sulla griglia.
+    """
+    A = sparse.csr_matrix(pesi, dtype=np.float64)
+    n = A.shape[0]
+    rng = np.random.default_rng(seed)
+    pos = (np.array(posizioni, dtype=np.float64) if posizioni is not None
+           else rng.uniform(-1, 1, size=(n, 2)) * np.sqrt(max(n, 1)))
+    if n == 0:
+        return pos
+    grado_pesato = np.asarray(A.sum(axis=1)).ravel()
+    massa = (A != 0).sum(axis=1).A1 + 1.0
+    repulsione = _repulsione_esatta if n <= SOGLIA_ESATTA else _repulsione_griglia
+
+    precedenti = np.zeros_like(pos)
+    velocita, efficienza = 1.0, 1.0
+    # Tolleranza all'oscillazione stimata come in Gephi dal numero di nodi
+    stima_tolleranza = 0.05 * np.sqrt(n)
+    for _ in range(iterazioni):
+        forze = A @ pos - grado_pesato[:, None] * pos
+        forze += scala * repulsione(pos, massa)
+        distanza = np.sqrt((pos ** 2).sum(axis=1))
+        forze -= (gravita * massa / np.maximum(distanza, 1e-12))[:, None] * pos
+
+        # Velocita adattiva di ForceAtlas2: oscillazione e trazione di ogni nodo
+        oscillazione = massa * np.sqrt(((forze - precedenti) ** 2).sum(axis=1))
+        trazione = massa * np.sqrt(((forze + precedenti) ** 2).sum(axis=1)) / 2
+        totale_oscillazione, totale_trazione = oscillazione.sum(), max(trazione.sum(), 1e-12)
+        tolleranza_attuale = tolleranza * max(np.sqrt(stima_tolleranza),
+                                              min(10.0, stima_tolleranza * totale_trazione / n ** 2))
+        if totale_oscillazione / totale_trazione > 2.0:
+            efficienza = max(efficienza * 0.5, 0.05)
+            tolleranza_attuale = max(tolleranza_attuale, tolleranza)
+        obiettivo = tolleranza_attuale * efficienza * totale_trazione / max(totale_oscillazione, 1e-12)
+        if totale_oscillazione > tolleranza_attuale * totale_trazione:
+            efficienza = max(efficienza * 0.7, 0.05)
+        elif velocita < 1000:
+            efficienza *= 1.3
+        velocita += min(obiettivo - velocita, 0.5 * velocita)
+
+        pos += (velocita / (1 + np.sqrt(velocita * oscillazione)))[:, None] * forze
+        precedenti = forze
+    return pos
@@ -0,0 +1,290 @@
+# Esportazione del grafo degli artisti in GEXF o GraphML, pronta da aprire in Gephi
+#
+# Gephi importa nodes.csv/edges.csv lentamente e senza tipi (popolarita e
+# metriche diventano testo) e la disposizione va rifatta a mano. Qui il
+# grafo viene scritto come GEXF 1.3 (oppure GraphML, secondo l'estensione del
+# file) con:
+#   - gli attributi dei nodi con il loro tipo: popolarita, generi, generi
+#     mappati e comunita di map.py, nazione di nazionalita.py e le metriche di
+#     scripts/metriche.py, quando i rispettivi file esistono
+#   - il peso di ogni arco (grafo non orientato)
+#   - con --layout, le posizioni calcolate da scripts/disposizione.py
+#     (ForceAtlas2 sulla matrice sparsa dei pesi)
+# Il file viene scritto in streaming: i nodi a blocchi dalla tabella degli
+# attributi, gli archi a blocchi da edges.parquet (o da edges.csv letto a
+# pezzi), quindi la memoria non cresce con il numero di archi. Solo la
+# disposizione carica la matrice dei pesi per intero.
+#
+# Uso (dalla cartella del progetto):
+#     python -m scripts.esportazione                                   data/new/grezzi/rete.gexf
+#     python -m scripts.esportazione --layout --iterazioni 200
+#     python -m scripts.esportazione --output data/new/grezzi/rete.graphml
+
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.archivio import archi_a_blocchi, carica_indici, carica_tabella, indici_aggiornati
+from scripts.contrazione import carica_nodi
+from scripts.disposizione import ITERAZIONI, forceatlas2
+from scripts.metriche import carica_grafo
+
+FORMATI = ('gexf', 'graphml')
+BLOCCO = 100_000
+PERCORSO_OUTPUT = 'data/new/grezzi/rete.gexf'
+# Colonne del nodo trattate a parte: ID, etichetta e posizione
+SPECIALI = ('id', 'name', 'x', 'y')
+CARATTERI_NON_VALIDI = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+DA_ESCAPARE = re.compile('[&<>"\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Tipi degli attributi, con gli stessi nomi in GEXF e GraphML
+TIPI = {'intero': 'long', 'reale': 'double', 'booleano': 'boolean', 'testo': 'string'}
+
+
+def _escapa_testo(testo):
+    testo = CARATTERI_NON_VALIDI.sub('', testo)
+    for carattere, entita in (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;')):
+        testo = testo.replace(carattere, entita)
+    return testo
+
+
+def _escapa(valori):
+    """Testo di una colonna pronto per un attributo XML.
+
+    Una sola ricerca per valore: solo quelli con caratteri speciali (quasi mai
+    negli ID, a volte nei nomi) vengono trasformati.
+    """
+    testo = pd.Series(valori, dtype=object).astype(str)
+    da_cambiare = testo.str.contains(DA_ESCAPARE, regex=True).to_numpy()
+    if da_cambiare.any():
+        testo[da_cambiare] = [_escapa_testo(t) for t in testo[da_cambiare]]
+    return testo
+
+
+def _tipo(serie):
+    """Tipo di una colonna di attributi; i float con soli valori interi (es. dopo un merge) sono interi."""
+    if pd.api.types.is_bool_dtype(serie):
+        return 'booleano'
+    if pd.api.types.is_integer_dtype(serie):
+        return 'intero'
+    if pd.api.types.is_float_dtype(serie):
+        validi = serie.dropna()
+        return 'intero' if len(validi) and (validi == np.floor(validi)).all() else 'reale'
+    return 'testo'
+
+
+def _testo_valori(serie, tipo):
+    """Valori della colonna come testo XML, None dove mancano."""
+    mancanti = serie.isna().to_numpy()
+    if tipo == 'intero':
+        testo = pd.Series(serie.fillna(0).to_numpy().astype(np.int64).astype(str), index=serie.index)
+    elif tipo == 'booleano':
+        testo = serie.map({True: 'true', False: 'false'})
+    elif tipo == 'reale':
+        testo = pd.Series([repr(float(v)) for v in serie.fillna(0).to_numpy()], index=serie.index)
+    else:
+        testo = _escapa(serie.to_numpy())
+        testo.index = serie.index
+    return testo.mask(mancanti, None)
+
+
+def _numero(valori):
+    """Pesi degli archi come testo: interi se lo sono tutti."""
+    valori = np.asarray(valori)
+    if valori.dtype.kind in 'iu' or (valori.dtype.kind == 'f' and np.array_equal(valori, np.floor(valori))):
+        return valori.astype(np.int64).astype(str)
+    return _numero_reale(valori)
+
+
+def _numero_reale(valori):
+    """Numeri reali come testo, con tutte le cifre (repr)."""
+    return np.array([repr(float(v)) for v in np.asarray(valori, dtype=np.float64)], dtype=object)
+
+
+class ScrittoreGrafo:
+    """Scrive nodi e archi in GEXF o GraphML un blocco alla volta.
+
+    attributi associa il nome di ogni colonna dei nodi al suo tipo ('intero',
+    'reale', 'booleano', 'testo'); con posizioni ogni nodo ha x e y.
+    """
+
+    def __init__(self, f, formato, attributi, posizioni=False):
+        self.f = f
+        self.formato = formato
+        self.attributi = attributi
+        self.posizioni = posizioni
+        self.archi = 0
+
+    def intestazione(self):
+        righe = ['<?xml version="1.0" encoding="UTF-8"?>']
+        if self.formato == 'gexf':
+            righe += ['<gexf xmlns="http://gexf.net/1.3" xmlns:viz="http://gexf.net/1.3/viz" version="1.3">',
+                      '  <graph mode="static" defaultedgetype="undirected">',
+                      '    <attributes class="node">']
+            righe += [f'      <attribute id="{i}" title="{_escapa([nome])[0]}" type="{TIPI[tipo]}"/>'
+                      for i, (nome, tipo) in enumerate(self.attributi.items())]
+            righe += ['    </attributes>', '    <nodes>']
+        else:
+            righe += ['<graphml xmlns="http://graphml.graphdrawing.org/xmlns">',
+                      '  <key id="label" for="node" attr.name="label" attr.type="string"/>']
+            righe += [f'  <key id="d{i}" for="node" attr.name="{_escapa([nome])[0]}" attr.type="{TIPI[tipo]}"/>'
+                      for i, (nome, tipo) in enumerate(self.attributi.items())]
+            if self.posizioni:
+                righe += ['  <key id="x" for="node" attr.name="x" attr.type="float"/>',
+                          '  <key id="y" for="node" attr.name="y" attr.type="float"/>']
+            righe += ['  <key id="weight" for="edge" attr.name="weight" attr.type="double"/>',
+                      '  <graph edgedefault="undirected">']
+        self.f.write('\n'.join(righe) + '\n')
+
+    def nodi(self, df):
+        """Scrive un blocco di nodi (colonne id, name, gli attributi e, se previste, x e y)."""
+        ids = _escapa(df['id'].to_numpy())
+        etichette = _escapa(df['name'].fillna(df['id']).to_numpy()) if 'name' in df.columns else ids
+        if self.formato == 'gexf':
+            righe = '      <node id="' + ids + '" label="' + etichette.to_numpy() + '">'
+            valori = pd.Series('', index=ids.index)
+            for i, (nome, tipo) in enumerate(self.attributi.items()):
+                testo = _testo_valori(df[nome].reset_index(drop=True), tipo)
+                valori += ('<attvalue for="' + str(i) + '" value="' + testo + '"/>').fillna('')
+            righe += '<attvalues>' + valori + '</attvalues>'
+            if self.posizioni:
+                righe += ('<viz:position x="' + _numero_reale(df['x']) + '" y="' + _numero_reale(df['y'])
+                          + '" z="0.0"/>')
+            righe += '</node>'
+        else:
+            righe = '    <node id="' + ids + '"><data key="label">' + etichette.to_numpy() + '</data>'
+            for i, (nome, tipo) in enumerate(self.attributi.items()):
+                testo = _testo_valori(df[nome].reset_index(drop=True), tipo)
+                righe += ('<data key="d' + str(i) + '">' + testo + '</data>').fillna('')
+            if self.posizioni:
+                righe += ('<data key="x">' + _numero_reale(df['x']) + '</data><data key="y">'
+                          + _numero_reale(df['y']) + '</data>')
+            righe += '</node>'
+        self.f.write('\n'.join(righe.tolist()) + '\n')
+
+    def inizio_archi(self):
+        if self.formato == 'gexf':
+            self.f.write('    </nodes>\n    <edges>\n')
+
+    def blocco_archi(self, source, target, pesi):
+        # Gli estremi si ripetono molto: ogni ID distinto del blocco viene trasformato una volta
+        codici, distinti = pd.factorize(np.concatenate([source, target]))
+        estremi = _escapa(distinti).to_numpy()[codici]
+        source, target, pesi = estremi[:len(source)], estremi[len(source):], _numero(pesi)
+        if self.formato == 'gexf':
+            ids = np.arange(self.archi, self.archi + len(pesi)).astype(str)
+            righe = ('      <edge id="' + ids + '" source="' + source + '" target="' + target
+                     + '" weight="' + pesi + '"/>')
+        else:
+            righe = ('    <edge source="' + source + '" target="' + target + '"><data key="weight">' + pesi
+                     + '</data></edge>')
+        self.archi += len(pesi)
+        if len(righe):
+            self.f.write('\n'.join(righe.tolist()) + '\n')
+
+    def chiusura(self):
+        if self.formato == 'gexf':
+            self.f.write('    </edges>\n  </graph>\n</gexf>\n')
+        else:
+            self.f.write('  </graph>\n</graphml>\n')
+
+
+def formato_da_percorso(percorso):
+    formato = os.path.splitext(percorso)[1].lstrip('.').lower()
+    if formato not in FORMATI:
+        raise ValueError(f"Formato non supportato: {percorso} (estensioni: {', '.join(FORMATI)})")
+    return formato
+
+
+def scrivi_grafo(percorso, df_nodes, blocchi, dimensione=BLOCCO):
+    """Scrive il grafo in GEXF o GraphML (dall'estensione di percorso) e restituisce il numero di archi.
+
+    df_nodes ha le colonne id, name e gli attributi da esportare; se ha anche x
+    e y, sono le posizioni dei nodi. blocchi e un iterabile di (source, target,
+    weight) come archivio.archi_a_blocchi: gli archi non vengono mai tenuti
+    tutti in memoria. Il file viene scritto accanto e poi rinominato.
+    """
+    formato = formato_da_percorso(percorso)
+    attributi = {nome: _tipo(df_nodes[nome]) for nome in df_nodes.columns if nome not in SPECIALI}
+    posizioni = 'x' in df_nodes.columns and 'y' in df_nodes.columns
+    cartella = os.path.dirname(percorso)
+    if cartella:
+        os.makedirs(cartella, exist_ok=True)
+
+    with open(percorso + '.tmp', 'w', encoding='utf-8', buffering=1 << 20) as f:
+        scrittore = ScrittoreGrafo(f, formato, attributi, posizioni)
+        scrittore.intestazione()
+        for inizio in range(0, len(df_nodes), dimensione):
+            scrittore.nodi(df_nodes.iloc[inizio:inizio + dimensione])
+        scrittore.inizio_archi()
+        for source, target, pesi in blocchi:
+            scrittore.blocco_archi(source, target, pesi)
+        scrittore.chiusura()
+    os.replace(percorso + '.tmp', percorso)
+    return scrittore.archi
+
+
+def attributi_nodi(cartella='data/new'):
+    """Nodi con tutti gli attributi disponibili: carica_nodi piu le metriche di scripts/metriche.py.
+
+    Gli artisti presenti solo negli archi vengono aggiunti in coda senza attributi,
+    cosi ogni estremo degli archi e un nodo del file.
+    """
+    df_nodes = carica_nodi(cartella).drop_duplicates('id', keep='last')
+    try:
+        df_metriche = carica_tabella(os.path.join(cartella, 'metriche', 'metriche.csv'))
+        aggiunte = [c for c in df_metriche.columns if c not in df_nodes.columns]
+        df_nodes = df_nodes.merge(df_metriche[['id'] + aggiunte].drop_duplicates('id', keep='last'),
+                                  on='id', how='left')
+    except FileNotFoundError:
+        pass
+
+    grezzi = os.path.join(cartella, 'grezzi')
+    if indici_aggiornati(grezzi):
+        ids = pd.Index(carica_indici(grezzi))
+    else:
+        # Una lettura a blocchi degli archi per trovare gli estremi senza profilo
+        ids = pd.Index(df_nodes['id'])
+        for source, target, _ in archi_a_blocchi(grezzi, BLOCCO):
+            estremi = pd.Index(source).append(pd.Index(target)).unique()
+            ids = ids.append(estremi[~estremi.isin(ids)])
+    mancanti = ids[~ids.isin(df_nodes['id'])]
+    if len(mancanti):
+        df_nodes = pd.concat([df_nodes, pd.DataFrame({'id': mancanti})], ignore_index=True)
+    return df_nodes
+
+
+def disponi(df_nodes, cartella='data/new', **opzioni):
+    """Aggiunge a df_nodes le colonne x e y calcolate con scripts/disposizione.forceatlas2."""
+    grezzi = os.path.join(cartella, 'grezzi')
+    g, _ = carica_grafo(os.path.join(grezzi, 'nodes.csv'), os.path.join(grezzi, 'edges.csv'))
+    posizioni = forceatlas2(g.pesi, **opzioni)
+    indice = pd.Index(g.ids).get_indexer(df_nodes['id'])
+    # Nodi fuori dal grafo (mai se df_nodes viene da attributi_nodi): nell'origine
+    posizioni = np.vstack([posizioni, np.zeros((1, 2))])[indice]
+    return df_nodes.assign(x=posizioni[:, 0], y=posizioni[:, 1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grafo degli artisti in GEXF o GraphML per Gephi")
+    parser.add_argument('--cartella', default='data/new')
+    parser.add_argument('--output', default=PERCORSO_OUTPUT, help="file .gexf o .graphml")
+    parser.add_argument('--layout', action='store_true', help="calcola le posizioni dei nodi con ForceAtlas2")
+    parser.add_argument('--iterazioni', type=int, default=ITERAZIONI, help="iterazioni di ForceAtlas2")
+    parser.add_argument('--seed', type=int, default=0, help="seed delle posizioni iniziali")
+    args = parser.parse_args()
+    try:
+        formato_da_percorso(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+
+    df_nodes = attributi_nodi(args.cartella)
+    if args.layout:
+        df_nodes = disponi(df_nodes, args.cartella, iterazioni=args.iterazioni, seed=args.seed)
+    archi = scrivi_grafo(args.output, df_nodes, archi_a_blocchi(os.path.join(args.cartella, 'grezzi'), BLOCCO))
+    print(f"Salvati {len(df_nodes)} nodi e {archi} archi in {args.output}")
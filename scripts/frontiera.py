@@ -0,0 +1,306 @@
+# Crawl per priorita con budget di richieste o di tempo
+#
+# La visita in ampiezza di main.py processa ogni collaboratore scoperto, e
+# oltre il primo livello la frontiera cresce soprattutto con artisti poco
+# popolari e poco collegati. Qui la frontiera e una coda di priorita (heapq
+# con aggiornamenti pigri: un artista viene reinserito quando il suo
+# punteggio cambia e le voci non piu attuali vengono scartate all'estrazione)
+# e a ogni passo viene processato un blocco dei DIMENSIONE_BLOCCO artisti
+# migliori secondo il punteggio scelto:
+#   ampiezza     distanza dai seed, poi ordine di scoperta (come la visita in ampiezza)
+#   peso         numero di collaborazioni gia trovate con l'artista, poi distanza
+#   popolarita   popolarita del profilo (scaricato in anticipo con sp.artists,
+#                50 artisti per richiesta), poi peso e distanza
+# I seed vengono sempre processati per primi e vengono considerati solo gli
+# artisti a distanza minore di MAX_DEPTH, quindi senza budget gli artisti
+# processati (e i file prodotti) sono gli stessi della visita in ampiezza.
+#
+# Con un budget di richieste prima di ogni blocco viene stimato il costo del
+# blocco (richieste per artista misurate finora, piu i profili dei nuovi
+# collaboratori che recupera_profili_mancanti dovra scaricare) e il blocco
+# viene ridotto o il crawl fermato per non superarlo. La stima e una media,
+# quindi il budget e anche un limite rigido: durante il crawl nessuna
+# richiesta parte oltre il budget (BudgetEsaurito) e main.py scarica i
+# profili mancanti solo con le richieste rimaste (richieste_rimaste). Con un
+# budget di tempo i blocchi sono stimati allo stesso modo con i secondi per
+# artista, senza limite rigido. Gli artisti di un blocco che non vengono
+# processati (errore o budget) tornano nella frontiera, al massimo
+# TENTATIVI_ARTISTA volte. Dopo ogni blocco viene stampata
+# la copertura raggiunta: artisti processati, artisti e collaborazioni
+# scoperti, per richiesta spesa.
+#
+# Lo stato e quello di scripts/checkpoint.py: ogni artista viene registrato con
+# la sua distanza dai seed e, alla ripresa, la frontiera viene ricostruita
+# dagli archi e dagli artisti gia processati.
+#
+# Uso:
+#     python main.py --priorita peso --budget-richieste 2000 --copertura data/new/copertura.csv
+#     python main.py --priorita popolarita --budget-tempo 600
+# Confronto dei punteggi a parita di richieste: python -m benchmark.frontiera
+
+import heapq
+import itertools
+import math
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from scripts.batch import MAX_ARTISTI, a_blocchi, collaborazioni_blocco, profili_artisti
+from scripts.crawler import DIMENSIONE_BLOCCO, registra_blocco
+from scripts.misure import misure
+
+PUNTEGGI = ('ampiezza', 'peso', 'popolarita')
+TENTATIVI_ARTISTA = 2
+
+
+class BudgetEsaurito(Exception):
+    """Sollevata al posto di una richiesta che supererebbe il budget."""
+
+
+class ClientLimitato:
+    """Inoltra le chiamate al client Spotify finche le richieste spese dall'inizio restano sotto il limite."""
+
+    def __init__(self, sp, iniziali, limite):
+        self._sp = sp
+        self._iniziali = iniziali
+        self._limite = limite
+
+    def __getattr__(self, nome):
+        metodo = getattr(self._sp, nome)
+        if not callable(metodo):
+            return metodo
+
+        def chiamata(*args, **kwargs):
+            if misure.richieste('spotify') - self._iniziali >= self._limite:
+                raise BudgetEsaurito(f"budget di {self._limite} richieste esaurito")
+            return metodo(*args, **kwargs)
+        return chiamata
+
+
+class Frontiera:
+    """Coda di priorita degli artisti da processare, con distanza dai seed, peso e popolarita."""
+
+    def __init__(self, punteggio, max_depth):
+        if punteggio not in PUNTEGGI:
+            raise ValueError(f"Punteggio sconosciuto: {punteggio} (disponibili: {', '.join(PUNTEGGI)})")
+        self.punteggio = punteggio
+        self.max_depth = max_depth
+        self.distanza = {}                    # artista scoperto -> distanza minima dai seed
+        self.peso = defaultdict(int)          # artista -> collaborazioni trovate finora
+        self.popolarita = {}                  # artista -> popolarita, se il profilo e noto
+        self.ordine = {}                      # artista -> ordine di scoperta
+        self.in_attesa = set()
+        self.estratti = set()
+        self._coda = []
+        self._contatore = itertools.count()
+
+    def chiave(self, artista):
+        d = self.distanza[artista]
+        if self.punteggio == 'ampiezza':
+            return (d > 0, d, self.ordine[artista])
+        if self.punteggio == 'peso':
+            return (d > 0, -self.peso[artista], d, self.ordine[artista])
+        return (d > 0, -self.popolarita.get(artista, -1), -self.peso[artista], d, self.ordine[artista])
+
+    def _inserisci(self, artista):
+        if artista in self.estratti or self.distanza[artista] >= self.max_depth:
+            return
+        self.in_attesa.add(artista)
+        heapq.heappush(self._coda, (self.chiave(artista), next(self._contatore), artista))
+
+    def scopri(self, artista, distanza, peso=0):
+        """Registra un artista trovato a distanza dai seed con peso nuove collaborazioni."""
+        if artista not in self.ordine:
+            self.ordine[artista] = len(self.ordine)
+        self.distanza[artista] = min(distanza, self.distanza.get(artista, distanza))
+        self.peso[artista] += peso
+        self._inserisci(artista)
+
+    def imposta_popolarita(self, artista, popolarita):
+        self.popolarita[artista] = popolarita
+        if artista in self.in_attesa:
+            self._inserisci(artista)
+
+    def escludi(self, artista):
+        """Toglie dalla frontiera un artista gia processato."""
+        self.in_attesa.discard(artista)
+        self.estratti.add(artista)
+
+    def reinserisci(self, artista):
+        """Rimette in attesa un artista estratto ma non processato."""
+        self.estratti.discard(artista)
+        self._inserisci(artista)
+
+    def estrai(self, n):
+        """I migliori n artisti in attesa, ognuno restituito una sola volta."""
+        blocco = []
+        while self._coda and len(blocco) < n:
+            chiave, _, artista = heapq.heappop(self._coda)
+            if artista in self.in_attesa and chiave == self.chiave(artista):
+                self.escludi(artista)
+                blocco.append(artista)
+        return blocco
+
+    def __len__(self):
+        return len(self.in_attesa)
+
+
+class CrawlerPriorita:
+    """Processa la frontiera a blocchi in ordine di punteggio, entro un budget di richieste o di secondi."""
+
+    def __init__(self, sp, punteggio='peso', budget_richieste=None, budget_tempo=None):
+        self.sp = sp
+        self.punteggio = punteggio
+        self.budget_richieste = budget_richieste
+        self.budget_tempo = budget_tempo
+        self.copertura = []
+        self.iniziali = None
+
+    def _ricostruisci(self, stato, max_depth):
+        """Frontiera dello stato: coda del livello in corso, artisti processati e archi non ancora chiusi."""
+        frontiera = Frontiera(self.punteggio, max_depth)
+        livelli = stato.livelli_processati()
+        for artista, livello in livelli.items():
+            frontiera.scopri(artista, livello - 1)
+            frontiera.escludi(artista)
+        for artista in stato.current_level_queue:
+            frontiera.scopri(artista, stato.depth)
+        # Una coppia trovata nelle tracce di un artista processato puo non contenerlo:
+        # la sua distanza e al piu quella del livello piu profondo processato
+        distanza_massima = max(livelli.values(), default=stato.depth)
+        for pair, peso in stato.archi_livello.items():
+            for a, b in (pair, pair[::-1]):
+                distanza = frontiera.distanza[b] + 1 if b in stato.processed_ids else distanza_massima
+                frontiera.scopri(a, distanza, peso)
+        for artista in frontiera.in_attesa:
+            if artista in stato.nodes_data:
+                frontiera.imposta_popolarita(artista, stato.nodes_data[artista]['popularity'])
+        return frontiera
+
+    def richieste_rimaste(self):
+        """Richieste ancora disponibili nel budget dall'inizio del crawl (None senza budget di richieste)."""
+        if self.budget_richieste is None:
+            return None
+        spese = misure.richieste('spotify') - self.iniziali if self.iniziali is not None else 0
+        return max(self.budget_richieste - spese, 0)
+
+    def _profili_frontiera(self, sp, stato, frontiera, limite):
+        """Scarica i profili degli artisti in attesa che non li hanno (al massimo limite richieste, se indicato)."""
+        mancanti = sorted((a for a in frontiera.in_attesa if a not in frontiera.popolarita),
+                          key=frontiera.ordine.get)
+        if limite is not None:
+            mancanti = mancanti[:max(limite, 0) * MAX_ARTISTI]
+        for blocco in a_blocchi(mancanti, MAX_ARTISTI):
+            try:
+                profili = profili_artisti(sp, blocco)
+            except BudgetEsaurito:
+                return
+            except Exception as e:
+                print(f"Errore con i profili di {blocco[0]}: {e}")
+                continue
+            stato.registra_nodi(list(profili.values()), durante_crawl=True)
+            for artista in blocco:
+                # Senza profilo l'artista resta in coda con la priorita piu bassa
+                frontiera.imposta_popolarita(artista, profili[artista]['popularity'] if artista in profili else -1)
+
+    def _dimensione_blocco(self, spese, trascorso, mancanti, processati, richieste_blocchi, tempo_blocchi,
+                           nuovi):
+        """Artisti del prossimo blocco che si possono processare senza superare i budget (0 = fermarsi)."""
+        if self.budget_richieste is not None and spese >= self.budget_richieste:
+            return 0
+        if processati == 0:
+            return DIMENSIONE_BLOCCO
+        n = DIMENSIONE_BLOCCO
+        if self.budget_richieste is not None:
+            # Richieste del blocco piu profili ancora da scaricare, compresi quelli dei collaboratori nuovi
+            while n > 0 and (spese + n * richieste_blocchi / processati
+                             + math.ceil((mancanti + n * nuovi / processati) / MAX_ARTISTI)
+                             > self.budget_richieste):
+                n -= 1
+        if self.budget_tempo is not None and tempo_blocchi > 0:
+            n = min(n, int((self.budget_tempo - trascorso) / (tempo_blocchi / processati)))
+        return max(n, 0)
+
+    def _registra_copertura(self, stato, frontiera, spese, trascorso, processati, popolarita):
+        riga = {
+            'richieste': spese,
+            'secondi': round(trascorso, 3),
+            'processati': processati,
+            'artisti': len(frontiera.distanza),
+            'collaborazioni': len(stato.archi_livello),
+            'peso': sum(frontiera.peso.values()) // 2,
+            'popolarita': popolarita,
+            'in_attesa': len(frontiera),
+        }
+        self.copertura.append(riga)
+        per_richiesta = riga['collaborazioni'] / spese if spese else 0.0
+        print(f"Copertura: {processati} artisti processati, {riga['artisti']} scoperti, "
+              f"{riga['collaborazioni']} collaborazioni con {spese} richieste "
+              f"({per_richiesta:.2f} collaborazioni per richiesta) in {trascorso:.1f}s")
+
+    def crawl(self, stato, max_depth):
+        """Processa la frontiera dello stato fino a esaurirla o a esaurire il budget."""
+        frontiera = self._ricostruisci(stato, max_depth)
+        iniziali = self.iniziali = misure.richieste('spotify')
+        sp = self.sp if self.budget_richieste is None else ClientLimitato(self.sp, iniziali, self.budget_richieste)
+        tentativi = defaultdict(int)
+        inizio = time.perf_counter()
+        processati = richieste_blocchi = nuovi = 0
+        tempo_blocchi = 0.0
+        popolarita = sum(stato.nodes_data[a]['popularity'] for a in stato.processed_ids if a in stato.nodes_data)
+        motivo = "frontiera esaurita"
+        print(f"Crawl per {self.punteggio}: {len(frontiera)} artisti in attesa")
+
+        while frontiera:
+            spese = misure.richieste('spotify') - iniziali
+            trascorso = time.perf_counter() - inizio
+            if self.punteggio == 'popolarita':
+                limite = self.budget_richieste - spese if self.budget_richieste is not None else None
+                self._profili_frontiera(sp, stato, frontiera, limite)
+                spese = misure.richieste('spotify') - iniziali
+            mancanti = sum(1 for a in frontiera.distanza if a not in stato.nodes_data)
+            n = self._dimensione_blocco(spese, trascorso, mancanti, processati, richieste_blocchi,
+                                        tempo_blocchi, nuovi)
+            if n == 0:
+                motivo = "budget esaurito"
+                break
+
+            blocco = frontiera.estrai(n)
+            scoperti = len(frontiera.distanza)
+            inizio_blocco, richieste_prima = time.perf_counter(), misure.richieste('spotify')
+            # Un errore del blocco viene ripreso artista per artista da collaborazioni_blocco
+            profili, risultati, albums = collaborazioni_blocco(sp, blocco, lambda a: a not in stato.nodes_data)
+            registra_blocco(stato, blocco, profili, risultati, albums,
+                            livelli={a: frontiera.distanza[a] + 1 for a in blocco})
+
+            for artista in blocco:
+                if artista not in stato.processed_ids:
+                    # Non processato (errore o budget): torna in attesa per un nuovo tentativo
+                    tentativi[artista] += 1
+                    if tentativi[artista] < TENTATIVI_ARTISTA or isinstance(risultati.get(artista), BudgetEsaurito):
+                        frontiera.reinserisci(artista)
+                    continue
+                distanza = frontiera.distanza[artista] + 1
+                for pair in risultati[artista]:
+                    for a in pair:
+                        if a != artista:
+                            frontiera.scopri(a, distanza, 1)
+                            if a in stato.nodes_data:
+                                frontiera.imposta_popolarita(a, stato.nodes_data[a]['popularity'])
+                frontiera.peso[artista] += sum(artista in pair for pair in risultati[artista])
+                popolarita += stato.nodes_data[artista]['popularity']
+                processati += 1
+
+            richieste_blocchi += misure.richieste('spotify') - richieste_prima
+            tempo_blocchi += time.perf_counter() - inizio_blocco
+            nuovi += len(frontiera.distanza) - scoperti
+            self._registra_copertura(stato, frontiera, misure.richieste('spotify') - iniziali,
+                                     time.perf_counter() - inizio, processati, popolarita)
+
+        print(f"Crawl per {self.punteggio} terminato ({motivo}): {processati} artisti processati, "
+              f"{len(frontiera)} ancora in attesa")
+
+    def salva_copertura(self, percorso):
+        """Scrive la curva di copertura (una riga per blocco) in CSV."""
+        pd.DataFrame(self.copertura).to_csv(percorso, index=False)
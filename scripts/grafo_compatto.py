@@ -0,0 +1,363 @@
+# Strutture compatte per nodi e archi accumulati durante il crawl
+#
+# Al posto di un Counter con chiavi (id, id) e di un dizionario di dizionari
+# per i profili:
+#   RegistroId      ogni Spotify ID viene salvato una volta e associato a un int32
+#   ArchiCompatti   le coppie sono chiavi uint64 (indice_a << 32 | indice_b) accodate
+#                   in un buffer; quando e pieno viene ordinato con numpy insieme
+#                   alle chiavi gia ridotte e le chiavi uguali sommate (sort-and-reduce)
+#   ArchiSuDisco    come ArchiCompatti per la somma finale dei livelli del crawl, ma
+#                   con i record divisi in secchi su disco per chiave e ridotti un
+#                   secchio alla volta, quindi con memoria limitata (riduzione esterna)
+#   NodiColonnari   nome, popolarita e generi come colonne, una riga per artista
+# Le classi espongono le operazioni usate da scripts/checkpoint.py e main.py
+# (in, [], items, len) e conservano l'ordine di inserimento, quindi
+# nodes.csv ed edges.csv restano identici. ArchiSuDisco.blocchi restituisce
+# gli archi a blocchi di indici interi, per scriverli senza costruire l'intera
+# tabella di stringhe (archivio.salva_grafo_a_blocchi). Confronto della memoria:
+#     python -m benchmark.grafo_compatto
+
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONE_BUFFER = 1 << 16
+DIMENSIONE_SCRITTURA = 1 << 20
+MASCHERA = np.uint64(0xFFFFFFFF)
+# Record per secchio di ArchiSuDisco: limita la memoria della riduzione di un secchio
+RECORD_PER_SECCHIO = 1 << 21
+MAX_SECCHI = 512
+RECORD = np.dtype([('chiave', np.uint64), ('primo', np.int64), ('peso', np.int64)])
+
+
+def _cresci(array, minimo):
+    """Restituisce array ingrandito (almeno del doppio) per contenere minimo elementi."""
+    if len(array) >= minimo:
+        return array
+    nuovo = np.empty(max(minimo, 2 * len(array)), dtype=array.dtype)
+    nuovo[:len(array)] = array
+    return nuovo
+
+
+class RegistroId:
+    """Associa a ogni Spotify ID un indice int32 progressivo; ogni stringa viene tenuta una volta."""
+
+    def __init__(self):
+        self.indici = {}
+        self.ids = []
+        self._array = None
+
+    def indice(self, artist_id):
+        """Indice dell'ID, registrandolo se e nuovo."""
+        i = self.indici.get(artist_id)
+        if i is None:
+            i = len(self.ids)
+            artist_id = sys.intern(artist_id)
+            self.indici[artist_id] = i
+            self.ids.append(artist_id)
+            self._array = None
+        return i
+
+    def cerca(self, artist_id):
+        """Indice dell'ID oppure -1 se non e registrato."""
+        return self.indici.get(artist_id, -1)
+
+    def array(self):
+        """Gli ID come array numpy di oggetti, per le conversioni vettoriali."""
+        if self._array is None:
+            self._array = np.array(self.ids, dtype=object)
+        return self._array
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class ArchiCompatti:
+    """Pesi delle coppie (source, target) con source < target, nell'ordine di prima comparsa."""
+
+    def __init__(self, registro=None):
+        self.registro = registro if registro is not None else RegistroId()
+        # Parte ridotta: chiavi ordinate e uniche con peso e numero d'ordine della prima comparsa
+        self.chiavi = np.empty(0, dtype=np.uint64)
+        self.pesi = np.empty(0, dtype=np.int32)
+        self.primo = np.empty(0, dtype=np.int64)
+        # Buffer delle aggiunte non ancora ridotte (array compatti di interi C, append veloce)
+        self._chiavi = array('Q')
+        self._pesi = array('q')
+        self._soglia = DIMENSIONE_BUFFER
+        self._contatore = 0
+
+    def aggiungi(self, pair, peso=1):
+        """Somma peso alla coppia (source, target), gia ordinata."""
+        if len(self._chiavi) >= self._soglia:
+            self._riduci()
+        indici = self.registro.indici
+        u, v = indici.get(pair[0]), indici.get(pair[1])
+        if u is None:
+            u = self.registro.indice(pair[0])
+        if v is None:
+            v = self.registro.indice(pair[1])
+        self._chiavi.append((u << 32) | v)
+        self._pesi.append(peso)
+
+    def update(self, conteggio):
+        """Somma i pesi di un dizionario {(source, target): peso}, come Counter.update."""
+        if hasattr(conteggio, 'items'):
+            conteggio = conteggio.items()
+        for pair, peso in conteggio:
+            self.aggiungi(pair, peso)
+
+    def _riduci(self):
+        """Ordina il buffer insieme alla parte gia ridotta e somma le chiavi uguali."""
+        n = len(self._chiavi)
+        if n == 0:
+            return
+        ordini = np.arange(self._contatore, self._contatore + n, dtype=np.int64)
+        self._contatore += n
+        chiavi = np.concatenate([self.chiavi, np.frombuffer(self._chiavi, dtype=np.uint64)])
+        pesi = np.concatenate([self.pesi, np.frombuffer(self._pesi, dtype=np.int64).astype(np.int32)])
+        primo = np.concatenate([self.primo, ordini])
+        self._chiavi = array('Q')
+        self._pesi = array('q')
+
+        ordine = np.argsort(chiavi, kind='stable')
+        chiavi = chiavi[ordine]
+        inizi = np.flatnonzero(np.concatenate([[True], chiavi[1:] != chiavi[:-1]]))
+        self.chiavi = chiavi[inizi]
+        self.pesi = np.add.reduceat(pesi[ordine], inizi).astype(np.int32)
+        self.primo = np.minimum.reduceat(primo[ordine], inizi)
+
+        # Il buffer cresce con il grafo, cosi il numero di riduzioni resta logaritmico
+        self._soglia = max(DIMENSIONE_BUFFER, len(self.chiavi) // 2)
+
+    def __getitem__(self, pair):
+        u, v = (self.registro.cerca(a) for a in pair)
+        if u < 0 or v < 0:
+            return 0
+        self._riduci()
+        chiave = np.uint64((u << 32) | v)
+        pos = np.searchsorted(self.chiavi, chiave)
+        if pos < len(self.chiavi) and self.chiavi[pos] == chiave:
+            return int(self.pesi[pos])
+        return 0
+
+    def __contains__(self, pair):
+        return self[pair] > 0
+
+    def __len__(self):
+        self._riduci()
+        return len(self.chiavi)
+
+    def _in_ordine(self):
+        """Indici dei due estremi e pesi, nell'ordine di prima comparsa delle coppie."""
+        self._riduci()
+        ordine = np.argsort(self.primo, kind='stable')
+        chiavi = self.chiavi[ordine]
+        return (chiavi >> np.uint64(32)).astype(np.int64), (chiavi & np.uint64(0xFFFFFFFF)).astype(np.int64), \
+            self.pesi[ordine]
+
+    def items(self):
+        u, v, pesi = self._in_ordine()
+        ids = self.registro.ids
+        for a, b, peso in zip(u.tolist(), v.tolist(), pesi.tolist()):
+            yield (ids[a], ids[b]), peso
+
+    def keys(self):
+        return (pair for pair, _ in self.items())
+
+    __iter__ = keys
+
+    def estremi(self):
+        """Insieme degli ID che compaiono in almeno una coppia."""
+        self._riduci()
+        indici = np.unique(np.concatenate([self.chiavi >> np.uint64(32), self.chiavi & np.uint64(0xFFFFFFFF)]))
+        return set(self.registro.array()[indici.astype(np.int64)])
+
+    def a_dataframe(self):
+        """DataFrame source/target/weight, come gli edges.csv scritti da main.py."""
+        u, v, pesi = self._in_ordine()
+        ids = self.registro.array()
+        return pd.DataFrame({'source': ids[u], 'target': ids[v], 'weight': pesi.astype(np.int64)})
+
+
+class ArchiSuDisco:
+    """Pesi delle coppie sommati su disco, per grafi che non conviene ridurre tutti in memoria.
+
+    Ogni aggiunta diventa un record (chiave, numero d'ordine, peso) scritto nel
+    secchio chiave % secchi. Alla prima lettura ogni secchio viene ridotto da
+    solo (chiavi uguali sommate, come ArchiCompatti._riduci) e riordinato per
+    prima comparsa; blocchi() poi fonde i secchi mappati in memoria per
+    intervalli di numeri d'ordine. record_previsti serve a scegliere il numero
+    di secchi. I file stanno in una cartella temporanea dentro cartella,
+    rimossa da chiudi().
+    """
+
+    def __init__(self, registro, cartella=None, record_previsti=0):
+        self.registro = registro
+        self.secchi = int(min(MAX_SECCHI, max(1, -(-record_previsti // RECORD_PER_SECCHIO))))
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+        self.cartella = tempfile.mkdtemp(prefix='riduzione-', dir=cartella)
+        self._file = [open(self._percorso(b, 'grezzo'), 'wb') for b in range(self.secchi)]
+        self._contatore = 0
+        self._ridotti = None
+
+    def _percorso(self, secchio, tipo):
+        return os.path.join(self.cartella, f'{tipo}-{secchio:03d}.bin')
+
+    def aggiungi_indici(self, u, v, pesi):
+        """Accoda le coppie (array di indici del registro, gia ordinate) ai rispettivi secchi."""
+        record = np.empty(len(u), dtype=RECORD)
+        record['chiave'] = (np.asarray(u, dtype=np.uint64) << np.uint64(32)) | np.asarray(v, dtype=np.uint64)
+        record['primo'] = np.arange(self._contatore, self._contatore + len(u))
+        record['peso'] = pesi
+        self._contatore += len(u)
+        secchio = (record['chiave'] % np.uint64(self.secchi)).astype(np.int64)
+        ordine = np.argsort(secchio, kind='stable')
+        confini = np.concatenate([[0], np.cumsum(np.bincount(secchio, minlength=self.secchi))])
+        record = record[ordine]
+        for b in range(self.secchi):
+            if confini[b + 1] > confini[b]:
+                record[confini[b]:confini[b + 1]].tofile(self._file[b])
+
+    def aggiungi_blocco(self, sources, targets, pesi):
+        """Come aggiungi_indici, con gli ID: ogni ID distinto del blocco viene cercato una volta nel registro."""
+        codici, distinti = pd.factorize(np.concatenate([np.asarray(sources, dtype=object),
+                                                        np.asarray(targets, dtype=object)]))
+        indici = np.fromiter((self.registro.indice(a) for a in distinti), dtype=np.int64, count=len(distinti))
+        n = len(sources)
+        self.aggiungi_indici(indici[codici[:n]], indici[codici[n:]], pesi)
+
+    def _riduci(self):
+        """Riduce i secchi uno alla volta; il risultato e ordinato per numero d'ordine."""
+        if self._ridotti is not None:
+            return
+        self._ridotti = []
+        for b, f in enumerate(self._file):
+            f.close()
+            record = np.fromfile(self._percorso(b, 'grezzo'), dtype=RECORD)
+            os.remove(self._percorso(b, 'grezzo'))
+            record = record[np.argsort(record['chiave'], kind='stable')]
+            # Un secchio vuoto (ad esempio un crawl senza collaborazioni) non ha inizi
+            inizi = np.flatnonzero(np.concatenate([[True], record['chiave'][1:] != record['chiave'][:-1]]))
+            inizi = inizi[:len(record)]
+            ridotti = np.empty(len(inizi), dtype=RECORD)
+            ridotti['chiave'] = record['chiave'][inizi]
+            ridotti['peso'] = np.add.reduceat(record['peso'], inizi) if len(inizi) else 0
+            ridotti['primo'] = np.minimum.reduceat(record['primo'], inizi) if len(inizi) else 0
+            del record
+            ridotti = ridotti[np.argsort(ridotti['primo'], kind='stable')]
+            ridotti.tofile(self._percorso(b, 'ridotto'))
+            self._ridotti.append(len(ridotti))
+
+    def __len__(self):
+        self._riduci()
+        return sum(self._ridotti)
+
+    def blocchi(self, dimensione=DIMENSIONE_SCRITTURA):
+        """Genera (source, target, weight) come array di indici del registro, nell'ordine di prima comparsa."""
+        self._riduci()
+        secchi = [np.memmap(self._percorso(b, 'ridotto'), dtype=RECORD, mode='r') if n else None
+                  for b, n in enumerate(self._ridotti)]
+        cursori = [0] * self.secchi
+        # I numeri d'ordine sono unici: ogni intervallo di ampiezza dimensione ha al piu dimensione archi
+        for fine in range(dimensione, self._contatore + dimensione, dimensione):
+            parti = []
+            for b, secchio in enumerate(secchi):
+                if secchio is None:
+                    continue
+                fine_secchio = cursori[b] + int(np.searchsorted(secchio['primo'][cursori[b]:], fine))
+                if fine_secchio > cursori[b]:
+                    parti.append(np.array(secchio[cursori[b]:fine_secchio]))
+                    cursori[b] = fine_secchio
+            if not parti:
+                continue
+            record = np.concatenate(parti)
+            record = record[np.argsort(record['primo'])]
+            yield ((record['chiave'] >> np.uint64(32)).astype(np.int64),
+                   (record['chiave'] & MASCHERA).astype(np.int64), record['peso'])
+        del secchi
+
+    def chiudi(self):
+        for f in self._file:
+            f.close()
+        shutil.rmtree(self.cartella, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *errore):
+        self.chiudi()
+
+
+class NodiColonnari:
+    """Profili degli artisti come colonne; si usa come un dizionario id -> profilo."""
+
+    def __init__(self, registro=None):
+        self.registro = registro if registro is not None else RegistroId()
+        self.riga = np.full(1024, -1, dtype=np.int32)     # indice del registro -> riga
+        self.indice = np.empty(1024, dtype=np.int32)      # riga -> indice del registro
+        self.popolarita = np.empty(1024, dtype=np.int16)
+        self.nomi = []
+        self.generi = []
+
+    def __setitem__(self, artist_id, info):
+        i = self.registro.indice(artist_id)
+        if i >= len(self.riga):
+            vecchia = len(self.riga)
+            self.riga = _cresci(self.riga, i + 1)
+            self.riga[vecchia:] = -1
+        r = self.riga[i]
+        if r < 0:
+            # Nuovo artista: riga in coda, come l'inserimento in un dizionario
+            r = len(self.nomi)
+            self.riga[i] = r
+            self.indice = _cresci(self.indice, r + 1)
+            self.popolarita = _cresci(self.popolarita, r + 1)
+            self.indice[r] = i
+            self.nomi.append(info['name'])
+            self.generi.append(info['genres'])
+        else:
+            self.nomi[r] = info['name']
+            self.generi[r] = info['genres']
+        self.popolarita[r] = info['popularity']
+
+    def _riga(self, artist_id):
+        i = self.registro.cerca(artist_id)
+        return self.riga[i] if 0 <= i < len(self.riga) else -1
+
+    def __contains__(self, artist_id):
+        return self._riga(artist_id) >= 0
+
+    def __getitem__(self, artist_id):
+        r = self._riga(artist_id)
+        if r < 0:
+            raise KeyError(artist_id)
+        return {'id': self.registro.ids[self.indice[r]], 'name': self.nomi[r],
+                'popularity': int(self.popolarita[r]), 'genres': self.generi[r]}
+
+    def get(self, artist_id, predefinito=None):
+        return self[artist_id] if artist_id in self else predefinito
+
+    def __len__(self):
+        return len(self.nomi)
+
+    def keys(self):
+        ids = self.registro.ids
+        return (ids[i] for i in self.indice[:len(self.nomi)].tolist())
+
+    __iter__ = keys
+
+    def values(self):
+        return (self[artist_id] for artist_id in self.keys())
+
+    def a_dataframe(self):
+        """DataFrame id/name/popularity/genres, come i nodes.csv scritti da main.py."""
+        n = len(self.nomi)
+        return pd.DataFrame({'id': self.registro.array()[self.indice[:n]], 'name': self.nomi,
+                             'popularity': self.popolarita[:n].astype(np.int64), 'genres': self.generi})
@@ -1,11 +1,32 @@
 # Script per generare una heatmap della distribuzione dei generi per comunità
-
+#
+# Il grafico viene solo salvato; con --mostra si apre anche la finestra.
+#
+# Uso (dalla cartella scripts):
+#     python heatmap.py [--mostra]
+
+import argparse
+import os
+import sys
+import matplotlib
+
+parser = argparse.ArgumentParser(description="Heatmap dei generi per comunita")
+parser.add_argument('--mostra', action='store_true', help="apre la finestra del grafico dopo averlo salvato")
+args = parser.parse_args()
+
+# Senza finestra si usa un backend che non richiede un display
+if not args.mostra:
+    matplotlib.use('Agg')
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.contrazione import appartenenza, incrocio
+from scripts.archivio import carica_tabella
+
 # Configurazione colori
 gephi_palette = [
     "#845D95", "#FB71FF", "#F6B2FB", "#A947C7", 
@@ -16,10 +37,10 @@ gephi_cmap = LinearSegmentedColormap.from_list("gephi", ["#FFFFFF", "#F4C0F7", "
 
 # Caricamento dati
 try:
-    df = pd.read_csv('../data/new/generi-mappati.csv')
+    df = carica_tabella('../data/new/generi-mappati.csv')
     genre_column = 'genres_mapped'
 except FileNotFoundError:
-    df = pd.read_csv('../data/new/grezzi/nodes.csv')
+    df = carica_tabella('../data/new/grezzi/nodes.csv')
     genre_column = 'genres'
 
 df_clean = df[df[genre_column].notna()].copy()
@@ -28,28 +49,17 @@ df_clean = df_clean[df_clean[genre_column].str.len() > 0].copy()
 # Filtro comunità da escludere
 df_clean = df_clean[~df_clean['modularity_class'].isin([7, 11, 13, 14, 15, 16])].copy()
 
-# Elaborazione generi e creazione matrice
-genres_expanded = []
-for idx, row in df_clean.iterrows():
-    genres = row[genre_column].split(';')
-    community = row['modularity_class']
-    for genre in genres:
-        genre = genre.strip()
-        if genre:
-            genres_expanded.append({
-                'community': community,
-                'genre': genre
-            })
-
-df_genres = pd.DataFrame(genres_expanded)
-heatmap_data = pd.crosstab(df_genres['community'], df_genres['genre'])
+# Matrice comunita x generi (P_comunita^T P_generi, scripts/contrazione.py)
+heatmap_data = incrocio(df_clean['modularity_class'], df_clean[genre_column])
 
 all_communities = sorted(df_clean['modularity_class'].unique())
 heatmap_data = heatmap_data.reindex(all_communities, fill_value=0)
 heatmap_data = heatmap_data.sort_index()
 
 # Selezione top generi
-genre_counts = df_genres['genre'].value_counts()
+P_generi, generi = appartenenza(df_clean[genre_column])
+genre_counts = pd.Series(np.asarray(P_generi.sum(axis=0)).ravel(), index=generi)
+genre_counts = genre_counts.sort_values(ascending=False, kind='stable')
 num_genres = min(15, len(genre_counts))
 top_genres = genre_counts.head(num_genres).index
 heatmap_data_filtered = heatmap_data[top_genres]
@@ -98,7 +108,8 @@ plt.yticks(fontsize=10)
 plt.tight_layout()
 
 plt.savefig('../report/heatmap.png', dpi=300, bbox_inches='tight')
-plt.show()
+if args.mostra:
+    plt.show()
 
 # Statistiche principali
 print(f"Numero totale di comunita: {df_clean['modularity_class'].nunique()}")
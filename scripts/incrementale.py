@@ -0,0 +1,124 @@
+# Aggiornamento incrementale della rete: discografie note e nuove uscite
+#
+# Per ogni artista processato vengono salvati gli ID dei suoi album e le
+# collaborazioni gia trovate. Un aggiornamento legge la prima pagina della
+# discografia: se il totale non e cresciuto e gli album sono tutti noti non
+# serve altro, altrimenti si scaricano solo gli album nuovi e le coppie mai
+# viste vengono sommate ai pesi di edges.csv. Le coppie aggiunte vengono
+# scritte anche in delta-edges.csv, per aggiornare le metriche senza
+# ricalcolarle da zero (python -m scripts.metriche --delta).
+
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from scripts.archivio import carica_tabella, salva_grafo
+from scripts.batch import a_blocchi, profili_artisti, tracce_album
+from scripts.collection import estrai_collaborazioni
+
+PERCORSO_DISCOGRAFIE = 'data/new/discografie.sqlite'
+FILE_DELTA = 'delta-edges.csv'
+DIMENSIONE_BLOCCO = 50
+
+
+class Discografie:
+    """Album e collaborazioni noti per ogni artista gia processato."""
+
+    def __init__(self, percorso=PERCORSO_DISCOGRAFIE):
+        cartella = os.path.dirname(percorso)
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+        self.conn = sqlite3.connect(percorso)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS artisti (id TEXT PRIMARY KEY, aggiornato REAL);
+            CREATE TABLE IF NOT EXISTS album (artist_id TEXT, album_id TEXT, PRIMARY KEY (artist_id, album_id));
+            CREATE TABLE IF NOT EXISTS coppie (artist_id TEXT, a TEXT, b TEXT, PRIMARY KEY (artist_id, a, b));
+        """)
+        self.conn.commit()
+
+    def registra(self, artist_id, album_ids, collabs, completa=True):
+        """Salva album e collaborazioni di un artista (completa=True sostituisce quelli precedenti)."""
+        if completa:
+            self.conn.execute("DELETE FROM album WHERE artist_id = ?", (artist_id,))
+            self.conn.execute("DELETE FROM coppie WHERE artist_id = ?", (artist_id,))
+        self.conn.execute("INSERT OR REPLACE INTO artisti VALUES (?, ?)", (artist_id, time.time()))
+        self.conn.executemany("INSERT OR IGNORE INTO album VALUES (?, ?)", [(artist_id, a) for a in album_ids])
+        self.conn.executemany("INSERT OR IGNORE INTO coppie VALUES (?, ?, ?)",
+                              [(artist_id,) + tuple(sorted(c)) for c in collabs])
+        self.conn.commit()
+
+    def artisti(self):
+        return [r[0] for r in self.conn.execute("SELECT id FROM artisti ORDER BY rowid")]
+
+    def album_noti(self, artist_id):
+        return {r[0] for r in self.conn.execute("SELECT album_id FROM album WHERE artist_id = ?", (artist_id,))}
+
+    def coppie_note(self, artist_id):
+        return {(a, b) for a, b in self.conn.execute("SELECT a, b FROM coppie WHERE artist_id = ?", (artist_id,))}
+
+    def chiudi(self):
+        self.conn.close()
+
+
+def album_nuovi(sp, artist_id, noti):
+    """Restituisce gli album non ancora noti, fermandosi alla prima pagina se non c'e nulla di nuovo."""
+    pagina = sp.artist_albums(artist_id, album_type='album,single', limit=50)
+    nuovi = [a['id'] for a in pagina['items'] if a['id'] not in noti]
+    if pagina['total'] <= len(noti) and not nuovi:
+        return []
+    while pagina['next']:
+        pagina = sp.next(pagina)
+        nuovi.extend(a['id'] for a in pagina['items'] if a['id'] not in noti)
+    return nuovi
+
+
+def aggiorna(sp, discografie, cartella='data/new/grezzi'):
+    """Aggiunge a nodes.csv/edges.csv le collaborazioni delle uscite successive all'ultimo crawl."""
+    df_nodes = carica_tabella(os.path.join(cartella, 'nodes.csv'))
+    df_edges = carica_tabella(os.path.join(cartella, 'edges.csv'))
+    pesi = {(u, v): w for u, v, w in zip(df_edges['source'], df_edges['target'], df_edges['weight'])}
+    delta = {}
+
+    artisti = discografie.artisti()
+    print(f"Aggiornamento di {len(artisti)} discografie")
+    n_album = 0
+    n_nuove = 0
+
+    for blocco in a_blocchi(artisti, DIMENSIONE_BLOCCO):
+        nuovi = {}
+        for artist_id in blocco:
+            try:
+                nuovi[artist_id] = album_nuovi(sp, artist_id, discografie.album_noti(artist_id))
+            except Exception as e:
+                print(f"Errore con {artist_id}: {e}")
+
+        tracce = tracce_album(sp, [a for ids in nuovi.values() for a in ids])
+        for artist_id, ids in nuovi.items():
+            if not ids:
+                continue
+            collabs = {tuple(sorted(c)) for c in estrai_collaborazioni(tracce[a] for a in ids if a in tracce)}
+            # Una coppia conta una volta per artista, come nel crawl completo
+            nuove = collabs - discografie.coppie_note(artist_id)
+            for pair in nuove:
+                pesi[pair] = pesi.get(pair, 0) + 1
+                delta[pair] = delta.get(pair, 0) + 1
+            discografie.registra(artist_id, ids, nuove, completa=False)
+            n_album += len(ids)
+            n_nuove += len(nuove)
+
+    # Profili dei collaboratori comparsi per la prima volta
+    noti = set(df_nodes['id'])
+    mancanti = sorted({a for pair in pesi for a in pair} - noti)
+    if mancanti:
+        profili = profili_artisti(sp, mancanti)
+        df_nodes = pd.concat([df_nodes, pd.DataFrame(list(profili.values()))], ignore_index=True)
+
+    df_edges = pd.DataFrame([{'source': u, 'target': v, 'weight': w} for (u, v), w in pesi.items()])
+    salva_grafo(df_nodes, df_edges, cartella)
+    df_delta = pd.DataFrame([(u, v, w) for (u, v), w in delta.items()], columns=['source', 'target', 'weight'])
+    df_delta.to_csv(os.path.join(cartella, FILE_DELTA), index=False)
+
+    print(f"Aggiornamento completato: {n_album} album nuovi, {n_nuove} collaborazioni aggiunte, "
+          f"{len(mancanti)} nuovi artisti")
@@ -0,0 +1,440 @@
+# Indice locale Spotify ID / nome -> nazione costruito da un dump di Wikidata
+#
+# Il dump (JSON, una entita per riga, oppure N-Triples "truthy", anche .gz o
+# .bz2, intero o filtrato) viene letto una sola volta riga per riga. I dati
+# utili finiscono in un database SQLite temporaneo: artisti con Spotify ID
+# (P1902), musicisti con etichetta inglese, luoghi con la loro nazione (P17)
+# ed etichette delle nazioni. Alla fine le tabelle vengono unite e ordinate da
+# SQLite e lette a pezzi, scrivendo gli array su file temporanei: la memoria
+# usata non dipende dalla dimensione del dump. Il risultato e un file binario
+# compatto con array ordinati, letto tramite mmap: le ricerche sono ricerche
+# binarie vettoriali, senza rete. Per i nomi l'indice contiene un hash a 64
+# bit e il nome stesso, confrontato a ogni corrispondenza dell'hash.
+#
+# Nazione di un artista: luogo di nascita -> nazione (P19/P17), altrimenti
+# paese di origine (P495), altrimenti cittadinanza (P27), come nelle query
+# SPARQL di scripts/wikidata.py. Le etichette seguono l'ordine it, es, en.
+#
+# Uso:
+#     python -m scripts.indice_wikidata costruisci latest-all.json.gz --output data/wikidata/nazionalita.idx
+#     python -m scripts.indice_wikidata cerca data/wikidata/nazionalita.idx 4q3ewBCX7sLwd24euuV69X
+
+import argparse
+import bz2
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import sqlite3
+import time
+
+import numpy as np
+
+PERCORSO_INDICE = 'data/wikidata/nazionalita.idx'
+MAGIC = b'NAZWD002'
+LINGUE = ('it', 'es', 'en')
+DIMENSIONE_SCRITTURA = 10000
+
+# Classi di nazioni (P31) di cui conservare l'etichetta
+CLASSI_NAZIONI = {'Q6256', 'Q3624078', 'Q3024240', 'Q7275', 'Q1763527', 'Q15634554', 'Q161243',
+                  'Q46395', 'Q1335818', 'Q112099', 'Q417175', 'Q1048835'}
+# Occupazioni (P106) considerate musicisti: approssimano wdt:P106/wdt:P279* wd:Q639669, non calcolabile
+# senza una seconda lettura del dump
+MUSICISTI = {'Q639669', 'Q177220', 'Q2252262', 'Q488205', 'Q753110', 'Q36834', 'Q183945', 'Q130857',
+             'Q855091', 'Q386854', 'Q806349', 'Q1259917', 'Q2643890', 'Q1198887', 'Q158852', 'Q1075651'}
+PROPRIETA = ('P1902', 'P17', 'P19', 'P27', 'P31', 'P106', 'P495')
+
+ENTITA = 'http://www.wikidata.org/entity/'
+DIRETTA = 'http://www.wikidata.org/prop/direct/'
+ETICHETTA = 'http://www.w3.org/2000/01/rdf-schema#label'
+TRIPLA = re.compile(r'^<([^>]+)> <([^>]+)> (.+) \.\s*$')
+LETTERALE_NT = re.compile(r'^"(.*)"(?:@([\w-]+)|\^\^<[^>]+>)?$')
+
+
+def _stringa_nt(testo):
+    """Decodifica gli escape di un letterale N-Triples (\\uXXXX, \\UXXXXXXXX, \\n, ...)."""
+    testo = re.sub(r'\\U([0-9A-Fa-f]{8})', lambda m: chr(int(m.group(1), 16)), testo)
+    try:
+        return json.loads(f'"{testo}"')
+    except ValueError:
+        return testo
+
+
+def apri(percorso):
+    """Apre il dump in lettura testuale, decomprimendo al volo .gz e .bz2."""
+    if percorso.endswith('.gz'):
+        return gzip.open(percorso, 'rt', encoding='utf-8')
+    if percorso.endswith('.bz2'):
+        return bz2.open(percorso, 'rt', encoding='utf-8')
+    return open(percorso, encoding='utf-8')
+
+
+def _da_json(righe):
+    """Entita del dump JSON come (qid, etichette, proprieta), scartando le righe senza dati utili."""
+    for riga in righe:
+        riga = riga.strip().rstrip(',')
+        if not riga.startswith('{'):
+            continue
+        # Filtro veloce prima del parsing: serve almeno una delle proprieta usate
+        if not any(f'"{p}"' in riga for p in PROPRIETA):
+            continue
+        entita = json.loads(riga)
+        etichette = {l: v['value'] for l, v in entita.get('labels', {}).items() if l in LINGUE}
+        proprieta = {}
+        for p in PROPRIETA:
+            valori = []
+            for claim in entita.get('claims', {}).get(p, []):
+                valore = claim.get('mainsnak', {}).get('datavalue', {}).get('value')
+                if isinstance(valore, dict):
+                    valore = valore.get('id')
+                if valore:
+                    valori.append(valore)
+            if valori:
+                proprieta[p] = valori
+        yield entita['id'], etichette, proprieta
+
+
+def _da_ntriples(righe):
+    """Entita del dump N-Triples: le triple di uno stesso soggetto sono consecutive."""
+    attuale, etichette, proprieta = None, {}, {}
+    for riga in righe:
+        m = TRIPLA.match(riga)
+        if m is None or not m.group(1).startswith(ENTITA):
+            continue
+        soggetto = m.group(1)[len(ENTITA):]
+        if soggetto != attuale:
+            if attuale is not None and proprieta:
+                yield attuale, etichette, proprieta
+            attuale, etichette, proprieta = soggetto, {}, {}
+
+        predicato, oggetto = m.group(2), m.group(3)
+        if predicato == ETICHETTA:
+            lit = LETTERALE_NT.match(oggetto)
+            if lit and lit.group(2) in LINGUE:
+                etichette[lit.group(2)] = _stringa_nt(lit.group(1))
+        elif predicato.startswith(DIRETTA) and predicato[len(DIRETTA):] in PROPRIETA:
+            if oggetto.startswith(f'<{ENTITA}'):
+                valore = oggetto[len(ENTITA) + 1:-1]
+            else:
+                lit = LETTERALE_NT.match(oggetto)
+                valore = _stringa_nt(lit.group(1)) if lit else None
+            if valore:
+                proprieta.setdefault(predicato[len(DIRETTA):], []).append(valore)
+    if attuale is not None and proprieta:
+        yield attuale, etichette, proprieta
+
+
+def entita_dump(percorso):
+    """Legge il dump riconoscendo il formato dalla prima riga significativa."""
+    with apri(percorso) as f:
+        for riga in f:
+            if riga.strip() in ('', '['):
+                continue
+            righe = _concatena(riga, f)
+            yield from (_da_json(righe) if riga.lstrip().startswith('{') else _da_ntriples(righe))
+            return
+
+
+def _concatena(prima, resto):
+    yield prima
+    yield from resto
+
+
+def etichetta(etichette, predefinita):
+    for lingua in LINGUE:
+        if lingua in etichette:
+            return etichette[lingua]
+    return predefinita
+
+
+def hash_nome(nome):
+    return int.from_bytes(hashlib.blake2b(nome.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _hash_sql(nome):
+    """hash_nome come intero con segno, l'unico intero a 64 bit di SQLite (stessi bit)."""
+    h = hash_nome(nome)
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def _raccogli(percorso_dump, conn):
+    """Unica lettura del dump: salva su SQLite solo le righe che servono all'indice."""
+    conn.executescript("""
+        CREATE TABLE artisti (spotify TEXT, nome TEXT, p19 TEXT, p495 TEXT, p27 TEXT);
+        CREATE TABLE nomi (hash INTEGER, nome TEXT, p19 TEXT, p495 TEXT, p27 TEXT);
+        CREATE TABLE luoghi (q TEXT PRIMARY KEY, paese TEXT) WITHOUT ROWID;
+        CREATE TABLE paesi (q TEXT PRIMARY KEY, etichetta TEXT) WITHOUT ROWID;
+    """)
+    buffer = {'artisti': [], 'nomi': [], 'luoghi': [], 'paesi': []}
+    sql = {'artisti': "INSERT INTO artisti VALUES (?, ?, ?, ?, ?)",
+           'nomi': "INSERT INTO nomi VALUES (?, ?, ?, ?, ?)",
+           'luoghi': "INSERT OR IGNORE INTO luoghi VALUES (?, ?)",
+           'paesi': "INSERT OR IGNORE INTO paesi VALUES (?, ?)"}
+
+    def svuota(tabella):
+        conn.executemany(sql[tabella], buffer[tabella])
+        buffer[tabella].clear()
+
+    inizio = time.perf_counter()
+    n = 0
+    for qid, etichette, proprieta in entita_dump(percorso_dump):
+        n += 1
+        primo = {p: proprieta[p][0] if p in proprieta else None for p in ('P19', 'P495', 'P27')}
+        righe = []
+        for spotify_id in proprieta.get('P1902', []):
+            righe.append(('artisti', (spotify_id, etichetta(etichette, qid), primo['P19'], primo['P495'], primo['P27'])))
+        if 'en' in etichette and 'Q5' in proprieta.get('P31', []) and MUSICISTI & set(proprieta.get('P106', [])):
+            righe.append(('nomi', (_hash_sql(etichette['en']), etichette['en'], primo['P19'], primo['P495'], primo['P27'])))
+        if 'P17' in proprieta:
+            righe.append(('luoghi', (qid, proprieta['P17'][0])))
+        if CLASSI_NAZIONI & set(proprieta.get('P31', [])):
+            righe.append(('paesi', (qid, etichetta(etichette, qid))))
+
+        for tabella, valori in righe:
+            buffer[tabella].append(valori)
+            if len(buffer[tabella]) >= DIMENSIONE_SCRITTURA:
+                svuota(tabella)
+        if n % 1_000_000 == 0:
+            print(f"{n} entita lette in {time.perf_counter() - inizio:.0f}s")
+    for tabella in buffer:
+        svuota(tabella)
+    conn.commit()
+    return n
+
+
+def _nazione_sql(alias):
+    """Espressione SQL della nazione: P19 -> P17, poi P495, poi P27."""
+    return f"COALESCE(l.paese, {alias}.p495, {alias}.p27)"
+
+
+def _a_pezzi(cursore):
+    """Righe di una query a gruppi di DIMENSIONE_SCRITTURA, senza caricarle tutte."""
+    while True:
+        righe = cursore.fetchmany(DIMENSIONE_SCRITTURA)
+        if not righe:
+            return
+        yield righe
+
+
+class _Colonne:
+    """Array dell'indice scritti a pezzi su file temporanei e uniti solo alla fine."""
+
+    def __init__(self, percorso, tipi):
+        self.percorso = percorso
+        self.tipi = {nome: np.dtype(tipo) for nome, tipo in tipi.items()}
+        self.n = dict.fromkeys(self.tipi, 0)
+        self.file = {nome: open(self._temporaneo(nome), 'wb') for nome in self.tipi}
+        for nome in self.tipi:
+            if nome.endswith('_offset'):
+                self.aggiungi(nome, [0])
+
+    def _temporaneo(self, nome):
+        return f'{self.percorso}.tmp.{nome}'
+
+    def aggiungi(self, nome, valori):
+        a = np.asarray(valori, dtype=self.tipi[nome])
+        self.file[nome].write(a.tobytes())
+        self.n[nome] += len(a)
+
+    def aggiungi_testi(self, prefisso, valori):
+        """Codifica le stringhe come offset cumulativi e byte UTF-8 accodati a quelli gia scritti."""
+        codificati = [v.encode('utf-8') for v in valori]
+        fine = self.n[f'{prefisso}_testo']
+        self.aggiungi(f'{prefisso}_offset', fine + np.cumsum([len(c) for c in codificati], dtype=np.uint64))
+        self.aggiungi(f'{prefisso}_testo', np.frombuffer(b''.join(codificati), dtype=np.uint8))
+
+    def scrivi(self):
+        """Scrive gli array in un unico file: intestazione JSON e dati allineati a 8 byte."""
+        descrittori = {}
+        posizione = 0
+        for nome, tipo in self.tipi.items():
+            self.file[nome].close()
+            descrittori[nome] = {'offset': posizione, 'dtype': tipo.str, 'n': self.n[nome]}
+            posizione += (self.n[nome] * tipo.itemsize + 7) // 8 * 8
+        intestazione = json.dumps(descrittori).encode('utf-8')
+        inizio_dati = (len(MAGIC) + 8 + len(intestazione) + 7) // 8 * 8
+
+        with open(self.percorso, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(intestazione).to_bytes(8, 'little'))
+            f.write(intestazione)
+            f.write(b'\0' * (inizio_dati - f.tell()))
+            for nome, tipo in self.tipi.items():
+                with open(self._temporaneo(nome), 'rb') as dati:
+                    shutil.copyfileobj(dati, f)
+                byte = self.n[nome] * tipo.itemsize
+                f.write(b'\0' * ((byte + 7) // 8 * 8 - byte))
+
+    def rimuovi(self):
+        for nome, f in self.file.items():
+            f.close()
+            if os.path.exists(self._temporaneo(nome)):
+                os.remove(self._temporaneo(nome))
+
+
+def costruisci(percorso_dump, percorso=PERCORSO_INDICE):
+    """Costruisce l'indice leggendo il dump una sola volta."""
+    cartella = os.path.dirname(percorso)
+    if cartella:
+        os.makedirs(cartella, exist_ok=True)
+    temporaneo = percorso + '.tmp.sqlite'
+    if os.path.exists(temporaneo):
+        os.remove(temporaneo)
+    conn = sqlite3.connect(temporaneo)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    colonne = _Colonne(percorso, {
+        'id': 'S22', 'id_nazione': np.int32, 'id_nome_offset': np.uint64, 'id_nome_testo': np.uint8,
+        'nome_hash': np.uint64, 'nome_nazione': np.int32, 'nome_offset': np.uint64, 'nome_testo': np.uint8,
+        'nazioni_offset': np.uint64, 'nazioni_testo': np.uint8,
+    })
+    try:
+        n = _raccogli(percorso_dump, conn)
+        etichette_paesi = dict(conn.execute("SELECT q, etichetta FROM paesi"))
+
+        # Tabella delle nazioni: ogni artista punta alla sua con un intero
+        nazioni = {}
+
+        def codice(q):
+            if q is None:
+                return -1
+            nome = etichette_paesi.get(q, q)
+            return nazioni.setdefault(nome, len(nazioni))
+
+        # Spotify ID in ordine: i duplicati sono consecutivi e vale il primo
+        ultimo = None
+        for righe in _a_pezzi(conn.execute(
+                f"SELECT a.spotify, a.nome, {_nazione_sql('a')} FROM artisti a "
+                f"LEFT JOIN luoghi l ON l.q = a.p19 ORDER BY a.spotify, a.rowid")):
+            ids, nomi_artisti, nazioni_artisti = [], [], []
+            for spotify_id, nome, paese in righe:
+                if len(spotify_id) != 22 or not spotify_id.isascii() or spotify_id == ultimo:
+                    continue
+                ultimo = spotify_id
+                ids.append(spotify_id.encode('ascii'))
+                nomi_artisti.append(nome)
+                nazioni_artisti.append(codice(paese))
+            colonne.aggiungi('id', ids)
+            colonne.aggiungi('id_nazione', nazioni_artisti)
+            colonne.aggiungi_testi('id_nome', nomi_artisti)
+
+        # Nomi ordinati per hash senza segno (prima i positivi con segno); per ogni nome il primo
+        # musicista con una nazione, come LIMIT 1 nella query per nome
+        ultimo = None
+        for righe in _a_pezzi(conn.execute(
+                f"SELECT n.hash, n.nome, {_nazione_sql('n')} AS nazione FROM nomi n "
+                f"LEFT JOIN luoghi l ON l.q = n.p19 ORDER BY n.hash < 0, n.hash, n.nome, nazione IS NULL, n.rowid")):
+            hash_nomi, nomi, nazioni_nomi = [], [], []
+            for h, nome, paese in righe:
+                if (h, nome) == ultimo:
+                    continue
+                ultimo = (h, nome)
+                hash_nomi.append(h)
+                nomi.append(nome)
+                nazioni_nomi.append(codice(paese))
+            colonne.aggiungi('nome_hash', np.array(hash_nomi, dtype=np.int64).view(np.uint64))
+            colonne.aggiungi('nome_nazione', nazioni_nomi)
+            colonne.aggiungi_testi('nome', nomi)
+
+        colonne.aggiungi_testi('nazioni', list(nazioni))
+        colonne.scrivi()
+    finally:
+        conn.close()
+        os.remove(temporaneo)
+        colonne.rimuovi()
+
+    print(f"Indice salvato in {percorso}: {n} entita lette, {colonne.n['id']} Spotify ID, "
+          f"{colonne.n['nome_hash']} nomi, {len(nazioni)} nazioni, {os.path.getsize(percorso) / 1024 / 1024:.1f} MB")
+
+
+class IndiceNazionalita:
+    """Ricerche sull'indice tramite mmap: nessun dato viene caricato in memoria all'apertura."""
+
+    def __init__(self, percorso=PERCORSO_INDICE):
+        self.file = open(percorso, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{percorso} non e un indice delle nazionalita")
+        lunghezza = int.from_bytes(self.mm[len(MAGIC):len(MAGIC) + 8], 'little')
+        inizio = len(MAGIC) + 8
+        descrittori = json.loads(self.mm[inizio:inizio + lunghezza])
+        inizio_dati = (inizio + lunghezza + 7) // 8 * 8
+        self.array = {nome: np.frombuffer(self.mm, dtype=d['dtype'], count=d['n'], offset=inizio_dati + d['offset'])
+                      for nome, d in descrittori.items()}
+
+    def _testo(self, prefisso, i):
+        offset = self.array[f'{prefisso}_offset']
+        return bytes(self.array[f'{prefisso}_testo'][offset[i]:offset[i + 1]]).decode('utf-8')
+
+    def _nazione(self, codice):
+        return 'Unknown' if codice < 0 else self._testo('nazioni', codice)
+
+    def per_id(self, ids):
+        """Restituisce {spotify_id: (nome su Wikidata, nazione)} per gli ID presenti nell'indice."""
+        chiavi = self.array['id']
+        cercati = np.array([i.encode('ascii', 'ignore') for i in ids], dtype='S22')
+        pos = np.minimum(np.searchsorted(chiavi, cercati), max(len(chiavi) - 1, 0))
+        trovati = (pos < len(chiavi)) & (chiavi[pos] == cercati) if len(chiavi) else np.zeros(len(ids), bool)
+        return {ids[i]: (self._testo('id_nome', pos[i]), self._nazione(self.array['id_nazione'][pos[i]]))
+                for i in np.flatnonzero(trovati)}
+
+    def per_nome(self, nomi):
+        """Restituisce {nome: nazione} per i nomi (etichetta inglese esatta) di musicisti nell'indice."""
+        chiavi = self.array['nome_hash']
+        cercati = np.array([hash_nome(str(n)) for n in nomi], dtype=np.uint64)
+        pos = np.minimum(np.searchsorted(chiavi, cercati), max(len(chiavi) - 1, 0))
+        trovati = (chiavi[pos] == cercati) if len(chiavi) else np.zeros(len(nomi), bool)
+        risultato = {}
+        for i in np.flatnonzero(trovati):
+            # Nomi diversi con lo stesso hash sono consecutivi: vale solo quello uguale al cercato
+            j = pos[i]
+            while j < len(chiavi) and chiavi[j] == cercati[i]:
+                if self._testo('nome', j) == str(nomi[i]):
+                    risultato[nomi[i]] = self._nazione(self.array['nome_nazione'][j])
+                    break
+                j += 1
+        return risultato
+
+    def chiudi(self):
+        self.array = {}
+        self.mm.close()
+        self.file.close()
+
+
+def nazionalita_da_indice(indice, artisti, scrivi):
+    """Come scripts.wikidata.nazionalita, ma senza rete: prima per Spotify ID, poi per nome."""
+    per_id = indice.per_id([s_id for s_id, _ in artisti])
+    per_nome = indice.per_nome([s_name for s_id, s_name in artisti if s_id not in per_id])
+    righe = []
+    for s_id, s_name in artisti:
+        if s_id in per_id:
+            name, country = per_id[s_id]
+        else:
+            name, country = s_name, per_nome.get(s_name, 'Unknown')
+        righe.append({'spotify_id': s_id, 'name': name, 'country': country})
+    scrivi(righe)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indice locale delle nazionalita da un dump di Wikidata")
+    comandi = parser.add_subparsers(dest='comando', required=True)
+    p_costruisci = comandi.add_parser('costruisci', help="legge il dump e scrive l'indice")
+    p_costruisci.add_argument('dump', help="dump JSON o N-Triples (anche .gz/.bz2)")
+    p_costruisci.add_argument('--output', default=PERCORSO_INDICE)
+    p_cerca = comandi.add_parser('cerca', help="cerca Spotify ID o nomi nell'indice")
+    p_cerca.add_argument('indice')
+    p_cerca.add_argument('chiavi', nargs='+')
+    args = parser.parse_args()
+
+    if args.comando == 'costruisci':
+        costruisci(args.dump, args.output)
+    else:
+        indice = IndiceNazionalita(args.indice)
+        per_id = indice.per_id(args.chiavi)
+        per_nome = indice.per_nome([c for c in args.chiavi if c not in per_id])
+        for chiave in args.chiavi:
+            print(f"{chiave}: {per_id.get(chiave) or per_nome.get(chiave) or 'non trovato'}")
+        indice.chiudi()
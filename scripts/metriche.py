@@ -0,0 +1,558 @@
+# Calcolo delle metriche di rete che prima venivano prodotte a mano con Gephi
+#
+# Il grafo viene caricato da nodes.csv/edges.csv (o dall'archivio Parquet di
+# scripts/archivio.py) in una matrice di adiacenza sparsa CSR (non orientata,
+# pesata). Le metriche seguono le definizioni di Gephi: cammini minimi non
+# pesati per eccentricita, closeness, harmonic closeness e betweenness
+# (Brandes, con visite in ampiezza di piu sorgenti alla volta tramite prodotti
+# matrice sparsa per matrice densa), autovettore con le 100 iterazioni non
+# pesate di Gephi, PageRank pesato e comunita con Louvain sui pesi.
+#
+# Il progetto Gephi di data/old (data/old/grezzi/rete.gephi) non contiene le
+# componenti di 2 e 3 artisti, tolte a mano: con --componente-minima 4 il
+# grafo e lo stesso e i valori coincidono con data/old/metriche.
+#
+# Con --delta (file con le collaborazioni aggiunte da main.py --incrementale)
+# le metriche vengono aggiornate a partire dallo stato del calcolo precedente
+# con scripts/metriche_incrementali.py, senza ricalcolare tutto.
+#
+# Per grafi troppo grandi per le visite da tutti i nodi, --approssimato stima
+# betweenness e closeness visitando un campione casuale di sorgenti (pivot)
+# su un pool di processi, fermandosi quando il limite d'errore e raggiunto.
+#
+# Uso:
+#     python -m scripts.metriche --nodi data/new/grezzi/nodes.csv --archi data/new/grezzi/edges.csv
+
+import argparse
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.stats import norm
+
+from scripts.archivio import carica_tabella, salva_tabella, carica_archi_indicizzati, indici_nodi
+
+DIMENSIONE_BATCH = 64
+ITERAZIONI_AUTOVETTORE = 100
+SMORZAMENTO_PAGERANK = 0.85
+TOLLERANZA_PAGERANK = 1e-10
+ITERAZIONI_PAGERANK = 1000
+
+# Modalita approssimata: errore massimo ammesso e probabilita che il limite venga superato
+ERRORE_BETWEENNESS = 0.01
+ERRORE_CLOSENESS = 0.05
+CONFIDENZA = 0.1
+
+
+class Grafo:
+    """Grafo non orientato con ID Spotify mappati su indici interi 0..n-1."""
+
+    def __init__(self, ids, source, target, weight):
+        pos = pd.Index(ids)
+        self._costruisci(ids, pos.get_indexer(source), pos.get_indexer(target), weight)
+
+    @classmethod
+    def da_indici(cls, ids, u, v, weight):
+        """Grafo da archi gia espressi come indici in ids (edges.parquet di scripts/archivio.py)."""
+        g = cls.__new__(cls)
+        g._costruisci(ids, np.asarray(u), np.asarray(v), weight)
+        return g
+
+    def _costruisci(self, ids, u, v, weight):
+        self.ids = np.asarray(ids)
+        self.n = len(self.ids)
+        validi = (u >= 0) & (v >= 0) & (u != v)
+        u, v, w = u[validi], v[validi], np.asarray(weight, dtype=np.float64)[validi]
+
+        # Matrice simmetrica: ogni arco compare in entrambe le direzioni
+        righe = np.concatenate([u, v])
+        colonne = np.concatenate([v, u])
+        self.pesi = sparse.csr_matrix((np.concatenate([w, w]), (righe, colonne)), shape=(self.n, self.n))
+        self.pesi.sum_duplicates()
+        self.adiacenza = self.pesi.copy()
+        self.adiacenza.data[:] = 1.0
+
+    @property
+    def n_archi(self):
+        return self.pesi.nnz // 2
+
+
+def carica_grafo(percorso_nodi, percorso_archi):
+    """Carica nodes.csv ed edges.csv; i nodi presenti solo negli archi vengono aggiunti in coda.
+
+    Se accanto ai CSV c'e l'archivio Parquet aggiornato, gli archi vengono letti
+    direttamente come indici interi.
+    """
+    df_nodes = carica_tabella(percorso_nodi)
+    indicizzati = carica_archi_indicizzati(os.path.dirname(percorso_archi))
+    if indicizzati is not None:
+        return Grafo.da_indici(*indicizzati), df_nodes
+    df_edges = carica_tabella(percorso_archi)
+    ids = indici_nodi(df_nodes, df_edges)
+    return Grafo(ids, df_edges['source'], df_edges['target'], df_edges['weight']), df_nodes
+
+
+def filtra_componenti(g, minima):
+    """Sottografo senza le componenti connesse con meno di minima nodi."""
+    dimensioni = np.bincount(componenti(g))
+    tenuti = np.flatnonzero(dimensioni[componenti(g)] >= minima)
+    if len(tenuti) == g.n:
+        return g
+    archi = sparse.triu(g.pesi[tenuti][:, tenuti], format='coo')
+    return Grafo.da_indici(g.ids[tenuti], archi.row, archi.col, archi.data)
+
+
+def grado_pesato(g):
+    return np.asarray(g.pesi.sum(axis=1)).ravel()
+
+
+def _visita(A, batch, betweenness=True):
+    """Visita in ampiezza dalle sorgenti di batch, una per colonna (Brandes algebrico).
+
+    Restituisce le statistiche di ogni sorgente (eccentricita, closeness, harmonic) e,
+    per ogni nodo, le somme sulle sorgenti di distanze, inverse e dipendenze di Brandes,
+    che servono alla stima per campionamento di scripts/metriche.py.
+    """
+    n = A.shape[0]
+    k = len(batch)
+    colonne = np.arange(k)
+
+    dist = np.full((n, k), -1, dtype=np.int32)
+    sigma = np.zeros((n, k))
+    dist[batch, colonne] = 0
+    sigma[batch, colonne] = 1.0
+    frontiera = sigma.copy()
+
+    # Fase in avanti: numero di cammini minimi (sigma) e distanza per ogni coppia sorgente/nodo
+    livello = 0
+    while True:
+        successivi = A @ frontiera
+        successivi[dist >= 0] = 0.0
+        nuovi = successivi > 0
+        if not nuovi.any():
+            break
+        livello += 1
+        dist[nuovi] = livello
+        sigma += successivi
+        frontiera = successivi
+
+    raggiunti = dist > 0
+    distanze = np.where(raggiunti, dist, 0)
+    inverse = np.where(raggiunti, 1.0 / np.maximum(dist, 1), 0.0)
+    n_raggiunti = raggiunti.sum(axis=0)
+    somma = distanze.sum(axis=0)
+    risultato = {
+        'eccentricity': dist.max(axis=0),
+        'closeness': np.divide(n_raggiunti, somma, out=np.zeros(k), where=somma > 0),
+        'harmonic closeness': np.divide(inverse.sum(axis=0), n_raggiunti, out=np.zeros(k), where=n_raggiunti > 0),
+        'raggiunti_nodo': raggiunti.sum(axis=1),
+        'distanze_nodo': distanze.sum(axis=1),
+        'distanze2_nodo': (distanze.astype(np.float64) ** 2).sum(axis=1),
+        'inverse_nodo': inverse.sum(axis=1),
+        'inverse2_nodo': (inverse ** 2).sum(axis=1),
+        'massimo_nodo': distanze.max(axis=1),
+    }
+    if not betweenness:
+        return risultato
+
+    # Fase all'indietro: accumulo delle dipendenze livello per livello
+    delta = np.zeros((n, k))
+    for d in range(livello, 0, -1):
+        nel_livello = dist == d
+        w = np.zeros((n, k))
+        w[nel_livello] = (1.0 + delta[nel_livello]) / sigma[nel_livello]
+        propagato = A @ w
+        precedenti = dist == d - 1
+        delta[precedenti] += sigma[precedenti] * propagato[precedenti]
+    delta[batch, colonne] = 0.0
+    risultato['dipendenze'] = delta.sum(axis=1)
+    risultato['dipendenze2'] = (delta ** 2).sum(axis=1)
+    return risultato
+
+
+def cammini_minimi(g, sorgenti=None, dimensione_batch=DIMENSIONE_BATCH, betweenness=True):
+    """Metriche esatte sui cammini minimi, visitando il grafo da dimensione_batch sorgenti alla volta.
+
+    Restituisce un dizionario con eccentricity, closeness e harmonic closeness delle
+    sorgenti e, se richiesto, i contributi di betweenness (non normalizzati, gia divisi
+    per 2 come in un grafo non orientato) accumulati su tutti i nodi.
+    """
+    sorgenti = np.arange(g.n) if sorgenti is None else np.asarray(sorgenti)
+    risultato = {
+        'eccentricity': np.zeros(len(sorgenti)),
+        'closeness': np.zeros(len(sorgenti)),
+        'harmonic closeness': np.zeros(len(sorgenti)),
+        'betweenness': np.zeros(g.n)
+    }
+    for inizio in range(0, len(sorgenti), dimensione_batch):
+        batch = sorgenti[inizio:inizio + dimensione_batch]
+        visita = _visita(g.adiacenza, batch, betweenness)
+        for chiave in ('eccentricity', 'closeness', 'harmonic closeness'):
+            risultato[chiave][inizio:inizio + len(batch)] = visita[chiave]
+        if betweenness:
+            risultato['betweenness'] += visita['dipendenze']
+    risultato['betweenness'] /= 2.0
+    return risultato
+
+
+_A = None
+
+
+def _inizializza(indptr, indices, n):
+    """Ricostruisce nel worker la matrice di adiacenza a partire dagli array CSR."""
+    global _A
+    _A = sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(n, n))
+
+
+def _visita_pivot(batch):
+    return _visita(_A, batch)
+
+
+def _semiampiezza(somma, somma2, k, popolazione, z):
+    """Semiampiezza dell'intervallo normale per la media di k valori estratti senza ripetizione.
+
+    Usa la varianza campionaria di ogni nodo e la correzione per popolazione
+    finita: i pivot sono distinti, quindi con k uguale alla popolazione l'errore e nullo.
+    """
+    k = np.maximum(k, 2)
+    media = somma / k
+    varianza = np.maximum(somma2 / k - media ** 2, 0.0) * k / (k - 1)
+    correzione = np.clip((popolazione - k) / max(popolazione - 1, 1), 0.0, 1.0)
+    return z * np.sqrt(varianza / k * correzione)
+
+
+def cammini_approssimati(g, errore_betweenness=ERRORE_BETWEENNESS, errore_closeness=ERRORE_CLOSENESS,
+                         confidenza=CONFIDENZA, processi=None, max_pivot=None, seed=0,
+                         dimensione_batch=DIMENSIONE_BATCH):
+    """Stima di betweenness, closeness e harmonic closeness con pivot casuali (Brandes-Pich).
+
+    Le componenti diverse dalla gigante sono visitate per intero (valori esatti); nella
+    componente gigante le sorgenti sono estratte a blocchi e la stima si ferma quando
+    l'errore sulla betweenness normalizzata e sotto errore_betweenness e quello relativo
+    sulla closeness sotto errore_closeness per tutti i nodi. I limiti sono intervalli
+    normali per nodo, con la varianza campionaria del nodo e confidenza divisa tra i
+    nodi (Bonferroni).
+    Eccentricita dei nodi non campionati: limite inferiore (distanza massima dai pivot).
+    """
+    _, componenti = connected_components(g.adiacenza, directed=False)
+    gigante = componenti == np.bincount(componenti).argmax()
+    n_g = int(gigante.sum())
+
+    pivot = np.random.default_rng(seed).permutation(np.flatnonzero(gigante))
+    if max_pivot is not None:
+        pivot = pivot[:max_pivot]
+    esatti = np.flatnonzero(~gigante)
+    lavori = [esatti[i:i + dimensione_batch] for i in range(0, len(esatti), dimensione_batch)]
+    n_esatti = len(lavori)
+    lavori += [pivot[i:i + dimensione_batch] for i in range(0, len(pivot), dimensione_batch)]
+
+    somme = {}
+    k = 0
+    z = norm.isf(confidenza / (4 * n_g))
+
+    def fine(errori):
+        return errori[0].max() <= errore_betweenness and errori[1].max() <= errore_closeness
+
+    processi = processi or os.cpu_count()
+    if processi == 1:
+        risultati = (_visita(g.adiacenza, lavoro) for lavoro in lavori)
+        pool = None
+    else:
+        A = g.adiacenza
+        ctx = multiprocessing.get_context('spawn')
+        pool = ctx.Pool(processi, initializer=_inizializza, initargs=(A.indptr, A.indices, g.n))
+        # imap restituisce i blocchi in ordine: a parita di seed la stima non dipende dai processi
+        risultati = pool.imap(_visita_pivot, lavori)
+
+    try:
+        for i, visita in enumerate(risultati):
+            for chiave, valore in visita.items():
+                if chiave == 'massimo_nodo':
+                    somme[chiave] = np.maximum(somme.get(chiave, 0), valore)
+                elif chiave.endswith('_nodo') or chiave.startswith('dipendenze'):
+                    somme[chiave] = somme.get(chiave, 0) + valore
+            if i < n_esatti:
+                continue
+            k += len(lavori[i])
+            if k < n_g and fine(_errori(somme, k, n_g, g.n, gigante, z)):
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    errore_b, errore_c = _errori(somme, k, n_g, g.n, gigante, z) if k < n_g else (np.zeros(g.n), np.zeros(g.n))
+
+    raggiunti = somme['raggiunti_nodo']
+    betweenness = somme['dipendenze'].copy()
+    if k:
+        betweenness[gigante] *= n_g / k
+    return {
+        'eccentricity': somme['massimo_nodo'].astype(float),
+        'closeness': np.divide(raggiunti, somme['distanze_nodo'], out=np.zeros(g.n),
+                               where=somme['distanze_nodo'] > 0),
+        'harmonic closeness': np.divide(somme['inverse_nodo'], raggiunti, out=np.zeros(g.n), where=raggiunti > 0),
+        'betweenness': betweenness / 2.0,
+        'errore betweenness': errore_b,
+        'errore closeness': errore_c,
+        'pivot': k
+    }
+
+
+def _errori(somme, k, n_g, n, gigante, z):
+    """Limiti d'errore per nodo: assoluto sulla betweenness normalizzata, relativo sulla closeness."""
+    errore_b = np.zeros(n)
+    errore_c = np.zeros(n)
+
+    # Betweenness normalizzata stimata: n_g * media delle dipendenze / ((n - 1)(n - 2))
+    h = _semiampiezza(somme['dipendenze'][gigante], somme['dipendenze2'][gigante], k, n_g, z)
+    errore_b[gigante] = h * n_g / max((n - 1) * (n - 2), 1)
+
+    # Distanze dai pivot raggiunti (tutti tranne il nodo stesso, se e un pivot)
+    conteggi = somme['raggiunti_nodo'][gigante]
+    h = _semiampiezza(somme['distanze_nodo'][gigante], somme['distanze2_nodo'][gigante], conteggi, n_g - 1, z)
+    media = somme['distanze_nodo'][gigante] / np.maximum(conteggi, 1)
+    errore_c[gigante] = np.divide(h, media, out=np.full(len(h), np.inf), where=media > 0)
+    return errore_b, errore_c
+
+
+def normalizza_betweenness(valori, n):
+    """Normalizzazione di Gephi per grafi non orientati: (n-1)(n-2)/2 coppie.
+
+    n e il numero di nodi del grafo analizzato: per confrontarsi con un progetto
+    Gephi da cui sono state tolte delle componenti va usato filtra_componenti.
+    """
+    coppie = (n - 1) * (n - 2) / 2.0
+    return valori / coppie if coppie > 0 else valori
+
+
+def autovettore(g, iterazioni=ITERAZIONI_AUTOVETTORE):
+    """Centralita dell'autovettore calcolata come EigenvectorCentrality di Gephi.
+
+    Gephi non azzera i valori temporanei tra un'iterazione e l'altra: ogni
+    passo somma A x ai precedenti e divide per il massimo, senza pesi e senza
+    criterio di arresto. Il risultato dopo 100 iterazioni non e l'autovettore
+    convergente (i valori piccoli restano piu alti), ma e quello di
+    data/old/metriche: con i pesi o fino a convergenza lo scarto sarebbe fino a 0.17.
+    """
+    x = np.ones(g.n)
+    somma = np.zeros(g.n)
+    for _ in range(iterazioni):
+        somma += g.adiacenza @ x
+        massimo = somma.max()
+        if massimo == 0:
+            return somma
+        x = somma / massimo
+    return x
+
+
+def pagerank(g, smorzamento=SMORZAMENTO_PAGERANK, iniziale=None, tolleranza=TOLLERANZA_PAGERANK,
+             iterazioni=ITERAZIONI_PAGERANK):
+    """PageRank pesato; restituisce (valori, iterazioni). I nodi isolati ridistribuiscono il loro peso su tutti."""
+    k = grado_pesato(g)
+    isolati = k == 0
+    inverso = np.divide(1.0, k, out=np.zeros(g.n), where=~isolati)
+    x = np.full(g.n, 1.0 / g.n) if iniziale is None else np.asarray(iniziale, dtype=np.float64) / np.sum(iniziale)
+    for i in range(1, iterazioni + 1):
+        y = smorzamento * (g.pesi @ (x * inverso))
+        y += (1.0 - smorzamento * (1.0 - x[isolati].sum())) / g.n
+        if np.abs(y - x).sum() <= tolleranza:
+            return y, i
+        x = y
+    return x, iterazioni
+
+
+def componenti(g):
+    """Componente connessa di ogni nodo, numerata per dimensione decrescente."""
+    _, etichette = connected_components(g.adiacenza, directed=False)
+    return _per_dimensione(etichette)
+
+
+def _per_dimensione(etichette):
+    """Rinumera le classi per dimensione decrescente, per avere un output stabile."""
+    dimensioni = np.bincount(etichette)
+    ordine = np.argsort(-dimensioni, kind='stable')
+    rinumera = np.empty_like(ordine)
+    rinumera[ordine] = np.arange(len(ordine))
+    return rinumera[etichette]
+
+
+def modularita(g, etichette, risoluzione=1.0):
+    """Modularita pesata di una partizione dei nodi."""
+    A = g.pesi
+    m2 = A.sum()
+    k = np.asarray(A.sum(axis=1)).ravel()
+    P = sparse.csr_matrix((np.ones(g.n), (np.arange(g.n), etichette)))
+    interni = (P.T @ A @ P).diagonal()
+    totali = P.T @ k
+    return float((interni / m2 - risoluzione * (totali / m2) ** 2).sum())
+
+
+def _spostamenti_locali(A, risoluzione, rng):
+    """Prima fase di Louvain: sposta ogni nodo nella comunita vicina che massimizza il guadagno."""
+    n = A.shape[0]
+    k = np.asarray(A.sum(axis=1)).ravel()
+    m2 = A.sum()
+    etichette = np.arange(n)
+    totali = k.copy()
+    indptr, indices, data = A.indptr, A.indices, A.data
+
+    migliorato = True
+    spostato = False
+    while migliorato:
+        migliorato = False
+        for i in rng.permutation(n):
+            vicini = indices[indptr[i]:indptr[i + 1]]
+            pesi = data[indptr[i]:indptr[i + 1]]
+            non_cappio = vicini != i
+            vicini, pesi = vicini[non_cappio], pesi[non_cappio]
+
+            attuale = etichette[i]
+            totali[attuale] -= k[i]
+            comunita, inverso = np.unique(etichette[vicini], return_inverse=True)
+            verso = np.bincount(inverso, weights=pesi)
+
+            guadagni = verso - risoluzione * totali[comunita] * k[i] / m2
+            verso_attuale = verso[comunita == attuale].sum()
+            guadagno_attuale = verso_attuale - risoluzione * totali[attuale] * k[i] / m2
+
+            migliore = attuale
+            if len(comunita) and guadagni.max() > guadagno_attuale + 1e-12:
+                migliore = comunita[np.argmax(guadagni)]
+            totali[migliore] += k[i]
+            if migliore != attuale:
+                etichette[i] = migliore
+                migliorato = True
+                spostato = True
+
+    _, etichette = np.unique(etichette, return_inverse=True)
+    return etichette, spostato
+
+
+def louvain(g, risoluzione=1.0, seed=0, iniziale=None):
+    """Comunita con il metodo di Louvain; le aggregazioni sono prodotti sparsi P^T A P.
+
+    Con iniziale i nodi con la stessa etichetta partono gia aggregati in un solo
+    nodo: solo i nodi lasciati singoli vengono spostati uno per uno.
+    """
+    rng = np.random.default_rng(seed)
+    A = g.pesi.tocsr()
+    etichette = np.arange(g.n)
+    if iniziale is not None:
+        _, etichette = np.unique(iniziale, return_inverse=True)
+        P = sparse.csr_matrix((np.ones(g.n), (np.arange(g.n), etichette)))
+        A = (P.T @ A @ P).tocsr()
+    while True:
+        livello, spostato = _spostamenti_locali(A, risoluzione, rng)
+        if not spostato:
+            break
+        etichette = livello[etichette]
+        P = sparse.csr_matrix((np.ones(A.shape[0]), (np.arange(A.shape[0]), livello)))
+        A = (P.T @ A @ P).tocsr()
+    return _per_dimensione(etichette)
+
+
+def calcola_metriche(g, seed=0, approssimato=False, **opzioni):
+    """Calcola tutte le metriche e restituisce un DataFrame con le colonne dei file di Gephi.
+
+    Con approssimato=True i cammini minimi sono stimati con cammini_approssimati (opzioni
+    passate a quella funzione) e vengono aggiunte le colonne con i limiti d'errore.
+    """
+    cammini = cammini_approssimati(g, seed=seed, **opzioni) if approssimato else cammini_minimi(g)
+
+    df = pd.DataFrame({
+        'id': g.ids,
+        'weighted degree': grado_pesato(g),
+        'eccentricity': cammini['eccentricity'].astype(float),
+        'closeness': cammini['closeness'],
+        'harmonic closeness': cammini['harmonic closeness'],
+        'betweeness': normalizza_betweenness(cammini['betweenness'], g.n),
+        'eigenvector': autovettore(g),
+        'pageranks': pagerank(g)[0],
+        'componentnumber': componenti(g),
+        'modularity_class': louvain(g, seed=seed)
+    })
+    if approssimato:
+        df['errore betweeness'] = cammini['errore betweenness']
+        df['errore closeness'] = cammini['errore closeness']
+        print(f"Stima con {cammini['pivot']} pivot: errore massimo betweenness "
+              f"{df['errore betweeness'].max():.4f}, closeness {df['errore closeness'].max():.1%}")
+    return df
+
+
+def salva_metriche(df_metriche, df_nodes, cartella, top=10):
+    """Salva metriche.csv completo e le classifiche come in data/old/metriche.
+
+    La classifica della closeness considera solo la componente gigante: nelle
+    componenti piccole la closeness arriva a 1 (in una coppia isolata ogni nodo
+    dista 1 dall'altro) e riempirebbe la classifica.
+    """
+    os.makedirs(cartella, exist_ok=True)
+    df = df_nodes[['id', 'name', 'popularity']].merge(df_metriche, on='id', how='right')
+    salva_tabella(df, os.path.join(cartella, 'metriche.csv'))
+
+    colonne = ['id', 'name', 'popularity', 'weighted degree', 'eccentricity', 'closeness',
+               'harmonic closeness', 'betweeness', 'eigenvector']
+    gigante = df[df['componentnumber'] == 0]
+    for nome, colonna, righe in [('degree', 'weighted degree', df), ('betweeness', 'betweeness', df),
+                                 ('closeness', 'closeness', gigante), ('eigenvector', 'eigenvector', df)]:
+        righe.nlargest(top, colonna)[colonne].to_csv(os.path.join(cartella, f'{nome}.csv'), index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metriche di rete senza Gephi")
+    parser.add_argument('--nodi', default='data/new/grezzi/nodes.csv')
+    parser.add_argument('--archi', default='data/new/grezzi/edges.csv')
+    parser.add_argument('--output', default='data/new/metriche')
+    parser.add_argument('--seed', type=int, default=0, help="seed per Louvain e per la scelta dei pivot")
+    parser.add_argument('--componente-minima', type=int, default=1,
+                        help="esclude le componenti con meno nodi (4 per lo stesso grafo di data/old/grezzi/rete.gephi)")
+    parser.add_argument('--approssimato', action='store_true',
+                        help="stima betweenness e closeness con un campione di sorgenti")
+    parser.add_argument('--errore-betweenness', type=float, default=ERRORE_BETWEENNESS)
+    parser.add_argument('--errore-closeness', type=float, default=ERRORE_CLOSENESS)
+    parser.add_argument('--processi', type=int, default=None, help="processi per la stima (default: tutti i core)")
+    parser.add_argument('--delta', default=None,
+                        help="archi aggiunti dall'ultimo calcolo (delta-edges.csv): aggiorna solo quanto cambia")
+    args = parser.parse_args()
+
+    from scripts.metriche_incrementali import (StatoNonValido, aggiorna_metriche, carica_stato, salva_stato,
+                                               unisci_precedenti)
+
+    g, df_nodes = carica_grafo(args.nodi, args.archi)
+    g = filtra_componenti(g, args.componente_minima)
+    print(f"Grafo: {g.n} nodi, {g.n_archi} archi")
+
+    df_metriche = None
+    if args.delta:
+        stato = carica_stato(args.output)
+        if stato is None:
+            print(f"Nessuno stato in {args.output}: calcolo completo")
+        else:
+            try:
+                df_metriche, insiemi, riepilogo = aggiorna_metriche(g, stato, carica_tabella(args.delta),
+                                                                    seed=args.seed)
+            except StatoNonValido as e:
+                print(f"Stato non aggiornabile ({e}): calcolo completo")
+            else:
+                df_metriche = unisci_precedenti(df_metriche, args.output)
+                print(f"Aggiornamento incrementale: {riepilogo['archi_delta']} archi, "
+                      f"{riepilogo['nuovi_nodi']} nuovi nodi, {riepilogo['comunita_toccate']} comunita "
+                      f"ricalcolate ({riepilogo['nodi_ricalcolati']} nodi), PageRank in "
+                      f"{riepilogo['iterazioni_pagerank']} iterazioni")
+                print("Eccentricita, closeness e betweenness restano quelle dell'ultimo calcolo completo")
+                salva_stato(args.output, g, df_metriche, insiemi)
+
+    if df_metriche is None:
+        opzioni = {}
+        if args.approssimato:
+            opzioni = {'errore_betweenness': args.errore_betweenness, 'errore_closeness': args.errore_closeness,
+                       'processi': args.processi}
+        df_metriche = calcola_metriche(g, seed=args.seed, approssimato=args.approssimato, **opzioni)
+        salva_stato(args.output, g, df_metriche)
+    salva_metriche(df_metriche, df_nodes, args.output)
+    print(f"Modularita: {modularita(g, df_metriche['modularity_class'].to_numpy()):.4f}, "
+          f"comunita: {df_metriche['modularity_class'].nunique()}")
+    print(f"Metriche salvate in {args.output}")
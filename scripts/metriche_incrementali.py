@@ -0,0 +1,172 @@
+# Aggiornamento incrementale delle metriche di rete quando un aggiornamento aggiunge archi
+#
+# Il calcolo completo di scripts/metriche.py salva in data/new/metriche/stato.npz
+# gli ID dei nodi, il peso totale degli archi, PageRank, comunita e le
+# componenti connesse come foresta union-find. Un file delta con le
+# collaborazioni aggiunte (source,target,weight, scritto da main.py
+# --incrementale in data/new/grezzi/delta-edges.csv) viene applicato cosi:
+#   - grado pesato: somme di riga della matrice, vettoriali
+#   - componenti: union-find con i soli archi del delta
+#   - PageRank: metodo delle potenze ripartendo dalla soluzione precedente,
+#     fino a convergenza (poche iterazioni se il delta e piccolo)
+#   - autovettore: ricalcolato come Gephi (100 prodotti sparsi), perche il suo
+#     valore dipende dalle iterazioni fatte e non si puo riprendere
+#   - comunita: ogni comunita resta aggregata in un solo nodo, tranne gli
+#     estremi degli archi del delta e i nuovi artisti, che Louvain sposta uno
+#     per uno (anche le comunita aggregate possono unirsi tra loro)
+# Le metriche sui cammini minimi (eccentricita, closeness, betweenness) restano
+# quelle dell'ultimo calcolo completo e sono vuote per i nuovi artisti.
+#
+# Uso:
+#     python -m scripts.metriche --delta data/new/grezzi/delta-edges.csv
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts.archivio import carica_tabella
+from scripts.metriche import autovettore, pagerank, louvain, grado_pesato, _per_dimensione
+
+FILE_STATO = 'stato.npz'
+
+
+class StatoNonValido(Exception):
+    """Lo stato salvato non corrisponde al grafo meno il delta: serve un calcolo completo."""
+
+
+class UnioneInsiemi:
+    """Union-find su indici interi, con compressione dei cammini a dimezzamento."""
+
+    def __init__(self, genitori):
+        self.genitori = np.asarray(genitori, dtype=np.int64).copy()
+
+    @classmethod
+    def da_etichette(cls, etichette):
+        """Foresta in cui ogni nodo punta al primo nodo della propria classe."""
+        _, primi, inverso = np.unique(etichette, return_index=True, return_inverse=True)
+        return cls(primi[inverso])
+
+    def trova(self, i):
+        genitori = self.genitori
+        while genitori[i] != i:
+            genitori[i] = genitori[genitori[i]]
+            i = genitori[i]
+        return i
+
+    def unisci(self, a, b):
+        """Unisce gli insiemi di a e b; restituisce False se erano gia uniti."""
+        ra, rb = self.trova(a), self.trova(b)
+        if ra == rb:
+            return False
+        self.genitori[max(ra, rb)] = min(ra, rb)
+        return True
+
+    def radici(self):
+        """Radice di ogni nodo, con salti di puntatore vettoriali al posto di trova() per ogni nodo."""
+        radici = self.genitori
+        while True:
+            successive = radici[radici]
+            if np.array_equal(successive, radici):
+                return radici
+            radici = successive
+
+    def etichette(self):
+        return _per_dimensione(np.unique(self.radici(), return_inverse=True)[1])
+
+
+def salva_stato(cartella, g, df_metriche, insiemi=None):
+    """Salva quanto serve per aggiornare le metriche al prossimo delta."""
+    if insiemi is None:
+        insiemi = UnioneInsiemi.da_etichette(df_metriche['componentnumber'].to_numpy())
+    os.makedirs(cartella, exist_ok=True)
+    np.savez(os.path.join(cartella, FILE_STATO),
+             ids=g.ids.astype(str),
+             peso_totale=g.pesi.sum() / 2,
+             pageranks=df_metriche['pageranks'].to_numpy(np.float64),
+             modularity_class=df_metriche['modularity_class'].to_numpy(np.int64),
+             radici=insiemi.radici())
+
+
+def carica_stato(cartella):
+    percorso = os.path.join(cartella, FILE_STATO)
+    if not os.path.exists(percorso):
+        return None
+    with np.load(percorso) as dati:
+        return {chiave: dati[chiave] for chiave in dati.files}
+
+
+def _riallinea(stato, ids):
+    """Posizione nel grafo nuovo di ogni nodo dello stato, con controllo che non ne manchi nessuno."""
+    posizioni = pd.Index(ids).get_indexer(stato['ids'])
+    if (posizioni < 0).any():
+        raise StatoNonValido(f"{int((posizioni < 0).sum())} nodi dello stato non sono piu nel grafo")
+    return posizioni
+
+
+def aggiorna_metriche(g, stato, df_delta, seed=0):
+    """Metriche del grafo g (che contiene gia il delta) a partire dallo stato del calcolo precedente.
+
+    Restituisce (DataFrame con id, weighted degree, eigenvector, pageranks,
+    componentnumber e modularity_class, UnioneInsiemi aggiornato, riepilogo).
+    """
+    peso_atteso = float(stato['peso_totale']) + float(df_delta['weight'].sum())
+    peso_grafo = g.pesi.sum() / 2
+    if not np.isclose(peso_atteso, peso_grafo):
+        raise StatoNonValido(f"peso totale {peso_grafo:g} invece di {peso_atteso:g} (stato piu delta)")
+
+    posizioni = _riallinea(stato, g.ids)
+    nuovi = np.ones(g.n, dtype=bool)
+    nuovi[posizioni] = False
+
+    # Componenti: la foresta precedente, riportata sugli indici nuovi, piu gli archi del delta
+    genitori = np.arange(g.n)
+    genitori[posizioni] = posizioni[stato['radici']]
+    insiemi = UnioneInsiemi(genitori)
+    pos = pd.Index(g.ids)
+    u = pos.get_indexer(df_delta['source'])
+    v = pos.get_indexer(df_delta['target'])
+    validi = (u >= 0) & (v >= 0) & (u != v)
+    u, v = u[validi], v[validi]
+    unioni = sum(insiemi.unisci(a, b) for a, b in zip(u.tolist(), v.tolist()))
+
+    # PageRank dalla soluzione precedente, i nuovi nodi partono da 1/n
+    eigenvector = autovettore(g)
+    iniziale = np.full(g.n, 1.0 / g.n)
+    iniziale[posizioni] = stato['pageranks']
+    pageranks, iterazioni_pagerank = pagerank(g, iniziale=iniziale)
+
+    # Louvain: estremi del delta e nuovi nodi tornano singoli, il resto resta aggregato per comunita.
+    # Liberare anche i vicini degli estremi coinvolgerebbe, attraverso gli hub, buona parte del grafo
+    precedenti = np.full(g.n, -1, dtype=np.int64)
+    precedenti[posizioni] = stato['modularity_class']
+    liberi = nuovi.copy()
+    liberi[u] = liberi[v] = True
+    toccate = np.unique(precedenti[liberi & (precedenti >= 0)])
+    iniziale = precedenti.copy()
+    iniziale[liberi] = precedenti.max() + 1 + np.arange(int(liberi.sum()))
+    modularity_class = louvain(g, seed=seed, iniziale=iniziale)
+
+    df = pd.DataFrame({
+        'id': g.ids,
+        'weighted degree': grado_pesato(g),
+        'eigenvector': eigenvector,
+        'pageranks': pageranks,
+        'componentnumber': insiemi.etichette(),
+        'modularity_class': modularity_class
+    })
+    riepilogo = {'archi_delta': int(validi.sum()), 'nuovi_nodi': int(nuovi.sum()), 'unioni': unioni,
+                 'comunita_toccate': len(toccate), 'nodi_ricalcolati': int(liberi.sum()),
+                 'iterazioni_pagerank': iterazioni_pagerank}
+    return df, insiemi, riepilogo
+
+
+def unisci_precedenti(df_aggiornate, cartella):
+    """Aggiunge le colonne dei cammini minimi dell'ultimo calcolo completo (metriche.csv)."""
+    df_precedenti = carica_tabella(os.path.join(cartella, 'metriche.csv'))
+    conservate = [c for c in df_precedenti.columns
+                  if c not in df_aggiornate.columns and c not in ('name', 'popularity')]
+    df = df_aggiornate.merge(df_precedenti[['id'] + conservate], on='id', how='left')
+    colonne = [c for c in df_precedenti.columns if c in df.columns] + \
+              [c for c in df.columns if c not in df_precedenti.columns]
+    return df[colonne]
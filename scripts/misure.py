@@ -0,0 +1,327 @@
+# Misure delle richieste e delle fasi del crawl, esportabili come JSON o testo Prometheus
+#
+# Il client Spotify (scripts/utils.py), il client SPARQL (scripts/wikidata.py),
+# la cache e il limitatore registrano qui ogni richiesta: durata (istogramma
+# per servizio ed endpoint), esito, byte ricevuti, tentativi ripetuti (429 e
+# 5xx), hit e miss della cache e secondi di attesa imposti dal limitatore.
+# Le fasi di main.py e nazionalita.py misurano tempo e CPU e, se richiesto,
+# vengono profilate con cProfile o pyinstrument (se installato).
+#
+# Dal confronto tra tempo in rete, attesa del limitatore e CPU del processo
+# riepilogo() indica se il crawl e limitato dalla rete, dal rate limit o
+# dalla CPU.
+#
+# Uso:
+#     python main.py --metriche data/new/metriche-crawl.json --profilo cprofile
+#     python main.py --metriche data/new/metriche-crawl.prom      (formato Prometheus)
+
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Limiti superiori (secondi) degli intervalli dell'istogramma delle durate
+INTERVALLI = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CARTELLA_PROFILI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'new', 'profili')
+
+
+class Istogramma:
+    """Istogramma cumulativo a intervalli fissi, come quelli di Prometheus."""
+
+    def __init__(self):
+        self.conteggi = [0] * len(INTERVALLI)
+        self.totale = 0
+        self.somma = 0.0
+
+    def aggiungi(self, valore):
+        self.totale += 1
+        self.somma += valore
+        for i, limite in enumerate(INTERVALLI):
+            if valore <= limite:
+                self.conteggi[i] += 1
+                break
+
+    def unisci(self, dati):
+        self.totale += dati['totale']
+        self.somma += dati['somma']
+        self.conteggi = [a + b for a, b in zip(self.conteggi, dati['conteggi'])]
+
+    def quantile(self, q):
+        """Stima del quantile: limite superiore del primo intervallo che lo contiene (None oltre l'ultimo)."""
+        soglia = q * self.totale
+        cumulato = 0
+        for limite, n in zip(INTERVALLI, self.conteggi):
+            cumulato += n
+            if cumulato >= soglia and cumulato > 0:
+                return limite
+        return None
+
+    def a_dizionario(self):
+        return {'conteggi': list(self.conteggi), 'totale': self.totale, 'somma': round(self.somma, 6)}
+
+
+class Misure:
+    """Contatori del processo, condivisi tra thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.azzera()
+
+    def azzera(self):
+        with self.lock:
+            self.inizio = time.perf_counter()
+            self.cpu_inizio = time.process_time()
+            self.durate = defaultdict(Istogramma)     # (servizio, endpoint) -> durate delle richieste
+            self.esiti = defaultdict(int)             # (servizio, endpoint, esito) -> richieste
+            self.byte = defaultdict(int)              # (servizio, endpoint) -> byte ricevuti
+            self.tentativi = defaultdict(int)         # (servizio, motivo) -> richieste ripetute
+            self.cache = defaultdict(int)             # (endpoint, esito) -> letture della cache
+            self.attesa = defaultdict(float)          # servizio -> secondi di pausa del limitatore
+            self.fasi = {}                            # fase -> {'durata', 'cpu'}
+            self.esterni = {'cpu': 0.0}               # CPU dei processi worker (scripts/parallelo.py)
+
+    def richiesta(self, servizio, endpoint, durata, esito='ok', byte=0):
+        with self.lock:
+            self.durate[servizio, endpoint].aggiungi(durata)
+            self.esiti[servizio, endpoint, esito] += 1
+            if byte:
+                self.byte[servizio, endpoint] += byte
+
+    def richieste(self, servizio):
+        """Richieste in rete verso un servizio, con qualunque esito."""
+        with self.lock:
+            return sum(n for (s, _, _), n in self.esiti.items() if s == servizio)
+
+    def ricevuti(self, servizio, endpoint, byte):
+        with self.lock:
+            self.byte[servizio, endpoint] += byte
+
+    def ripetuta(self, servizio, motivo, volte=1):
+        with self.lock:
+            self.tentativi[servizio, motivo] += volte
+
+    def lettura_cache(self, endpoint, esito):
+        with self.lock:
+            self.cache[endpoint, esito] += 1
+
+    def attesa_limitatore(self, servizio, secondi):
+        with self.lock:
+            self.attesa[servizio] += secondi
+
+    @contextlib.contextmanager
+    def misura(self, servizio, endpoint):
+        """Misura una richiesta; l'esito e il codice HTTP dell'eccezione, se viene sollevata."""
+        inizio = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.richiesta(servizio, endpoint, time.perf_counter() - inizio, _esito(e))
+            raise
+        self.richiesta(servizio, endpoint, time.perf_counter() - inizio)
+
+    @contextlib.contextmanager
+    def fase(self, nome, profilo=None):
+        """Misura tempo e CPU di una fase e, con profilo='cprofile' o 'pyinstrument', la profila.
+
+        Il profilo viene salvato in data/new/profili/<fase>.prof (cProfile, da
+        aprire con python -m pstats o snakeviz) oppure <fase>.html (pyinstrument).
+        cProfile vede solo il thread principale; pyinstrument segue anche asyncio.
+        """
+        profilatore = _avvia_profilo(profilo)
+        inizio, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            durata, cpu = time.perf_counter() - inizio, time.process_time() - cpu
+            with self.lock:
+                precedente = self.fasi.get(nome, {'durata': 0.0, 'cpu': 0.0})
+                self.fasi[nome] = {'durata': precedente['durata'] + durata, 'cpu': precedente['cpu'] + cpu}
+            if profilatore is not None:
+                print(f"Profilo della fase {nome}: {_salva_profilo(profilatore, nome)}")
+
+    def estrai(self):
+        """Istantanea dei contatori delle richieste da unire in un altro processo, azzerandoli qui."""
+        with self.lock:
+            dati = {
+                'durate': [(k, v.a_dizionario()) for k, v in self.durate.items()],
+                'esiti': list(self.esiti.items()),
+                'byte': list(self.byte.items()),
+                'tentativi': list(self.tentativi.items()),
+                'cache': list(self.cache.items()),
+                'attesa': list(self.attesa.items()),
+                'cpu': time.process_time() - self.cpu_inizio,
+            }
+        self.azzera()
+        return dati
+
+    def unisci(self, dati):
+        """Somma ai contatori un'istantanea prodotta da estrai() in un processo worker."""
+        with self.lock:
+            for k, v in dati['durate']:
+                self.durate[tuple(k)].unisci(v)
+            for nome in ('esiti', 'byte', 'tentativi', 'cache', 'attesa'):
+                contatore = getattr(self, nome)
+                for k, v in dati[nome]:
+                    contatore[tuple(k) if isinstance(k, (list, tuple)) else k] += v
+            self.esterni['cpu'] += dati['cpu']
+
+    def a_dizionario(self):
+        """Tutte le misure come dizionario serializzabile in JSON."""
+        with self.lock:
+            servizi = sorted({s for s, _ in self.durate} | {s for s, _ in self.byte})
+            richieste = []
+            for (servizio, endpoint), istogramma in sorted(self.durate.items()):
+                richieste.append({
+                    'servizio': servizio,
+                    'endpoint': endpoint,
+                    'esiti': {e: n for (s, p, e), n in self.esiti.items() if (s, p) == (servizio, endpoint)},
+                    'byte': self.byte.get((servizio, endpoint), 0),
+                    'p50': istogramma.quantile(0.5),
+                    'p95': istogramma.quantile(0.95),
+                    'durata': istogramma.a_dizionario(),
+                })
+            return {
+                'intervalli': list(INTERVALLI),
+                'richieste': richieste,
+                'tentativi': [{'servizio': s, 'motivo': m, 'totale': n} for (s, m), n in sorted(self.tentativi.items())],
+                'cache': [{'endpoint': p, 'esito': e, 'totale': n} for (p, e), n in sorted(self.cache.items())],
+                'attesa_limitatore': {s: round(self.attesa.get(s, 0.0), 3) for s in sorted(set(servizi) | set(self.attesa))},
+                'fasi': {f: {k: round(v, 3) for k, v in d.items()} for f, d in self.fasi.items()},
+                'processo': {'durata': round(time.perf_counter() - self.inizio, 3),
+                             'cpu': round(time.process_time() - self.cpu_inizio, 3),
+                             'cpu_worker': round(self.esterni['cpu'], 3)},
+            }
+
+    def a_prometheus(self):
+        """Le stesse misure nel formato testuale di Prometheus (node_exporter textfile o pushgateway)."""
+        dati = self.a_dizionario()
+        righe = []
+
+        def metrica(nome, tipo, descrizione):
+            righe.append(f"# HELP {nome} {descrizione}")
+            righe.append(f"# TYPE {nome} {tipo}")
+
+        metrica('crawl_richieste_durata_secondi', 'histogram', 'Durata delle richieste HTTP')
+        for r in dati['richieste']:
+            etichette = f'servizio="{r["servizio"]}",endpoint="{r["endpoint"]}"'
+            cumulato = 0
+            for limite, n in zip(INTERVALLI, r['durata']['conteggi']):
+                cumulato += n
+                righe.append(f'crawl_richieste_durata_secondi_bucket{{{etichette},le="{limite}"}} {cumulato}')
+            righe.append(f'crawl_richieste_durata_secondi_bucket{{{etichette},le="+Inf"}} {r["durata"]["totale"]}')
+            righe.append(f'crawl_richieste_durata_secondi_sum{{{etichette}}} {r["durata"]["somma"]}')
+            righe.append(f'crawl_richieste_durata_secondi_count{{{etichette}}} {r["durata"]["totale"]}')
+        metrica('crawl_richieste_totali', 'counter', 'Richieste HTTP per esito')
+        for r in dati['richieste']:
+            for esito, n in sorted(r['esiti'].items()):
+                righe.append(f'crawl_richieste_totali{{servizio="{r["servizio"]}",endpoint="{r["endpoint"]}",'
+                             f'esito="{esito}"}} {n}')
+        metrica('crawl_byte_ricevuti_totali', 'counter', 'Byte ricevuti nel corpo delle risposte')
+        for r in dati['richieste']:
+            righe.append(f'crawl_byte_ricevuti_totali{{servizio="{r["servizio"]}",endpoint="{r["endpoint"]}"}} '
+                         f'{r["byte"]}')
+        metrica('crawl_tentativi_ripetuti_totali', 'counter', 'Richieste ripetute dopo un 429 o un errore 5xx')
+        for t in dati['tentativi']:
+            righe.append(f'crawl_tentativi_ripetuti_totali{{servizio="{t["servizio"]}",motivo="{t["motivo"]}"}} '
+                         f'{t["totale"]}')
+        metrica('crawl_cache_letture_totali', 'counter', 'Letture della cache su disco per esito')
+        for c in dati['cache']:
+            righe.append(f'crawl_cache_letture_totali{{endpoint="{c["endpoint"]}",esito="{c["esito"]}"}} '
+                         f'{c["totale"]}')
+        metrica('crawl_attesa_limitatore_secondi_totali', 'counter', 'Secondi di pausa imposti dal limitatore')
+        for servizio, secondi in dati['attesa_limitatore'].items():
+            righe.append(f'crawl_attesa_limitatore_secondi_totali{{servizio="{servizio}"}} {secondi}')
+        metrica('crawl_fase_durata_secondi', 'gauge', 'Durata di ogni fase')
+        for fase, d in dati['fasi'].items():
+            righe.append(f'crawl_fase_durata_secondi{{fase="{fase}"}} {d["durata"]}')
+        metrica('crawl_fase_cpu_secondi', 'gauge', 'Tempo CPU del processo principale in ogni fase')
+        for fase, d in dati['fasi'].items():
+            righe.append(f'crawl_fase_cpu_secondi{{fase="{fase}"}} {d["cpu"]}')
+        metrica('crawl_processo_cpu_secondi', 'gauge', 'Tempo CPU del processo e dei worker')
+        righe.append(f'crawl_processo_cpu_secondi{{processo="principale"}} {dati["processo"]["cpu"]}')
+        righe.append(f'crawl_processo_cpu_secondi{{processo="worker"}} {dati["processo"]["cpu_worker"]}')
+        return '\n'.join(righe) + '\n'
+
+    def salva(self, percorso):
+        """Scrive le misure in JSON o, se il file finisce con .prom o .txt, nel formato Prometheus."""
+        cartella = os.path.dirname(percorso)
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+        with open(percorso, 'w', encoding='utf-8') as f:
+            if percorso.endswith(('.prom', '.txt')):
+                f.write(self.a_prometheus())
+            else:
+                json.dump(self.a_dizionario(), f, indent=2)
+
+    def riepilogo(self):
+        """Dove e andato il tempo: rete, attesa del limitatore o CPU."""
+        dati = self.a_dizionario()
+        durata = dati['processo']['durata']
+        rete = sum(r['durata']['somma'] for r in dati['richieste'])
+        attesa = sum(dati['attesa_limitatore'].values())
+        cpu = dati['processo']['cpu'] + dati['processo']['cpu_worker']
+        richieste = sum(r['durata']['totale'] for r in dati['richieste'])
+        print(f"Tempo totale {durata:.1f}s: {richieste} richieste per {rete:.1f}s in rete, "
+              f"{attesa:.1f}s di attesa del limitatore, {cpu:.1f}s di CPU")
+        for r in dati['richieste']:
+            print(f"  {r['servizio']}/{r['endpoint']}: {r['durata']['totale']} richieste, "
+                  f"p50 <= {r['p50']}s, p95 <= {r['p95']}s, {r['byte'] / 1024:.0f} KB")
+        for fase, d in dati['fasi'].items():
+            print(f"  fase {fase}: {d['durata']:.1f}s, CPU {d['cpu']:.1f}s")
+        # Con richieste in parallelo i tempi di rete e di attesa si sommano tra thread
+        motivo = max((('rete', rete), ('rate limit', attesa), ('CPU', cpu)), key=lambda x: x[1])[0]
+        print(f"Il crawl e limitato soprattutto da: {motivo}")
+
+
+def registra_risposta(servizio, classifica):
+    """Hook 'response' di requests: byte ricevuti e tentativi ripetuti da urllib3 (5xx)."""
+    def hook(risposta, *args, **kwargs):
+        endpoint = classifica(risposta.url)
+        misure.ricevuti(servizio, endpoint, len(risposta.content))
+        storia = getattr(getattr(risposta.raw, 'retries', None), 'history', ())
+        if storia:
+            misure.ripetuta(servizio, 'urllib3', len(storia))
+    return hook
+
+
+def _esito(e):
+    from scripts.ratelimit import _stato_http
+    stato = _stato_http(e)
+    return str(stato) if stato else type(e).__name__
+
+
+def _avvia_profilo(profilo):
+    if profilo is None:
+        return None
+    if profilo == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument non installato (pip install pyinstrument): uso cProfile")
+        else:
+            profilatore = Profiler(async_mode='enabled')
+            profilatore.start()
+            return profilatore
+    import cProfile
+    profilatore = cProfile.Profile()
+    profilatore.enable()
+    return profilatore
+
+
+def _salva_profilo(profilatore, nome):
+    os.makedirs(CARTELLA_PROFILI, exist_ok=True)
+    if hasattr(profilatore, 'output_html'):
+        profilatore.stop()
+        percorso = os.path.join(CARTELLA_PROFILI, f'{nome}.html')
+        with open(percorso, 'w', encoding='utf-8') as f:
+            f.write(profilatore.output_html())
+        return percorso
+    profilatore.disable()
+    percorso = os.path.join(CARTELLA_PROFILI, f'{nome}.prof')
+    profilatore.dump_stats(percorso)
+    return percorso
+
+
+misure = Misure()
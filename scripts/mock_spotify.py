@@ -0,0 +1,290 @@
+# Server locale che imita le API Spotify usate dal crawler, per provare la raccolta senza credenziali
+#
+# Il catalogo servito e sintetico oppure ricostruito da un crawl registrato
+# (nodes.csv/edges.csv di una cartella grezzi, ad esempio data/old/grezzi):
+# artisti, nomi, generi e popolarita sono quelli reali e ogni arco diventa
+# tante tracce in comune quanto il suo peso.
+#
+# Uso:
+#     python -m scripts.mock_spotify --porta 8765
+#     python -m scripts.mock_spotify --registrato data/old/grezzi
+#     SPOTIPY_API_PREFIX=http://127.0.0.1:8765/v1/ python main.py --asincrono
+
+import argparse
+import csv
+import json
+import os
+import random
+import string
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+GENERI = ['reggaeton', 'trap latino', 'urbano latino', 'corridos tumbados', 'latin pop',
+          'argentine trap', 'dembow', 'cumbia', 'k-pop', 'afrobeats', 'pop', 'drill']
+
+
+def _nuovo_id(rng):
+    """Genera un ID casuale nel formato base62 di Spotify (22 caratteri)."""
+    return ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(22))
+
+
+def genera_catalogo(n_artisti=300, seed=42, ids_iniziali=None, max_album=8, max_tracce=12, prob_feat=0.35):
+    """Crea un catalogo sintetico e deterministico di artisti, album e tracce con featuring."""
+    rng = random.Random(seed)
+    ids = list(ids_iniziali or [])
+    while len(ids) < n_artisti:
+        ids.append(_nuovo_id(rng))
+
+    artists = {}
+    for i, artist_id in enumerate(ids):
+        artists[artist_id] = {
+            'id': artist_id,
+            'name': f"Artista {i}",
+            'popularity': rng.randint(0, 100),
+            'genres': rng.sample(GENERI, rng.randint(0, 3)),
+            'type': 'artist'
+        }
+
+    albums = {}
+    artist_albums = {artist_id: [] for artist_id in ids}
+    for artist_id in ids:
+        for _ in range(rng.randint(1, max_album)):
+            album_id = _nuovo_id(rng)
+            tracks = []
+            for n in range(rng.randint(1, max_tracce)):
+                credits = [artist_id]
+                if rng.random() < prob_feat:
+                    credits += [a for a in rng.sample(ids, rng.randint(1, 2)) if a != artist_id]
+                tracks.append({
+                    'id': _nuovo_id(rng),
+                    'name': f"Traccia {n}",
+                    'track_number': n + 1,
+                    'artists': [{'id': a, 'name': artists[a]['name']} for a in credits]
+                })
+            albums[album_id] = {
+                'id': album_id,
+                'name': f"Album {album_id[:6]}",
+                'album_type': rng.choice(['album', 'single']),
+                'release_date': f"{rng.randint(2010, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                'artists': [{'id': artist_id, 'name': artists[artist_id]['name']}],
+                'tracks': tracks
+            }
+            artist_albums[artist_id].append(album_id)
+
+    return {'artists': artists, 'albums': albums, 'artist_albums': artist_albums}
+
+
+def catalogo_registrato(cartella, seed=42, max_tracce=12):
+    """Ricostruisce un catalogo da nodes.csv ed edges.csv di un crawl gia fatto.
+
+    Ogni arco (source, target, weight) diventa weight tracce accreditate a
+    entrambi gli artisti, raccolte in album di source da max_tracce tracce;
+    gli artisti senza collaborazioni hanno un singolo solista.
+    """
+    rng = random.Random(seed)
+    artists = {}
+    with open(os.path.join(cartella, 'nodes.csv'), encoding='utf-8') as f:
+        for riga in csv.DictReader(f):
+            artists[riga['id']] = {
+                'id': riga['id'],
+                'name': riga['name'],
+                'popularity': int(float(riga['popularity'] or 0)),
+                'genres': [g for g in (riga.get('genres') or '').split(';') if g],
+                'type': 'artist'
+            }
+
+    crediti = {artist_id: [] for artist_id in artists}
+    with open(os.path.join(cartella, 'edges.csv'), encoding='utf-8') as f:
+        for riga in csv.DictReader(f):
+            for artist_id in (riga['source'], riga['target']):
+                if artist_id not in artists:
+                    artists[artist_id] = {'id': artist_id, 'name': artist_id, 'popularity': 0, 'genres': [],
+                                          'type': 'artist'}
+                    crediti[artist_id] = []
+            crediti[riga['source']] += [[riga['source'], riga['target']]] * int(float(riga['weight']))
+
+    albums = {}
+    artist_albums = {artist_id: [] for artist_id in artists}
+    for artist_id, tracce in crediti.items():
+        tracce = tracce or [[artist_id]]
+        for inizio in range(0, len(tracce), max_tracce):
+            album_id = _nuovo_id(rng)
+            albums[album_id] = {
+                'id': album_id,
+                'name': f"Album {album_id[:6]}",
+                'album_type': 'album' if len(tracce) - inizio > 3 else 'single',
+                'release_date': f"{rng.randint(2010, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                'artists': [{'id': artist_id, 'name': artists[artist_id]['name']}],
+                'tracks': [{
+                    'id': _nuovo_id(rng),
+                    'name': f"Traccia {n}",
+                    'track_number': n + 1,
+                    'artists': [{'id': a, 'name': artists[a]['name']} for a in credits]
+                } for n, credits in enumerate(tracce[inizio:inizio + max_tracce])]
+            }
+            artist_albums[artist_id].append(album_id)
+
+    return {'artists': artists, 'albums': albums, 'artist_albums': artist_albums}
+
+
+def salva_catalogo(catalogo, percorso):
+    """Salva un catalogo su file JSON, per riusarlo come fixture."""
+    with open(percorso, 'w', encoding='utf-8') as f:
+        json.dump(catalogo, f)
+
+
+def carica_catalogo(percorso):
+    with open(percorso, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _pagina(elementi, limit, offset, url_base):
+    """Costruisce un oggetto di paginazione come quelli restituiti da Spotify."""
+    items = elementi[offset:offset + limit]
+    successiva = None
+    if offset + limit < len(elementi):
+        successiva = f"{url_base}?offset={offset + limit}&limit={limit}"
+    return {'items': items, 'limit': limit, 'offset': offset, 'total': len(elementi), 'next': successiva}
+
+
+class GestoreSpotify(BaseHTTPRequestHandler):
+    """Risponde alle richieste GET del client spotipy usando il catalogo del server."""
+
+    # Connessioni keep-alive come i server reali: ogni risposta ha Content-Length. Senza
+    # TCP_NODELAY il corpo, scritto dopo gli header, aspetterebbe l'ACK ritardato del client
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _rispondi(self, stato, corpo, headers=None):
+        dati = json.dumps(corpo).encode('utf-8')
+        self.send_response(stato)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dati)))
+        for chiave, valore in (headers or {}).items():
+            self.send_header(chiave, valore)
+        self.end_headers()
+        self.wfile.write(dati)
+
+    def _errore(self, stato, messaggio):
+        self._rispondi(stato, {'error': {'status': stato, 'message': messaggio}})
+
+    def _album_completo(self, album):
+        base = f"http://{self.headers.get('Host')}/v1/albums/{album['id']}/tracks"
+        dati = {k: v for k, v in album.items() if k != 'tracks'}
+        dati['tracks'] = _pagina(album['tracks'], 50, 0, base)
+        return dati
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parti = [p for p in url.path.split('/') if p]
+        if parti[:1] == ['v1']:
+            parti = parti[1:]
+
+        limit = int(query.get('limit', ['20'])[0])
+        offset = int(query.get('offset', ['0'])[0])
+        base = f"http://{self.headers.get('Host')}{url.path.rstrip('/')}"
+        catalogo = server.catalogo
+
+        if server.latenza:
+            time.sleep(server.latenza)
+
+        # Limite di richieste al secondo: oltre la soglia risponde 429 con Retry-After
+        if server.limite_rps:
+            with server.lock:
+                ora = time.monotonic()
+                server.finestra = [t for t in server.finestra if ora - t < 1.0] + [ora]
+                oltre = len(server.finestra) > server.limite_rps
+                if oltre:
+                    server.rifiutate += 1
+            if oltre:
+                return self._rispondi(429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                                      {'Retry-After': '1'})
+
+        with server.lock:
+            server.richieste['/'.join(p if p in ('artists', 'albums', 'tracks') else '{id}' for p in parti)] += 1
+
+        if parti == ['artists'] and 'ids' in query:
+            ids = query['ids'][0].split(',')
+            return self._rispondi(200, {'artists': [catalogo['artists'].get(i) for i in ids]})
+        if parti == ['albums'] and 'ids' in query:
+            ids = query['ids'][0].split(',')
+            albums = [catalogo['albums'].get(i) for i in ids]
+            return self._rispondi(200, {'albums': [self._album_completo(a) if a else None for a in albums]})
+        if len(parti) == 2 and parti[0] == 'artists':
+            artist = catalogo['artists'].get(parti[1])
+            return self._rispondi(200, artist) if artist else self._errore(404, 'non existing id')
+        if len(parti) == 3 and parti[0] == 'artists' and parti[2] == 'albums':
+            if parti[1] not in catalogo['artists']:
+                return self._errore(404, 'non existing id')
+            albums = [{k: v for k, v in catalogo['albums'][a].items() if k != 'tracks'}
+                      for a in catalogo['artist_albums'][parti[1]]]
+            return self._rispondi(200, _pagina(albums, limit, offset, base))
+        if len(parti) == 2 and parti[0] == 'albums':
+            album = catalogo['albums'].get(parti[1])
+            return self._rispondi(200, self._album_completo(album)) if album else self._errore(404, 'non existing id')
+        if len(parti) == 3 and parti[0] == 'albums' and parti[2] == 'tracks':
+            album = catalogo['albums'].get(parti[1])
+            if not album:
+                return self._errore(404, 'non existing id')
+            return self._rispondi(200, _pagina(album['tracks'], limit, offset, base))
+
+        self._errore(404, 'endpoint non supportato')
+
+
+def avvia_server(catalogo, porta=0, latenza=0.0, limite_rps=None):
+    """Avvia il server in un thread separato e restituisce l'oggetto server (porta in server.server_port)."""
+    server = ThreadingHTTPServer(('127.0.0.1', porta), GestoreSpotify)
+    server.daemon_threads = True
+    server.catalogo = catalogo
+    server.latenza = latenza
+    server.limite_rps = limite_rps
+    server.finestra = []
+    server.rifiutate = 0
+    server.richieste = Counter()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def leggi_semi(filepath):
+    """Legge gli ID dal file dei seed (stesso formato usato da main.py)."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return [line.split(',')[1].strip() for line in f if line.strip() and len(line.split(',')) >= 2]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server Spotify finto per test e benchmark")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--artisti', type=int, default=300)
+    parser.add_argument('--latenza', type=float, default=0.05, help="ritardo simulato per richiesta (secondi)")
+    parser.add_argument('--semi', default='seeds.txt', help="file dei seed da includere nel catalogo")
+    parser.add_argument('--limite-rps', type=int, default=None, help="oltre questa soglia risponde 429")
+    parser.add_argument('--fixture', default=None, help="catalogo JSON da servire al posto di quello sintetico")
+    parser.add_argument('--registrato', default=None,
+                        help="cartella con nodes.csv ed edges.csv di un crawl da cui ricostruire il catalogo")
+    parser.add_argument('--salva', default=None, help="salva il catalogo in JSON per riusarlo con --fixture")
+    args = parser.parse_args()
+
+    if args.fixture:
+        catalogo = carica_catalogo(args.fixture)
+    elif args.registrato:
+        catalogo = catalogo_registrato(args.registrato)
+    else:
+        catalogo = genera_catalogo(args.artisti, ids_iniziali=leggi_semi(args.semi))
+    if args.salva:
+        salva_catalogo(catalogo, args.salva)
+    server = avvia_server(catalogo, args.porta, args.latenza, args.limite_rps)
+    print(f"Server in ascolto su http://127.0.0.1:{server.server_port}/v1/")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,172 @@
+# Endpoint SPARQL locale che imita query.wikidata.org per provare scripts/nazionalita.py senza rete
+#
+# Le risposte vengono prese da un file di registrazioni (query -> risposta
+# JSON) oppure, per le query a blocchi di scripts/wikidata.py, costruite da
+# una tabella spotify_id,name,country come data/old/nazioni/artisti-e-nazionalita.csv.
+# Con --registra le query non presenti vengono inoltrate a Wikidata e salvate.
+#
+# Uso:
+#     python -m scripts.mock_wikidata --porta 8766 --tabella data/old/nazioni/artisti-e-nazionalita.csv
+#     python scripts/nazionalita.py --endpoint http://127.0.0.1:8766/sparql
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+import requests
+
+from scripts.cache import chiave
+from scripts.wikidata import ENDPOINT, AGENT
+
+LETTERALE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def carica_tabella(percorso):
+    """Legge la tabella delle nazionalita: gli artisti Unknown/Error non vengono mai trovati."""
+    df = pd.read_csv(percorso)
+    df = df[~df['country'].isin(['Unknown', 'Error'])]
+    return {r.spotify_id: (r.name, r.country) for r in df.itertuples()}
+
+
+def solo_per_nome(spotify_id):
+    """Un artista su quattro (scelto in modo deterministico) non ha lo Spotify ID su Wikidata."""
+    return int(hashlib.sha1(spotify_id.encode('utf-8')).hexdigest(), 16) % 4 == 0
+
+
+def _valori(query, variabile, predicato):
+    """Valori cercati da una query: lista VALUES delle query a blocchi o letterale delle query singole."""
+    blocco = re.search(r'VALUES\s+\?' + variabile + r'\s*\{(.*?)\}', query, re.S)
+    if blocco is None:
+        blocco = re.search(predicato + r'\s+("(?:[^"\\]|\\.)*")', query)
+    if blocco is None:
+        return None
+    return [re.sub(r'\\(.)', r'\1', v) for v in LETTERALE.findall(blocco.group(1))]
+
+
+def risposta_da_tabella(tabella, query):
+    """Costruisce la risposta a una query VALUES per ID o per nome a partire dalla tabella."""
+    righe = []
+    ids = _valori(query, 'spotify', 'wdt:P1902')
+    if ids is not None:
+        for spotify_id in ids:
+            if spotify_id in tabella and not solo_per_nome(spotify_id):
+                nome, nazione = tabella[spotify_id]
+                righe.append({'spotify': {'type': 'literal', 'value': spotify_id},
+                              'artistLabel': {'type': 'literal', 'value': nome},
+                              'countryLabel': {'type': 'literal', 'value': nazione}})
+        return {'head': {'vars': ['spotify', 'artistLabel', 'countryLabel']}, 'results': {'bindings': righe}}
+
+    nomi = _valori(query, 'nome', 'rdfs:label')
+    if nomi is None:
+        return None
+    per_nome = {nome: nazione for nome, nazione in tabella.values()}
+    for nome in nomi:
+        if nome in per_nome:
+            righe.append({'nome': {'type': 'literal', 'value': nome, 'xml:lang': 'en'},
+                          'artistLabel': {'type': 'literal', 'value': nome},
+                          'countryLabel': {'type': 'literal', 'value': per_nome[nome]}})
+    return {'head': {'vars': ['nome', 'artistLabel', 'countryLabel']}, 'results': {'bindings': righe}}
+
+
+class GestoreWikidata(BaseHTTPRequestHandler):
+    """Risponde alle query SPARQL in GET o POST (parametro query) con risposte registrate."""
+
+    # Connessioni keep-alive come i server reali: ogni risposta ha Content-Length. Senza
+    # TCP_NODELAY il corpo, scritto dopo gli header, aspetterebbe l'ACK ritardato del client
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _rispondi(self, stato, corpo):
+        dati = json.dumps(corpo).encode('utf-8')
+        self.send_response(stato)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.send_header('Content-Length', str(len(dati)))
+        self.end_headers()
+        self.wfile.write(dati)
+
+    def _gestisci(self, parametri):
+        server = self.server
+        query = parametri.get('query', [None])[0]
+        if query is None:
+            return self._rispondi(400, {'error': 'parametro query mancante'})
+        if server.latenza:
+            time.sleep(server.latenza)
+        with server.lock:
+            server.richieste['per nome' if 'rdfs:label' in query else 'per id'] += 1
+
+        k = chiave('sparql', query)
+        risposta = server.registrazioni.get(k)
+        if risposta is None and server.tabella is not None:
+            risposta = risposta_da_tabella(server.tabella, query)
+        if risposta is None and server.registra:
+            r = requests.post(ENDPOINT, data={'query': query}, timeout=90,
+                              headers={'User-Agent': AGENT, 'Accept': 'application/sparql-results+json'})
+            if r.status_code != 200:
+                return self._rispondi(r.status_code, {'error': r.text[:200]})
+            risposta = r.json()
+            with server.lock:
+                server.registrazioni[k] = risposta
+        if risposta is None:
+            return self._rispondi(404, {'error': 'query non registrata'})
+        return self._rispondi(200, risposta)
+
+    def do_GET(self):
+        self._gestisci(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        lunghezza = int(self.headers.get('Content-Length', 0))
+        self._gestisci(parse_qs(self.rfile.read(lunghezza).decode('utf-8')))
+
+
+def avvia_server(registrazioni=None, tabella=None, porta=0, latenza=0.0, registra=False):
+    """Avvia l'endpoint in un thread e restituisce il server (porta 0 = porta libera)."""
+    server = ThreadingHTTPServer(('127.0.0.1', porta), GestoreWikidata)
+    server.registrazioni = registrazioni or {}
+    server.tabella = tabella
+    server.latenza = latenza
+    server.registra = registra
+    server.richieste = Counter()
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Endpoint SPARQL finto per test di scripts/nazionalita.py")
+    parser.add_argument('--porta', type=int, default=8766)
+    parser.add_argument('--registrazioni', default=None, help="file JSON con le risposte registrate")
+    parser.add_argument('--tabella', default=None, help="CSV spotify_id,name,country da cui costruire le risposte")
+    parser.add_argument('--registra', action='store_true',
+                        help="inoltra a Wikidata le query sconosciute e salvale in --registrazioni")
+    parser.add_argument('--latenza', type=float, default=0.0, help="ritardo simulato per query (secondi)")
+    args = parser.parse_args()
+
+    registrazioni = {}
+    if args.registrazioni:
+        try:
+            with open(args.registrazioni, encoding='utf-8') as f:
+                registrazioni = json.load(f)
+        except FileNotFoundError:
+            pass
+    tabella = carica_tabella(args.tabella) if args.tabella else None
+    server = avvia_server(registrazioni, tabella, args.porta, args.latenza, args.registra)
+    print(f"Endpoint in ascolto su http://127.0.0.1:{server.server_port}/sparql")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        if args.registra and args.registrazioni:
+            with open(args.registrazioni, 'w', encoding='utf-8') as f:
+                json.dump(server.registrazioni, f)
+            print(f"Salvate {len(server.registrazioni)} risposte in {args.registrazioni}")
@@ -1,20 +1,34 @@
 # Script per recuperare le nazionalità degli artisti da Wikidata
 
+import argparse
+import os
+import sys
 import pandas as pd
-from SPARQLWrapper import SPARQLWrapper, JSON
-import time
 
-# Caricamento dati artisti
-df_original = pd.read_csv('../data/new/grezzi/nodes.csv')
-artist_data = df_original[['id', 'name']].drop_duplicates().values.tolist()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.ratelimit import stampa_statistiche
+from scripts.cache import stampa_statistiche as stampa_statistiche_cache
+from scripts.misure import misure
+from scripts.trasporto import chiudi_sessioni, stampa_statistiche as stampa_statistiche_trasporto
+from scripts.wikidata import ClientSparql, nazionalita, ENDPOINT, BLOCCO_ID, BLOCCO_NOMI
+from scripts.indice_wikidata import IndiceNazionalita, nazionalita_da_indice
+from scripts.archivio import carica_tabella, salva_tabella
 
+INPUT_NODI = '../data/new/grezzi/nodes.csv'
+OUTPUT = '../data/new/nazioni/artisti-e-nazionalita.csv'
 
-def get_artist_data_from_wikidata(spotify_id, artist_name):
+_clienti = {}
+
+
+def esegui_query(endpoint_url, query):
+    """Esegue una query SPARQL con un client per endpoint: stessa sessione HTTP, cache e limitatore di Wikidata."""
+    if endpoint_url not in _clienti:
+        _clienti[endpoint_url] = ClientSparql(endpoint_url)
+    return _clienti[endpoint_url].esegui(query)
+
+
+def get_artist_data_from_wikidata(spotify_id, artist_name, endpoint_url=ENDPOINT):
     """Cerca la nazionalità di un artista su Wikidata tramite Spotify ID o nome."""
-    endpoint_url = "https://query.wikidata.org/sparql"
-    sparql = SPARQLWrapper(endpoint_url, agent="MusicResearchProject/1.0")
-    sparql.setReturnFormat(JSON)
-    
     # Query per cercare tramite Spotify ID
     query = f"""
     SELECT ?artistLabel ?countryLabel WHERE {{
@@ -32,8 +46,7 @@ def get_artist_data_from_wikidata(spotify_id, artist_name):
     """
     
     try:
-        sparql.setQuery(query)
-        results = sparql.query().convert()
+        results = esegui_query(endpoint_url, query)
         if results["results"]["bindings"]:
             data = results["results"]["bindings"][0]
             name = data.get("artistLabel", {}).get("value", "Unknown")
@@ -60,9 +73,7 @@ def get_artist_data_from_wikidata(spotify_id, artist_name):
         LIMIT 1
         """
         
-        time.sleep(0.3)
-        sparql.setQuery(name_query)
-        name_results = sparql.query().convert()
+        name_results = esegui_query(endpoint_url, name_query)
         
         if name_results["results"]["bindings"]:
             data = name_results["results"]["bindings"][0]
@@ -77,34 +88,89 @@ def get_artist_data_from_wikidata(spotify_id, artist_name):
         return artist_name, "Error"
 
 
-# Elaborazione artisti
-risultati = []
-total = len(artist_data)
-unknown_count = 0
-error_count = 0
+def gia_salvati(percorso):
+    """ID gia presenti nel file dei risultati (esclusi gli errori, che vengono ritentati)."""
+    if not os.path.exists(percorso):
+        return set()
+    df = pd.read_csv(percorso, dtype=str, keep_default_na=False)
+    return set(df.loc[df['country'] != 'Error', 'spotify_id'])
 
-print(f"Inizio recupero dati per {total} artisti")
 
-for i, (s_id, s_name) in enumerate(artist_data):
-    name, country = get_artist_data_from_wikidata(s_id, s_name)
-    risultati.append({
-        'spotify_id': s_id, 
-        'name': name, 
-        'country': country
-    })
-    
-    if country == "Unknown":
-        unknown_count += 1
-    if country == "Error":
-        error_count += 1
-    
-    if (i + 1) % 50 == 0:
-        print(f"Processati {i+1}/{total}")
+def scrivi_righe(percorso, righe):
+    """Aggiunge le righe in coda al file dei risultati."""
+    if righe:
+        pd.DataFrame(righe, columns=['spotify_id', 'name', 'country']).to_csv(
+            percorso, mode='a', header=not os.path.exists(percorso), index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nazionalita degli artisti da Wikidata")
+    parser.add_argument('--per-artista', action='store_true',
+                        help="una query per artista invece delle query a blocchi")
+    parser.add_argument('--endpoint', default=os.getenv('WIKIDATA_ENDPOINT', ENDPOINT))
+    parser.add_argument('--blocco-id', type=int, default=BLOCCO_ID, help="Spotify ID per query")
+    parser.add_argument('--blocco-nomi', type=int, default=BLOCCO_NOMI, help="nomi per query di fallback")
+    parser.add_argument('--nuovo', action='store_true', help="ignora i risultati gia salvati")
+    parser.add_argument('--indice', default=None,
+                        help="indice locale costruito da un dump (scripts/indice_wikidata.py): nessuna query")
+    parser.add_argument('--metriche', default=None, metavar='PERCORSO',
+                        help="salva le misure delle query in JSON (.json) o formato Prometheus (.prom)")
+    parser.add_argument('--profilo', choices=['cprofile', 'pyinstrument'], default=None,
+                        help="profila la ricerca e salva il risultato in data/new/profili")
+    args = parser.parse_args()
+
+    # Caricamento dati artisti
+    df_original = carica_tabella(INPUT_NODI, colonne=['id', 'name'])
+    artist_data = df_original[['id', 'name']].drop_duplicates().values.tolist()
+    total = len(artist_data)
+
+    os.makedirs(os.path.dirname(OUTPUT), exist_ok=True)
+    if args.nuovo and os.path.exists(OUTPUT):
+        os.remove(OUTPUT)
+    salvati = gia_salvati(OUTPUT)
+    da_fare = [(s_id, s_name) for s_id, s_name in artist_data if s_id not in salvati]
+    print(f"Inizio recupero dati per {total} artisti ({total - len(da_fare)} gia salvati)")
+
+    # I risultati vengono scritti su disco man mano: un'interruzione non fa perdere il lavoro fatto
+    processati = total - len(da_fare)
+
+    def scrivi(righe):
+        global processati
+        scrivi_righe(OUTPUT, righe)
+        processati += len(righe)
+        print(f"Processati {processati}/{total}")
 
-    time.sleep(0.5)
+    with misure.fase('nazionalita', args.profilo):
+        if args.indice:
+            indice = IndiceNazionalita(args.indice)
+            nazionalita_da_indice(indice, da_fare, scrivi)
+            indice.chiudi()
+        elif args.per_artista:
+            for s_id, s_name in da_fare:
+                name, country = get_artist_data_from_wikidata(s_id, s_name, args.endpoint)
+                scrivi_righe(OUTPUT, [{'spotify_id': s_id, 'name': name, 'country': country}])
+                processati += 1
+                if processati % 50 == 0:
+                    print(f"Processati {processati}/{total}")
+        else:
+            client = ClientSparql(args.endpoint)
+            nazionalita(client, da_fare, scrivi, args.blocco_id, args.blocco_nomi)
 
-# Salvataggio risultati
-df_nationalities = pd.DataFrame(risultati)
-df_nationalities.to_csv('../data/new/nazioni/artisti-e-nazionalita.csv', index=False)
+    # Riordino finale: una riga per artista, nello stesso ordine di nodes.csv
+    df_nationalities = pd.read_csv(OUTPUT, dtype=str, keep_default_na=False)
+    df_nationalities = df_nationalities.drop_duplicates('spotify_id', keep='last').set_index('spotify_id')
+    ordine = [s_id for s_id in dict.fromkeys(s_id for s_id, _ in artist_data) if s_id in df_nationalities.index]
+    df_nationalities = df_nationalities.loc[ordine].reset_index()
+    salva_tabella(df_nationalities, OUTPUT)
 
-print(f"Completato. Totale: {total}, trovati: {total - unknown_count - error_count}, non trovati: {unknown_count}, errori: {error_count}")
\ No newline at end of file
+    unknown_count = int((df_nationalities['country'] == 'Unknown').sum())
+    error_count = int((df_nationalities['country'] == 'Error').sum())
+    print(f"Completato. Totale: {total}, trovati: {total - unknown_count - error_count}, non trovati: {unknown_count}, errori: {error_count}")
+    stampa_statistiche()
+    stampa_statistiche_cache()
+    stampa_statistiche_trasporto()
+    chiudi_sessioni()
+    misure.riepilogo()
+    if args.metriche:
+        misure.salva(args.metriche)
+        print(f"Misure salvate in {args.metriche}")
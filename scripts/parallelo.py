@@ -0,0 +1,98 @@
+# Crawl multi-processo: i blocchi della frontiera di ogni livello vengono divisi tra processi worker
+#
+# Ogni worker usa le proprie credenziali Spotify (SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_ID_2, ...)
+# e quindi il proprio rate limit. Il worker scarica il blocco, estrae le coppie
+# gia ordinate e le conta in un Counter; il processo principale unisce i
+# risultati nell'ordine della coda, quindi l'output e identico a quello del
+# crawl sequenziale indipendentemente da quale worker finisce prima.
+# Con ogni shard il worker restituisce anche le proprie misure (scripts/misure.py).
+
+import multiprocessing
+import time
+from collections import Counter
+
+from scripts.batch import a_blocchi, collaborazioni_blocco
+from scripts.misure import misure
+from scripts.utils import get_spotify_client, credenziali_spotify
+
+DIMENSIONE_SHARD = 50
+
+_sp = None
+
+
+def _inizializza(coda_credenziali, solo_cache):
+    """Crea nel worker un client con il primo set di credenziali libero."""
+    global _sp
+    _sp = get_spotify_client(coda_credenziali.get())
+    if solo_cache and _sp.cache is not None:
+        _sp.cache.solo_cache = True
+
+
+def _processa_shard(args):
+    """Scarica uno shard e restituisce (artisti, conteggio, errori, misure) per StatoCrawl.registra_shard."""
+    shard, da_profilare = args
+    try:
+        profili, risultati, albums = collaborazioni_blocco(_sp, shard, lambda a: a in da_profilare)
+    except Exception as e:
+        return [], Counter(), [(a, str(e)) for a in shard], misure.estrai()
+
+    artisti = []
+    errori = []
+    conteggio = Counter()
+    for artist_id in shard:
+        collabs = risultati[artist_id]
+        if isinstance(collabs, Exception):
+            errori.append((artist_id, str(collabs)))
+            continue
+        info = profili.get(artist_id)
+        if info is None and artist_id in da_profilare:
+            errori.append((artist_id, "profilo non trovato"))
+            continue
+        coppie = [tuple(sorted(c)) for c in collabs]
+        conteggio.update(coppie)
+        artisti.append((artist_id, info, coppie, albums[artist_id]))
+    return artisti, conteggio, errori, misure.estrai()
+
+
+class CrawlerParallelo:
+    """Distribuisce gli shard di ogni livello su un pool di processi, uno per set di credenziali."""
+
+    def __init__(self, n_processi=None, solo_cache=False):
+        self.credenziali = credenziali_spotify()
+        self.n_processi = n_processi or len(self.credenziali)
+        self.solo_cache = solo_cache
+        if self.n_processi > len(self.credenziali):
+            print(f"Attenzione: {self.n_processi} processi ma {len(self.credenziali)} credenziali, "
+                  f"alcune verranno condivise")
+
+    def crawl(self, stato, max_depth):
+        """Visita in ampiezza con merge deterministico dei risultati a ogni blocco."""
+        # spawn anche su Linux: i worker non ereditano connessioni SQLite o stato dei limitatori
+        ctx = multiprocessing.get_context('spawn')
+        coda = ctx.Queue()
+        for i in range(self.n_processi):
+            coda.put(self.credenziali[i % len(self.credenziali)])
+
+        with ctx.Pool(self.n_processi, initializer=_inizializza, initargs=(coda, self.solo_cache)) as pool:
+            current_level_queue = stato.current_level_queue
+            while stato.depth < max_depth:
+                print(f"Analisi livello {stato.depth + 1} con {self.n_processi} processi")
+                inizio = time.perf_counter()
+
+                da_processare = [a for a in dict.fromkeys(current_level_queue) if a not in stato.processed_ids]
+                shards = [(s, {a for a in s if a not in stato.nodes_data})
+                          for s in a_blocchi(da_processare, DIMENSIONE_SHARD)]
+
+                # imap restituisce gli shard nell'ordine della coda anche se terminano in ordine diverso
+                for artisti, conteggio, errori, misure_worker in pool.imap(_processa_shard, shards):
+                    misure.unisci(misure_worker)
+                    for artist_id, errore in errori:
+                        print(f"Errore con {artist_id}: {errore}")
+                    stato.registra_shard(artisti, conteggio)
+                    for artist_id, _, coppie, _ in artisti:
+                        print(f"Processato: {stato.nodes_data[artist_id]['name']} ({len(coppie)} collaborazioni)")
+
+                print(f"Livello {stato.depth + 1}: {len(da_processare)} artisti in {time.perf_counter() - inizio:.1f}s")
+                current_level_queue = stato.chiudi_livello()
+                if not current_level_queue:
+                    break
@@ -0,0 +1,267 @@
+# Esecuzione dell'intera analisi come grafo di fasi, dalla raccolta ai grafici
+#
+# Ogni fase dichiara comando, cartella di lavoro, file di input e di output;
+# le dipendenze si ricavano dai file (una fase dipende da chi produce i suoi
+# input). Prima di eseguire una fase si calcola l'impronta del contenuto dei
+# suoi input e del codice: lo script della fase e tutti i moduli di scripts/
+# che importa, direttamente o tramite altri moduli (ricavati dagli import con
+# ast, anche quelli dentro le funzioni). Se l'impronta e uguale a quella
+# dell'ultima esecuzione riuscita e gli output esistono, la fase viene saltata. Le fasi
+# indipendenti (ad esempio nazionalita e mappatura dei generi) girano in
+# parallelo. Impronte e tempi vengono salvati in data/new/pipeline.json, i
+# log di ogni fase in data/new/log.
+#
+# Uso (dalla cartella del progetto):
+#     python -m scripts.pipeline                      tutte le fasi da aggiornare
+#     python -m scripts.pipeline --fino-a heatmap     solo le fasi che servono alla heatmap
+#     python -m scripts.pipeline --forza nazionalita  riesegue una fase anche se aggiornata
+#     python -m scripts.pipeline --secco              mostra cosa verrebbe eseguito
+#     python -m scripts.pipeline --escludi raccolta   usa i dati grezzi gia presenti senza rifare il crawl
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERCORSO_STATO = 'data/new/pipeline.json'
+CARTELLA_LOG = 'data/new/log'
+BLOCCO_LETTURA = 1 << 20
+
+
+@dataclass
+class Fase:
+    nome: str
+    comando: list          # argomenti dopo l'interprete Python
+    input: list            # percorsi relativi alla radice del progetto
+    output: list
+    codice: list           # script della fase; i moduli di scripts/ che importa si aggiungono da soli
+    cartella: str = '.'    # cartella di lavoro relativa alla radice
+
+
+FASI = [
+    Fase('raccolta', ['main.py'], ['seeds.txt'],
+         ['data/new/grezzi/nodes.csv', 'data/new/grezzi/edges.csv'],
+         ['main.py']),
+    Fase('metriche', ['-m', 'scripts.metriche'], ['data/new/grezzi/nodes.csv', 'data/new/grezzi/edges.csv'],
+         ['data/new/metriche/metriche.csv'], ['scripts/metriche.py']),
+    Fase('generi', ['map.py'], ['data/new/grezzi/nodes.csv', 'data/new/metriche/metriche.csv'],
+         ['data/new/generi-mappati.csv'], ['scripts/map.py'], cartella='scripts'),
+    Fase('nazionalita', ['nazionalita.py'], ['data/new/grezzi/nodes.csv'],
+         ['data/new/nazioni/artisti-e-nazionalita.csv'], ['scripts/nazionalita.py'], cartella='scripts'),
+    Fase('grafo-nazionalita', ['grafo-nazionalita.py'],
+         ['data/new/nazioni/artisti-e-nazionalita.csv', 'data/new/grezzi/edges.csv'],
+         ['data/new/nazioni/nodes.csv', 'data/new/nazioni/edges.csv'],
+         ['scripts/grafo-nazionalita.py'], cartella='scripts'),
+    Fase('contrazioni', ['-m', 'scripts.contrazione'],
+         ['data/new/grezzi/nodes.csv', 'data/new/grezzi/edges.csv', 'data/new/generi-mappati.csv',
+          'data/new/nazioni/artisti-e-nazionalita.csv'],
+         [f'data/new/contrazioni/{a}/edges.csv' for a in ['country', 'genres_mapped', 'modularity_class', 'popularity']],
+         ['scripts/contrazione.py']),
+    Fase('esportazione', ['-m', 'scripts.esportazione', '--layout'],
+         ['data/new/grezzi/nodes.csv', 'data/new/grezzi/edges.csv', 'data/new/generi-mappati.csv',
+          'data/new/nazioni/artisti-e-nazionalita.csv', 'data/new/metriche/metriche.csv'],
+         ['data/new/grezzi/rete.gexf'], ['scripts/esportazione.py']),
+    Fase('heatmap', ['heatmap.py'], ['data/new/generi-mappati.csv'], ['report/heatmap.png'],
+         ['scripts/heatmap.py'], cartella='scripts'),
+    Fase('scatterplot', ['scatterplot.py'], ['data/new/grezzi/nodes.csv', 'data/new/grezzi/edges.csv'],
+         ['report/scatterplot.png'], ['scripts/scatterplot.py'], cartella='scripts'),
+]
+
+
+def impronta_file(percorso, h):
+    """Aggiunge all'hash il nome e il contenuto del file (o la sua assenza)."""
+    h.update(percorso.encode('utf-8') + b'\0')
+    if not os.path.exists(percorso):
+        h.update(b'assente')
+        return
+    with open(percorso, 'rb') as f:
+        while blocco := f.read(BLOCCO_LETTURA):
+            h.update(blocco)
+
+
+def _importati(percorso):
+    """Moduli di scripts/ importati direttamente dal file (percorsi relativi alla radice)."""
+    with open(percorso, 'rb') as f:
+        albero = ast.parse(f.read(), filename=percorso)
+    nomi = set()
+    for nodo in ast.walk(albero):
+        if isinstance(nodo, ast.Import):
+            nomi.update(a.name for a in nodo.names)
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module and nodo.level == 0:
+            # from scripts import x importa il modulo scripts.x
+            nomi.update([nodo.module] + [f'{nodo.module}.{a.name}' for a in nodo.names])
+    moduli = (n.replace('.', '/') + '.py' for n in nomi if n.startswith('scripts.'))
+    return sorted(m for m in moduli if os.path.exists(m))
+
+
+def codice_fase(fase):
+    """Gli script della fase piu tutti i moduli di scripts/ che importano, anche indirettamente."""
+    trovati = set()
+    da_visitare = list(fase.codice)
+    while da_visitare:
+        percorso = da_visitare.pop()
+        if percorso not in trovati:
+            trovati.add(percorso)
+            if os.path.exists(percorso):
+                da_visitare.extend(_importati(percorso))
+    return sorted(trovati)
+
+
+def impronta(fase):
+    """Hash di comando, codice (import compresi) e contenuto degli input della fase."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([fase.comando, fase.cartella]).encode('utf-8'))
+    for percorso in codice_fase(fase) + fase.input:
+        impronta_file(percorso, h)
+    return h.hexdigest()
+
+
+def dipendenze(fasi):
+    """Per ogni fase, le fasi che producono i suoi input."""
+    produttori = {o: f.nome for f in fasi for o in f.output}
+    return {f.nome: sorted({produttori[i] for i in f.input if i in produttori and produttori[i] != f.nome})
+            for f in fasi}
+
+
+def necessarie(fasi, obiettivi):
+    """Le fasi obiettivo piu tutte quelle da cui dipendono."""
+    dip = dipendenze(fasi)
+    scelte = set()
+    da_visitare = list(obiettivi)
+    while da_visitare:
+        nome = da_visitare.pop()
+        if nome not in scelte:
+            scelte.add(nome)
+            da_visitare.extend(dip[nome])
+    return [f for f in fasi if f.nome in scelte]
+
+
+def carica_stato(percorso=PERCORSO_STATO):
+    try:
+        with open(percorso, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def salva_stato(stato, percorso=PERCORSO_STATO):
+    os.makedirs(os.path.dirname(percorso), exist_ok=True)
+    with open(percorso, 'w', encoding='utf-8') as f:
+        json.dump(stato, f, indent=2)
+
+
+def aggiornata(fase, stato, h):
+    precedente = stato.get(fase.nome, {})
+    return precedente.get('impronta') == h and all(os.path.exists(o) for o in fase.output)
+
+
+def esegui_fase(fase):
+    """Lancia lo script della fase, con l'output in data/new/log/<fase>.log. Restituisce (codice, durata)."""
+    os.makedirs(CARTELLA_LOG, exist_ok=True)
+    inizio = time.perf_counter()
+    with open(os.path.join(CARTELLA_LOG, f'{fase.nome}.log'), 'w', encoding='utf-8') as log:
+        ambiente = dict(os.environ, PYTHONPATH=RADICE, MPLBACKEND=os.getenv('MPLBACKEND', 'Agg'))
+        codice = subprocess.call([sys.executable] + fase.comando, cwd=os.path.join(RADICE, fase.cartella),
+                                 stdout=log, stderr=subprocess.STDOUT, env=ambiente)
+    return codice, time.perf_counter() - inizio
+
+
+def coda_log(fase, righe=15):
+    with open(os.path.join(CARTELLA_LOG, f'{fase.nome}.log'), encoding='utf-8', errors='replace') as f:
+        return ''.join(f.readlines()[-righe:])
+
+
+def esegui(fasi, forza=(), secco=False, processi=2):
+    """Esegue le fasi nell'ordine delle dipendenze, in parallelo quando possibile.
+
+    Una fase parte quando quelle da cui dipende sono terminate; la sua impronta
+    viene calcolata in quel momento, cosi vede gli input appena rigenerati.
+    Restituisce {fase: 'eseguita' | 'saltata' | 'fallita' | 'bloccata'}.
+    """
+    stato = carica_stato()
+    dip = dipendenze(fasi)
+    nomi = {f.nome for f in fasi}
+    esiti = {}
+    in_corso = {}
+
+    def pronte():
+        return [f for f in fasi if f.nome not in esiti and f.nome not in in_corso.values()
+                and all(d in esiti or d not in nomi for d in dip[f.nome])]
+
+    with ThreadPoolExecutor(max_workers=max(processi, 1)) as pool:
+        while len(esiti) < len(fasi):
+            for fase in pronte():
+                if any(esiti.get(d) in ('fallita', 'bloccata') for d in dip[fase.nome]):
+                    esiti[fase.nome] = 'bloccata'
+                    print(f"[{fase.nome}] bloccata: una fase precedente e fallita")
+                    continue
+                h = impronta(fase)
+                # Con --secco le fasi a valle di una da eseguire vengono segnate come da eseguire
+                a_valle = secco and any(esiti.get(d) == 'eseguita' for d in dip[fase.nome])
+                if fase.nome not in forza and not a_valle and aggiornata(fase, stato, h):
+                    esiti[fase.nome] = 'saltata'
+                    print(f"[{fase.nome}] aggiornata, saltata")
+                    continue
+                if secco:
+                    esiti[fase.nome] = 'eseguita'
+                    print(f"[{fase.nome}] da eseguire")
+                    continue
+                print(f"[{fase.nome}] avvio: python {' '.join(fase.comando)} (in {fase.cartella})")
+                in_corso[pool.submit(esegui_fase, fase)] = fase.nome
+            if not in_corso:
+                continue
+
+            finiti, _ = wait(in_corso, return_when=FIRST_COMPLETED)
+            for futuro in finiti:
+                nome = in_corso.pop(futuro)
+                fase = next(f for f in fasi if f.nome == nome)
+                codice, durata = futuro.result()
+                if codice != 0:
+                    esiti[nome] = 'fallita'
+                    print(f"[{nome}] fallita (codice {codice}) dopo {durata:.1f}s, ultime righe del log:")
+                    print(coda_log(fase))
+                    continue
+                esiti[nome] = 'eseguita'
+                # L'impronta si ricalcola a fine fase: gli input non devono essere cambiati nel frattempo
+                stato[nome] = {'impronta': impronta(fase), 'durata': round(durata, 3),
+                               'eseguita': time.strftime('%Y-%m-%d %H:%M:%S')}
+                salva_stato(stato)
+                print(f"[{nome}] completata in {durata:.1f}s")
+    return esiti
+
+
+def stampa_riepilogo(fasi, esiti):
+    stato = carica_stato()
+    print(f"\n{'fase':<18} {'esito':<10} {'durata':>8}  ultima esecuzione")
+    for fase in fasi:
+        s = stato.get(fase.nome, {})
+        durata = f"{s['durata']:.1f}s" if 'durata' in s else '-'
+        print(f"{fase.nome:<18} {esiti.get(fase.nome, '-'):<10} {durata:>8}  {s.get('eseguita', '-')}")
+
+
+if __name__ == "__main__":
+    os.chdir(RADICE)
+    nomi = [f.nome for f in FASI]
+    parser = argparse.ArgumentParser(description="Pipeline completa con fasi saltate se gli input non cambiano")
+    parser.add_argument('--fino-a', nargs='+', choices=nomi, default=None,
+                        help="esegue solo queste fasi e quelle da cui dipendono")
+    parser.add_argument('--forza', nargs='+', choices=nomi, default=[], help="fasi da rieseguire comunque")
+    parser.add_argument('--escludi', nargs='+', choices=nomi, default=[],
+                        help="fasi da non eseguire, usando i loro output gia presenti")
+    parser.add_argument('--secco', action='store_true', help="mostra le fasi da eseguire senza eseguirle")
+    parser.add_argument('--processi', type=int, default=2, help="fasi eseguite contemporaneamente")
+    args = parser.parse_args()
+
+    fasi = necessarie(FASI, args.fino_a) if args.fino_a else FASI
+    fasi = [f for f in fasi if f.nome not in args.escludi]
+    esiti = esegui(fasi, forza=set(args.forza), secco=args.secco, processi=args.processi)
+    if not args.secco:
+        stampa_riepilogo(fasi, esiti)
+    sys.exit(1 if 'fallita' in esiti.values() else 0)
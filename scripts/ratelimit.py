@@ -0,0 +1,182 @@
+# Limitazione adattiva delle richieste verso i servizi esterni (Spotify, Wikidata)
+#
+# Ogni servizio ha un token bucket: la velocita cresce gradualmente finche le
+# richieste vanno a buon fine e viene dimezzata quando il server risponde 429,
+# rispettando l'header Retry-After (con un po' di jitter) prima di riprovare.
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from scripts.misure import misure
+
+# Parametri per servizio: velocita iniziale/minima/massima (richieste al secondo) e burst
+CONFIGURAZIONI = {
+    'spotify': {'rate': 5.0, 'rate_min': 0.5, 'rate_max': 25.0, 'burst': 10, 'incremento': 0.5},
+    'wikidata': {'rate': 2.0, 'rate_min': 0.2, 'rate_max': 5.0, 'burst': 2, 'incremento': 0.1},
+}
+
+MAX_TENTATIVI = 8
+
+
+class RichiestaLimitata(Exception):
+    """Sollevata quando una richiesta continua a ricevere 429 dopo tutti i tentativi."""
+
+
+def _stato_http(e):
+    """Restituisce il codice HTTP di un'eccezione di spotipy, urllib o requests (None se assente)."""
+    for attributo in ('http_status', 'code', 'status_code'):
+        valore = getattr(e, attributo, None)
+        if isinstance(valore, int):
+            return valore
+    risposta = getattr(e, 'response', None)
+    return getattr(risposta, 'status_code', None)
+
+
+def _headers(e):
+    headers = getattr(e, 'headers', None)
+    if headers is None:
+        headers = getattr(getattr(e, 'response', None), 'headers', None)
+    return headers
+
+
+def _limitata(e):
+    """Vero se l'eccezione viene da una risposta 429 del server.
+
+    Quando urllib3 esaurisce i tentativi su un 5xx, spotipy solleva
+    SpotifyException(429, -1, '... Max Retries') senza risposta e quindi senza
+    header: e un server in errore, non un limite di velocita, e non va ripetuto.
+    """
+    return _stato_http(e) == 429 and bool(_headers(e))
+
+
+def _retry_after(e):
+    """Legge l'header Retry-After (in secondi o come data HTTP) da un'eccezione."""
+    headers = _headers(e)
+    valore = headers.get('Retry-After') if headers else None
+    if valore is None:
+        return None
+    try:
+        return max(0.0, float(valore))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(valore).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class TokenBucket:
+    """Token bucket thread-safe con velocita adattiva (aumento additivo, riduzione moltiplicativa)."""
+
+    def __init__(self, nome, rate, rate_min, rate_max, burst, incremento):
+        self.nome = nome
+        self.rate = rate
+        self.rate_min = rate_min
+        self.rate_max = rate_max
+        self.burst = burst
+        self.incremento = incremento
+        self.tokens = float(burst)
+        self.ultimo = time.monotonic()
+        self.pausa_fino = 0.0
+        self.errori_consecutivi = 0
+        self.lock = threading.Lock()
+
+        # Contatori esposti
+        self.richieste = 0
+        self.throttled = 0
+        self.attesa_totale = 0.0
+
+    def _ricarica(self, ora):
+        if ora < self.pausa_fino:
+            self.tokens = 0.0
+        else:
+            self.tokens = min(self.burst, self.tokens + (ora - max(self.ultimo, self.pausa_fino)) * self.rate)
+        self.ultimo = ora
+
+    def acquisisci(self):
+        """Blocca finche non e disponibile un token e restituisce i secondi di attesa."""
+        attesa = 0.0
+        while True:
+            with self.lock:
+                ora = time.monotonic()
+                self._ricarica(ora)
+                if ora >= self.pausa_fino and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.richieste += 1
+                    self.attesa_totale += attesa
+                    if attesa:
+                        misure.attesa_limitatore(self.nome, attesa)
+                    return attesa
+                if ora < self.pausa_fino:
+                    dormi = self.pausa_fino - ora
+                else:
+                    dormi = (1 - self.tokens) / self.rate
+            time.sleep(dormi)
+            attesa += dormi
+
+    def successo(self):
+        """Aumenta gradualmente la velocita (circa +incremento req/s per ogni secondo di traffico)."""
+        with self.lock:
+            self.errori_consecutivi = 0
+            self.rate = min(self.rate_max, self.rate + self.incremento / self.rate)
+
+    def rallenta(self, retry_after=None):
+        """Dimezza la velocita e sospende tutte le richieste per Retry-After secondi piu jitter."""
+        with self.lock:
+            self.throttled += 1
+            self.errori_consecutivi += 1
+            self.rate = max(self.rate_min, self.rate / 2)
+            if retry_after is None:
+                retry_after = min(60.0, 2.0 ** self.errori_consecutivi)
+            pausa = retry_after + random.uniform(0, 0.1 * retry_after + 0.5)
+            self.pausa_fino = max(self.pausa_fino, time.monotonic() + pausa)
+
+    def esegui(self, funzione, *args, **kwargs):
+        """Esegue una chiamata rispettando il limite e la ripete se il server risponde 429.
+
+        Gli altri errori, compresi i 5xx per cui urllib3 ha gia esaurito i suoi
+        tentativi, vengono rilanciati subito.
+        """
+        for _ in range(MAX_TENTATIVI):
+            self.acquisisci()
+            try:
+                risultato = funzione(*args, **kwargs)
+            except Exception as e:
+                if not _limitata(e):
+                    raise
+                self.rallenta(_retry_after(e))
+                misure.ripetuta(self.nome, '429')
+                continue
+            self.successo()
+            return risultato
+        raise RichiestaLimitata(f"{self.nome}: troppe risposte 429 consecutive")
+
+    def statistiche(self):
+        return {
+            'servizio': self.nome,
+            'richieste': self.richieste,
+            'throttled': self.throttled,
+            'attesa_totale': round(self.attesa_totale, 2),
+            'rate_attuale': round(self.rate, 2)
+        }
+
+
+_limitatori = {}
+_lock_registro = threading.Lock()
+
+
+def get_limiter(nome):
+    """Restituisce il limitatore condiviso per un servizio, creandolo alla prima richiesta."""
+    with _lock_registro:
+        if nome not in _limitatori:
+            _limitatori[nome] = TokenBucket(nome, **CONFIGURAZIONI[nome])
+        return _limitatori[nome]
+
+
+def stampa_statistiche():
+    """Stampa i contatori di tutti i limitatori usati nel processo."""
+    for limitatore in _limitatori.values():
+        s = limitatore.statistiche()
+        print(f"Rate limit {s['servizio']}: {s['richieste']} richieste, {s['throttled']} risposte 429, "
+              f"{s['attesa_totale']}s di attesa, velocita finale {s['rate_attuale']} req/s")
@@ -1,57 +1,102 @@
 # Script per creare uno scatterplot della popolarità tra artisti collaboranti
+#
+# Fino a --soglia archi viene disegnato un punto per arco; oltre, gli archi
+# vengono prima aggregati in una matrice di densita 101x101 (popolarita 0-100,
+# scripts/aggregazioni.py) e il grafico mostra le collaborazioni per cella,
+# in scala logaritmica. Le correlazioni sono calcolate dalla stessa matrice.
+# Il grafico viene solo salvato; con --mostra si apre anche la finestra.
+#
+# Uso (dalla cartella scripts):
+#     python scatterplot.py                    punti o densita in base al numero di archi
+#     python scatterplot.py --modo densita     sempre la matrice di densita
+#     python scatterplot.py --mostra
 
-import pandas as pd
+import argparse
+import os
+import sys
+
+import matplotlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.aggregazioni import (popolarita_archi, popolarita_per_indice, densita_popolarita, densita_archi,
+                                  statistiche_densita, POPOLARITA_MAX)
+from scripts.archivio import carica_tabella, carica_archi_indicizzati
+
+SOGLIA_PUNTI = 200_000
+
+parser = argparse.ArgumentParser(description="Scatterplot della popolarita tra artisti collaboranti")
+parser.add_argument('--modo', choices=['auto', 'punti', 'densita'], default='auto',
+                    help="un punto per arco o matrice di densita (auto: densita oltre --soglia archi)")
+parser.add_argument('--soglia', type=int, default=SOGLIA_PUNTI)
+parser.add_argument('--mostra', action='store_true', help="apre la finestra del grafico dopo averlo salvato")
+parser.add_argument('--output', default='../report/scatterplot.png')
+args = parser.parse_args()
+
+# Senza finestra si usa un backend che non richiede un display
+if not args.mostra:
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.colors import LinearSegmentedColormap
+import pandas as pd
+from matplotlib.colors import LinearSegmentedColormap, LogNorm
 
 # Configurazione colori
 gephi_cmap = LinearSegmentedColormap.from_list("gephi", ["#BF84F9", "#DC7AF2", "#FB71FF"])
 
-# Caricamento dati nodi e archi
-nodes_df = pd.read_csv('../data/new/grezzi/nodes.csv')
-edges_df = pd.read_csv('../data/new/grezzi/edges.csv')
-
-# Mappatura ID artista -> popolarità
-popularity_map = dict(zip(nodes_df['id'], nodes_df['popularity']))
-
-# Creazione dataset per il grafico
-edge_popularity = []
-for idx, row in edges_df.iterrows():
-    source_id = row['source']
-    target_id = row['target']
-    if source_id in popularity_map and target_id in popularity_map:
-        edge_popularity.append({
-            'source_popularity': popularity_map[source_id],
-            'target_popularity': popularity_map[target_id],
-            'weight': row['weight']
-        })
-
-df_edges = pd.DataFrame(edge_popularity)
+# Caricamento dati nodi e archi: con l'archivio Parquet gli archi arrivano gia come indici interi
+nodes_df = carica_tabella('../data/new/grezzi/nodes.csv', colonne=['id', 'popularity'])
+indicizzati = carica_archi_indicizzati('../data/new/grezzi')
+if indicizzati is not None:
+    ids, source, target, weight = indicizzati
+    n_archi = len(weight)
+else:
+    edges_df = carica_tabella('../data/new/grezzi/edges.csv', colonne=['source', 'target', 'weight'])
+    n_archi = len(edges_df)
+densita = args.modo == 'densita' or (args.modo == 'auto' and n_archi > args.soglia)
 
 # Creazione figura
 fig, ax = plt.subplots(figsize=(10, 10))
 fig.patch.set_facecolor('white')
 ax.set_facecolor('white')
 
-# Scatterplot con dimensione e colore basati sul peso
-scatter = ax.scatter(df_edges['source_popularity'], 
-                     df_edges['target_popularity'],
-                     alpha=0.4,
-                     s=df_edges['weight'] * 15, 
-                     c=df_edges['weight'],
-                     cmap=gephi_cmap,
-                     edgecolors='black',
-                     linewidths=0.5,
-                     zorder=3)
+if densita:
+    # Collaborazioni per coppia di popolarita: una cella per valore intero
+    if indicizzati is not None:
+        popolarita = popolarita_per_indice(nodes_df, ids)
+        conteggi, pesi = densita_popolarita(popolarita[source], popolarita[target], weight)
+    else:
+        conteggi, pesi = densita_archi(nodes_df, edges_df)
+    statistiche = statistiche_densita(conteggi, pesi)
+
+    bordi = np.arange(POPOLARITA_MAX + 2) - 0.5
+    mappa = ax.pcolormesh(bordi, bordi, np.ma.masked_equal(pesi, 0).T, cmap=gephi_cmap,
+                          norm=LogNorm(vmin=1, vmax=max(pesi.max(), 1)), zorder=3, rasterized=True)
+    etichetta_barra = 'Numero di Collaborazioni per cella'
+else:
+    # Creazione dataset per il grafico (popolarità dei due artisti di ogni arco)
+    if indicizzati is not None:
+        edges_df = pd.DataFrame({'source': ids[source], 'target': ids[target], 'weight': weight})
+    df_edges = popolarita_archi(nodes_df, edges_df)
+
+    # Scatterplot con dimensione e colore basati sul peso
+    mappa = ax.scatter(df_edges['source_popularity'],
+                       df_edges['target_popularity'],
+                       alpha=0.4,
+                       s=df_edges['weight'] * 15,
+                       c=df_edges['weight'],
+                       cmap=gephi_cmap,
+                       edgecolors='black',
+                       linewidths=0.5,
+                       zorder=3)
+    etichetta_barra = 'Numero di Collaborazioni'
 
 ax.set_xlim(0, 100)
 ax.set_ylim(0, 100)
 
 # Diagonale di simmetria
-ax.plot([0, 100], [0, 100], 
-         color='#A947C7', linestyle='--', alpha=0.6, linewidth=2, 
-         label='Diagonale (simmetria)', zorder=2)
+ax.plot([0, 100], [0, 100],
+         color='#A947C7', linestyle='--', alpha=0.6, linewidth=2,
+         label='Diagonale (simmetria)', zorder=4 if densita else 2)
 
 # Formattazione
 ax.set_xlabel('Popolarità Artista Source', fontsize=12, fontweight='bold', labelpad=10)
@@ -60,14 +105,21 @@ ax.set_title('Scatterplot Popolarità tra Artisti', fontsize=16, fontweight='bol
 ax.grid(True, alpha=0.3, linestyle='--', color='gray', zorder=1)
 ax.set_aspect('equal', adjustable='box')
 
-cbar = plt.colorbar(scatter, ax=ax, shrink=0.8)
-cbar.set_label('Numero di Collaborazioni', fontweight='bold')
+cbar = plt.colorbar(mappa, ax=ax, shrink=0.8)
+cbar.set_label(etichetta_barra, fontweight='bold')
 ax.legend(loc='upper left', fontsize=10)
 
 plt.tight_layout()
-plt.savefig('../report/scatterplot.png', dpi=300, bbox_inches='tight')
-plt.show()
+plt.savefig(args.output, dpi=300, bbox_inches='tight')
+if args.mostra:
+    plt.show()
 
 # Calcolo e stampa correlazione
-correlation = df_edges['source_popularity'].corr(df_edges['target_popularity'])
-print(f"Correlazione popolarita: {correlation:.3f}")
\ No newline at end of file
+if densita:
+    print(f"Archi: {statistiche['archi']}, collaborazioni: {statistiche['collaborazioni']:.0f}")
+    print(f"Correlazione popolarita: {statistiche['correlazione']:.3f} "
+          f"(pesata con le collaborazioni: {statistiche['correlazione_pesata']:.3f})")
+    print(f"Differenza media di popolarita: {statistiche['differenza_media']:.1f}")
+else:
+    correlation = df_edges['source_popularity'].corr(df_edges['target_popularity'])
+    print(f"Correlazione popolarita: {correlation:.3f}")
@@ -0,0 +1,113 @@
+# Livello di trasporto HTTP condiviso dai client di Spotify e Wikidata
+#
+# Ogni servizio ha una sola requests.Session per processo, creata alla prima
+# richiesta, con:
+#   - connessioni keep-alive riutilizzate (pool urllib3 di HTTP_CONNESSIONI
+#     connessioni per host, dal .env): niente nuova connessione TCP e handshake
+#     TLS per ogni richiesta
+#   - un limite di richieste contemporanee per host (HTTP_PER_HOST), anche con
+#     piu thread, ad esempio il crawl asincrono o piu client nello stesso processo
+#   - risposte compresse: Accept-Encoding gzip/deflate, decompresse da urllib3
+# I tentativi ripetuti di urllib3 (Retry) restano configurabili per servizio.
+# requests non parla HTTP/2: il guadagno principale (una connessione riusata
+# invece di una nuova per richiesta) arriva gia dal keep-alive di HTTP/1.1.
+# Confronto con una connessione nuova per richiesta: python -m benchmark.trasporto
+
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Connessioni tenute aperte per host e richieste contemporanee per host, per servizio
+CONFIGURAZIONI = {
+    'spotify': {'connessioni': 16, 'per_host': 16},
+    # Il servizio SPARQL di Wikidata accetta al massimo 5 query in parallelo per IP
+    'wikidata': {'connessioni': 5, 'per_host': 5},
+}
+HOST_PER_SESSIONE = 4
+COMPRESSIONE = 'gzip, deflate'
+
+
+class AdattatoreCondiviso(HTTPAdapter):
+    """HTTPAdapter con pool di connessioni keep-alive e un semaforo per host sulle richieste in volo."""
+
+    def __init__(self, connessioni, per_host, max_retries=0):
+        self.per_host = per_host
+        self._semafori = {}
+        self._lock = threading.Lock()
+        self.attesa = 0.0
+        # Con meno connessioni che richieste in volo le connessioni in piu verrebbero chiuse dopo l'uso
+        super().__init__(pool_connections=HOST_PER_SESSIONE, pool_maxsize=max(connessioni, per_host),
+                         max_retries=max_retries)
+
+    def _semaforo(self, host):
+        with self._lock:
+            if host not in self._semafori:
+                self._semafori[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semafori[host]
+
+    def send(self, request, **kwargs):
+        semaforo = self._semaforo(urlsplit(request.url).netloc)
+        inizio = time.perf_counter()
+        with semaforo:
+            with self._lock:
+                self.attesa += time.perf_counter() - inizio
+            return super().send(request, **kwargs)
+
+    def statistiche(self):
+        """Connessioni aperte e richieste inviate dai pool ancora attivi, attesa per il limite per host."""
+        pools = [self.poolmanager.pools[chiave] for chiave in self.poolmanager.pools.keys()]
+        return {'connessioni': sum(p.num_connections for p in pools), 'richieste': sum(p.num_requests for p in pools),
+                'host': len(pools), 'attesa': round(self.attesa, 3)}
+
+
+def crea_sessione(connessioni, per_host, retry=0, headers=None):
+    """Nuova sessione con AdattatoreCondiviso su http e https e risposte compresse."""
+    sessione = requests.Session()
+    adattatore = AdattatoreCondiviso(connessioni, per_host, retry)
+    sessione.mount('https://', adattatore)
+    sessione.mount('http://', adattatore)
+    sessione.headers['Accept-Encoding'] = COMPRESSIONE
+    sessione.headers.update(headers or {})
+    return sessione
+
+
+_sessioni = {}
+_lock_registro = threading.Lock()
+
+
+def get_sessione(servizio, retry=0, headers=None, hooks=()):
+    """Restituisce la sessione condivisa di un servizio, creandola alla prima richiesta.
+
+    retry, headers e hooks valgono solo alla creazione: le richieste successive
+    ricevono la stessa sessione.
+    """
+    with _lock_registro:
+        if servizio not in _sessioni:
+            configurazione = CONFIGURAZIONI[servizio]
+            connessioni = int(os.getenv('HTTP_CONNESSIONI', configurazione['connessioni']))
+            per_host = int(os.getenv('HTTP_PER_HOST', configurazione['per_host']))
+            sessione = crea_sessione(connessioni, per_host, retry, headers)
+            sessione.hooks['response'].extend(hooks)
+            _sessioni[servizio] = sessione
+        return _sessioni[servizio]
+
+
+def chiudi_sessioni():
+    """Chiude le connessioni di tutte le sessioni del processo."""
+    with _lock_registro:
+        for sessione in _sessioni.values():
+            sessione.close()
+        _sessioni.clear()
+
+
+def stampa_statistiche():
+    """Stampa per ogni servizio quante connessioni sono state aperte per quante richieste."""
+    for servizio, sessione in _sessioni.items():
+        adattatore = sessione.get_adapter('https://')
+        s = adattatore.statistiche()
+        print(f"Connessioni {servizio}: {s['connessioni']} aperte per {s['richieste']} richieste "
+              f"su {s['host']} host, {s['attesa']}s di attesa per il limite di {adattatore.per_host} per host")
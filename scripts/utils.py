@@ -4,14 +4,79 @@ import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import os
 from dotenv import load_dotenv
+from urllib3.util.retry import Retry
+from scripts.ratelimit import get_limiter
+from scripts.cache import get_cache, endpoint_spotify
+from scripts.misure import misure, registra_risposta
+from scripts.trasporto import get_sessione
 
 load_dotenv()
 
+# I 429 non vengono ripetuti da urllib3 ma gestiti dal limitatore condiviso
+STATUS_RIPETIBILI = (500, 502, 503, 504)
 
-def get_spotify_client():
+
+class ClientSpotify(spotipy.Spotify):
+    """Client spotipy con cache su disco delle GET e token bucket per le richieste in rete."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limitatore = get_limiter('spotify')
+        self.cache = get_cache()
+
+    def _build_session(self):
+        # Sessione condivisa dai client del processo (scripts/trasporto.py), con i tentativi di spotipy.
+        # urllib3 ripeterebbe da solo i 429 con Retry-After, nascondendoli al limitatore
+        retry = Retry(total=self.retries, connect=None, read=False,
+                      allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']), status=self.status_retries,
+                      backoff_factor=self.backoff_factor, status_forcelist=self.status_forcelist,
+                      respect_retry_after_header=False)
+        self._session = get_sessione('spotify', retry, hooks=[registra_risposta('spotify', endpoint_spotify)])
+
+    def __del__(self):
+        # La sessione e condivisa: la chiude trasporto.chiudi_sessioni, non il singolo client
+        pass
+
+    def _internal_call(self, method, url, payload, params):
+        url_completo = url if url.startswith('http') else self.prefix + url
+        endpoint = endpoint_spotify(url_completo)
+
+        def tentativo():
+            with misure.misura('spotify', endpoint):
+                return super(ClientSpotify, self)._internal_call(method, url, payload, params)
+
+        def scarica():
+            return self.limitatore.esegui(tentativo)
+
+        if method != 'GET' or self.cache is None:
+            return scarica()
+        parametri = sorted((k, v) for k, v in params.items() if v is not None)
+        return self.cache.ottieni(endpoint, ('GET', url_completo, parametri), scarica)
+
+
+def credenziali_spotify():
+    """Elenca le coppie (client id, client secret) del file .env: SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_ID_2, ..."""
+    credenziali = [(os.getenv('SPOTIPY_CLIENT_ID'), os.getenv('SPOTIPY_CLIENT_SECRET'))]
+    n = 2
+    while os.getenv(f'SPOTIPY_CLIENT_ID_{n}'):
+        credenziali.append((os.getenv(f'SPOTIPY_CLIENT_ID_{n}'), os.getenv(f'SPOTIPY_CLIENT_SECRET_{n}')))
+        n += 1
+    return credenziali
+
+
+def get_spotify_client(credenziali=None):
     """Crea e restituisce un client Spotify autenticato usando le credenziali dal file .env"""
+    # Con SPOTIPY_API_PREFIX il client punta a un server locale (es. scripts/mock_spotify.py)
+    prefix = os.getenv('SPOTIPY_API_PREFIX')
+    if prefix:
+        sp = ClientSpotify(auth='locale', requests_timeout=10, retries=10, status_forcelist=STATUS_RIPETIBILI)
+        sp.prefix = prefix.rstrip('/') + '/'
+        return sp
+
+    client_id, client_secret = credenziali or credenziali_spotify()[0]
     auth_manager = SpotifyClientCredentials(
-        client_id=os.getenv('SPOTIPY_CLIENT_ID'),
-        client_secret=os.getenv('SPOTIPY_CLIENT_SECRET')
+        client_id=client_id,
+        client_secret=client_secret
     )
-    return spotipy.Spotify(auth_manager=auth_manager, requests_timeout=10, retries=10)
\ No newline at end of file
+    return ClientSpotify(auth_manager=auth_manager, requests_timeout=10, retries=10,
+                         status_forcelist=STATUS_RIPETIBILI)
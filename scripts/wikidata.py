@@ -0,0 +1,165 @@
+# Ricerca delle nazionalita su Wikidata a blocchi, con query SPARQL VALUES
+#
+# Invece di una o due query per artista, centinaia di Spotify ID (P1902)
+# vengono risolti con una sola query tramite una clausola VALUES; gli artisti
+# non trovati passano alla ricerca per nome, anch'essa a blocchi. Le query
+# viaggiano in POST sulla sessione HTTP condivisa di scripts/trasporto.py
+# (connessioni riutilizzate, al massimo 5 query in parallelo) e passano dalla
+# cache su disco e dal limitatore di Wikidata. Se un blocco
+# fallisce (ad esempio per timeout del server) viene diviso a meta e riprovato.
+
+import os
+
+from urllib3.util.retry import Retry
+
+from scripts.batch import a_blocchi
+from scripts.cache import get_cache, RispostaNonInCache
+from scripts.misure import misure, registra_risposta
+from scripts.ratelimit import get_limiter, RichiestaLimitata
+from scripts.trasporto import get_sessione, chiudi_sessioni
+
+ENDPOINT = "https://query.wikidata.org/sparql"
+AGENT = "MusicResearchProject/1.0"
+BLOCCO_ID = 200
+BLOCCO_NOMI = 25
+
+NAZIONE = """
+      OPTIONAL {
+        { ?artist wdt:P19/wdt:P17 ?country . }
+        UNION
+        { ?artist wdt:P495 ?country . }
+        UNION
+        { ?artist wdt:P27 ?country . }
+      }
+      SERVICE wikibase:label { bd:serviceParam wikibase:language "it,es,en". }"""
+
+
+def _letterale(valore):
+    """Stringa SPARQL tra virgolette, con escape di backslash, virgolette e a capo."""
+    valore = str(valore).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+    return f'"{valore}"'
+
+
+def query_per_id(ids):
+    valori = ' '.join(_letterale(i) for i in ids)
+    return f"""
+    SELECT ?spotify ?artistLabel ?countryLabel WHERE {{
+      VALUES ?spotify {{ {valori} }}
+      ?artist wdt:P1902 ?spotify .{NAZIONE}
+    }}
+    """
+
+
+def query_per_nome(nomi):
+    valori = ' '.join(_letterale(n) + '@en' for n in nomi)
+    return f"""
+    SELECT ?nome ?artistLabel ?countryLabel WHERE {{
+      VALUES ?nome {{ {valori} }}
+      ?artist rdfs:label ?nome .
+      ?artist wdt:P31 wd:Q5 .
+      {{ ?artist wdt:P106/wdt:P279* wd:Q639669 . }}
+      UNION
+      {{ ?artist wdt:P106 wd:Q177220 . }}{NAZIONE}
+    }}
+    """
+
+
+class ClientSparql:
+    """Esegue query SPARQL su una sessione HTTP condivisa, con cache e limitatore."""
+
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint or os.getenv('WIKIDATA_ENDPOINT', ENDPOINT)
+        self.limitatore = get_limiter('wikidata')
+        self.cache = get_cache()
+
+        # I 500 di Wikidata sono quasi sempre timeout della query: li gestisce la divisione dei blocchi
+        retry = Retry(total=3, backoff_factor=1, status_forcelist=(502, 503, 504), allowed_methods=None,
+                      respect_retry_after_header=False, raise_on_status=False)
+        self.sessione = get_sessione('wikidata', retry,
+                                     headers={'User-Agent': AGENT, 'Accept': 'application/sparql-results+json'},
+                                     hooks=[registra_risposta('wikidata', lambda url: 'sparql')])
+
+    def _invia(self, query):
+        with misure.misura('wikidata', 'sparql'):
+            risposta = self.sessione.post(self.endpoint, data={'query': query}, timeout=90)
+            risposta.raise_for_status()
+            return risposta.json()
+
+    def esegui(self, query):
+        if self.cache is None:
+            return self.limitatore.esegui(self._invia, query)
+        return self.cache.ottieni('sparql', ('sparql', self.endpoint, query),
+                                  lambda: self.limitatore.esegui(self._invia, query))
+
+    def chiudi(self):
+        chiudi_sessioni()
+
+
+def _primo_per_valore(risposta, variabile):
+    """Primo risultato per ogni valore di VALUES, come LIMIT 1 nelle query per singolo artista."""
+    trovati = {}
+    for riga in risposta['results']['bindings']:
+        valore = riga[variabile]['value']
+        if valore not in trovati or ('countryLabel' in riga and 'countryLabel' not in trovati[valore]):
+            trovati[valore] = riga
+    return trovati
+
+
+def risolvi_blocco(client, valori, crea_query, variabile):
+    """Restituisce (trovati, errori) per un blocco, dividendolo a meta se la query fallisce."""
+    try:
+        return _primo_per_valore(client.esegui(crea_query(valori)), variabile), {}
+    except (RichiestaLimitata, RispostaNonInCache) as e:
+        # Dividere non servirebbe: il blocco intero viene segnato come errore
+        return {}, {v: e for v in valori}
+    except Exception as e:
+        if len(valori) == 1:
+            return {}, {valori[0]: e}
+        meta = len(valori) // 2
+        trovati, errori = risolvi_blocco(client, valori[:meta], crea_query, variabile)
+        trovati_2, errori_2 = risolvi_blocco(client, valori[meta:], crea_query, variabile)
+        return {**trovati, **trovati_2}, {**errori, **errori_2}
+
+
+def _riga(spotify_id, risultato, nome_predefinito):
+    return {
+        'spotify_id': spotify_id,
+        'name': risultato.get('artistLabel', {}).get('value', nome_predefinito),
+        'country': risultato.get('countryLabel', {}).get('value', 'Unknown')
+    }
+
+
+def nazionalita(client, artisti, scrivi, blocco_id=BLOCCO_ID, blocco_nomi=BLOCCO_NOMI):
+    """Risolve la nazionalita di una lista di (spotify_id, nome).
+
+    Dopo ogni blocco le righe risolte (spotify_id, name, country) vengono passate a
+    scrivi, cosi i risultati finiscono su disco man mano.
+    """
+    per_nome = []
+    for blocco in a_blocchi(artisti, blocco_id):
+        trovati, errori = risolvi_blocco(client, [s_id for s_id, _ in blocco], query_per_id, 'spotify')
+        righe = []
+        for s_id, s_name in blocco:
+            if s_id in trovati:
+                righe.append(_riga(s_id, trovati[s_id], 'Unknown'))
+            elif s_id in errori:
+                print(f"Errore per {s_name}: {errori[s_id]}")
+                righe.append({'spotify_id': s_id, 'name': s_name, 'country': 'Error'})
+            else:
+                per_nome.append((s_id, s_name))
+        scrivi(righe)
+
+    # Fallback: ricerca per nome degli artisti senza Spotify ID su Wikidata
+    for blocco in a_blocchi(per_nome, blocco_nomi):
+        nomi = list(dict.fromkeys(s_name for _, s_name in blocco))
+        trovati, errori = risolvi_blocco(client, nomi, query_per_nome, 'nome')
+        righe = []
+        for s_id, s_name in blocco:
+            if s_name in trovati:
+                righe.append(_riga(s_id, trovati[s_name], s_name))
+            elif s_name in errori:
+                print(f"Errore per {s_name}: {errori[s_name]}")
+                righe.append({'spotify_id': s_id, 'name': s_name, 'country': 'Error'})
+            else:
+                righe.append({'spotify_id': s_id, 'name': s_name, 'country': 'Unknown'})
+        scrivi(righe)
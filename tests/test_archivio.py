@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from scripts.archivio import carica_archi_indicizzati, indici_aggiornati, salva_grafo, salva_grafo_a_blocchi
+
+
+def _blocchi():
+    yield np.array([0, 1]), np.array([1, 2]), np.array([3, 1])
+    yield np.array([2]), np.array([3]), np.array([2])
+
+
+def test_indici_aggiornati_dopo_salva_grafo_a_blocchi(tmp_path):
+    ids = np.array(['a', 'b', 'c', 'd'], dtype=object)
+    df_nodes = pd.DataFrame({'id': ['a', 'b'], 'name': ['A', 'B']})
+    salva_grafo_a_blocchi(df_nodes, ids, _blocchi, str(tmp_path))
+
+    assert indici_aggiornati(str(tmp_path))
+    indici, source, target, pesi = carica_archi_indicizzati(str(tmp_path))
+    assert list(indici[source]) == ['a', 'b', 'c']
+    assert list(indici[target]) == ['b', 'c', 'd']
+    assert list(pesi) == [3, 1, 2]
+
+
+def test_indici_vecchi_dopo_modifica_dei_csv(tmp_path):
+    df_nodes = pd.DataFrame({'id': ['a', 'b'], 'name': ['A', 'B']})
+    df_edges = pd.DataFrame({'source': ['a', 'b'], 'target': ['b', 'c'], 'weight': [1, 2]})
+    salva_grafo(df_nodes, df_edges, str(tmp_path))
+    assert indici_aggiornati(str(tmp_path))
+
+    # edges.csv riscritto dopo gli indici, ad esempio a mano
+    df_edges.iloc[:1].to_csv(tmp_path / 'edges.csv', index=False)
+    assert not indici_aggiornati(str(tmp_path))
+    assert carica_archi_indicizzati(str(tmp_path)) is None
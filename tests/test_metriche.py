@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.metriche import calcola_metriche, carica_grafo, filtra_componenti, salva_metriche
+
+CLASSIFICHE = ('degree', 'betweeness', 'closeness', 'eigenvector')
+COLONNE = ['weighted degree', 'eccentricity', 'closeness', 'harmonic closeness', 'betweeness', 'eigenvector']
+
+
+@pytest.fixture(scope='module')
+def metriche(tmp_path_factory):
+    # Stesso grafo del progetto Gephi di data/old, senza le componenti di 2 e 3 artisti
+    g, df_nodes = carica_grafo('data/old/grezzi/nodes.csv', 'data/old/grezzi/edges.csv')
+    g = filtra_componenti(g, 4)
+    cartella = tmp_path_factory.mktemp('metriche')
+    salva_metriche(calcola_metriche(g), df_nodes, str(cartella))
+    return cartella
+
+
+@pytest.mark.parametrize('nome', CLASSIFICHE)
+def test_classifiche_come_gephi(metriche, nome):
+    gephi = pd.read_csv(f'data/old/metriche/{nome}.csv')
+    nostre = pd.read_csv(metriche / f'{nome}.csv')
+    assert list(nostre['id']) == list(gephi['id'])
+    np.testing.assert_allclose(nostre[COLONNE], gephi[COLONNE], rtol=1e-9, atol=1e-12)
+
+
+def test_closeness_solo_componente_gigante(tmp_path):
+    g, df_nodes = carica_grafo('data/old/grezzi/nodes.csv', 'data/old/grezzi/edges.csv')
+    salva_metriche(calcola_metriche(g), df_nodes, str(tmp_path))
+    assert pd.read_csv(tmp_path / 'closeness.csv')['name'].iloc[0] == 'Arcángel'